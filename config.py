@@ -14,6 +14,11 @@ class GraphRAGConfig:
     neo4j_user: str = "neo4j"
     neo4j_password: str = "all-in-rag"
     neo4j_database: str = "neo4j"
+    neo4j_max_pool_size: int = 50  # 各模块共享的连接池大小
+    neo4j_acquisition_timeout: float = 10.0  # 从连接池获取连接的超时（秒）
+    neo4j_max_connection_lifetime: float = 3600.0  # 连接最长存活时间（秒）
+    cypher_cache_max_bytes: int = 32 * 1024 * 1024  # 确定性读查询结果缓存的内存上限（字节）
+    graph_version_ttl: float = 1.0  # 图版本号的复用时间（秒），其他进程写入后缓存最迟在此时间后失效
 
     # Milvus配置
     milvus_host: str = "localhost"
@@ -36,6 +41,53 @@ class GraphRAGConfig:
     chunk_size: int = 500
     chunk_overlap: int = 50
     max_graph_depth: int = 2  # 图遍历最大深度
+    enable_graph_snapshot: bool = True  # 启动时加载内存图快照，多跳遍历在进程内完成
+    traversal_max_frontier: int = 200000  # 内存多跳遍历每层最多展开的路径数
+    subgraph_beam_width: int = 20  # 子图提取每跳保留的节点数
+    subgraph_hub_sample: int = 50  # 子图提取时每个节点最多展开的邻居数（高度数节点采样）
+    graph_query_timeout: float = 5.0  # 单次图检索的总时间预算（秒），作为Neo4j事务超时下发
+    graph_query_max_rows: int = 5000  # 单次图检索最多读取的结果行数
+    path_max_paths: int = 10  # 最短路径/实体关系查询最多返回的路径数
+    entity_resolution_limit: int = 20  # 每个实体字符串最多解析出的节点数
+    multi_hop_mode: str = "paths"  # 多跳查询检索方式：paths（路径遍历）/ pagerank（个性化PageRank，需要内存图快照）
+    ppr_alpha: float = 0.15  # 个性化PageRank重启概率
+    ppr_iterations: int = 20  # 个性化PageRank幂迭代轮数
+    ppr_top_k: int = 10  # 个性化PageRank返回的节点数
+    graph_cache_max_bytes: int = 64 * 1024 * 1024  # 子图/路径检索结果缓存的内存上限
+    relationship_page_size: int = 2000  # 构建图索引时每页读取的源节点数
+    fuzzy_key_limit: int = 5  # 索引键模糊匹配时最多使用的候选键数量
+
+    # LLM关系索引键增强配置
+    enable_llm_relation_keys: bool = False  # 是否使用LLM为关系生成主题索引键
+    relation_key_batch_size: int = 20  # 每次LLM调用处理的关系数量
+    relation_key_workers: int = 4  # 并发执行的批次数
+    relation_key_rate_limit: float = 3.0  # 每秒最多发起的LLM请求数
+    relation_key_cache_path: str = "./cache/relation_keys.json"  # 关系索引键磁盘缓存
+
+    # 相似菜谱表配置（scripts/build_similar_recipes.py 离线生成）
+    similar_recipe_index_path: str = "./cache/similar_recipes.json"  # 相似菜谱表文件
+    similar_recipe_top_n: int = 10  # 每个菜谱保留的相似菜谱数
+    similar_recipe_bands: int = 64  # MinHash签名（128维）切分的LSH段数，段数越多召回越高
+
+    # 社区摘要配置（scripts/build_community_summaries.py 离线生成）
+    community_summary_path: str = "./cache/community_summaries.json"  # 社区摘要文件
+    community_resolution: float = 1.0  # Louvain分辨率，越大社区越小
+    community_top_k: int = 3  # 宽泛问题最多使用的社区摘要数
+    community_summary_workers: int = 4  # LLM生成社区摘要的并发请求数
+    community_summary_rate_limit: float = 3.0  # 生成社区摘要时每秒最多发起的LLM请求数
+    low_calorie_max: int = 400  # "低卡"等健康约束对应的热量上限（大卡）
+
+    # 本地路由模型配置（scripts/train_local_router.py 由LLM路由决策日志训练）
+    routing_log_path: str = ""  # LLM路由决策日志（含原始查询文本，默认不记录；设为 ./cache/routing_decisions.jsonl 等路径开启）
+    routing_log_max_bytes: int = 20 * 1024 * 1024  # 路由决策日志超过该大小时轮转为 <路径>.1，只保留一份旧日志
+    local_router_path: str = "./cache/local_router.json"  # 本地路由模型文件
+    local_router_threshold: float = 0.8  # 本地模型置信度不低于该值时直接路由，否则调用LLM分析
+
+    # 查询分析配置
+    stream_query_analysis: bool = True  # 流式解析LLM分析结果，字段闭合即提前开始检索
+    retrieval_workers: int = 4  # 提前检索使用的线程数
+    speculative_retrieval: bool = False  # LLM路由分析期间投机启动混合检索的低成本分支（向量，开启BM25来源时也包括BM25），只影响延迟不影响结果
+    hybrid_bm25_source: bool = False  # BM25词法检索（字符二元组分词）作为混合检索的第三路轮询来源
 
     def __post_init__(self):
         """初始化后的处理"""
@@ -54,6 +106,11 @@ class GraphRAGConfig:
             'neo4j_user': self.neo4j_user,
             'neo4j_password': self.neo4j_password,
             'neo4j_database': self.neo4j_database,
+            'neo4j_max_pool_size': self.neo4j_max_pool_size,
+            'neo4j_acquisition_timeout': self.neo4j_acquisition_timeout,
+            'neo4j_max_connection_lifetime': self.neo4j_max_connection_lifetime,
+            'cypher_cache_max_bytes': self.cypher_cache_max_bytes,
+            'graph_version_ttl': self.graph_version_ttl,
             'milvus_host': self.milvus_host,
             'milvus_port': self.milvus_port,
             'milvus_collection_name': self.milvus_collection_name,
@@ -66,7 +123,44 @@ class GraphRAGConfig:
             'max_tokens': self.max_tokens,
             'chunk_size': self.chunk_size,
             'chunk_overlap': self.chunk_overlap,
-            'max_graph_depth': self.max_graph_depth
+            'max_graph_depth': self.max_graph_depth,
+            'enable_graph_snapshot': self.enable_graph_snapshot,
+            'traversal_max_frontier': self.traversal_max_frontier,
+            'subgraph_beam_width': self.subgraph_beam_width,
+            'subgraph_hub_sample': self.subgraph_hub_sample,
+            'graph_query_timeout': self.graph_query_timeout,
+            'graph_query_max_rows': self.graph_query_max_rows,
+            'path_max_paths': self.path_max_paths,
+            'entity_resolution_limit': self.entity_resolution_limit,
+            'multi_hop_mode': self.multi_hop_mode,
+            'ppr_alpha': self.ppr_alpha,
+            'ppr_iterations': self.ppr_iterations,
+            'ppr_top_k': self.ppr_top_k,
+            'graph_cache_max_bytes': self.graph_cache_max_bytes,
+            'relationship_page_size': self.relationship_page_size,
+            'fuzzy_key_limit': self.fuzzy_key_limit,
+            'enable_llm_relation_keys': self.enable_llm_relation_keys,
+            'relation_key_batch_size': self.relation_key_batch_size,
+            'relation_key_workers': self.relation_key_workers,
+            'relation_key_rate_limit': self.relation_key_rate_limit,
+            'relation_key_cache_path': self.relation_key_cache_path,
+            'similar_recipe_index_path': self.similar_recipe_index_path,
+            'similar_recipe_top_n': self.similar_recipe_top_n,
+            'similar_recipe_bands': self.similar_recipe_bands,
+            'community_summary_path': self.community_summary_path,
+            'community_resolution': self.community_resolution,
+            'community_top_k': self.community_top_k,
+            'community_summary_workers': self.community_summary_workers,
+            'community_summary_rate_limit': self.community_summary_rate_limit,
+            'low_calorie_max': self.low_calorie_max,
+            'routing_log_path': self.routing_log_path,
+            'routing_log_max_bytes': self.routing_log_max_bytes,
+            'local_router_path': self.local_router_path,
+            'local_router_threshold': self.local_router_threshold,
+            'stream_query_analysis': self.stream_query_analysis,
+            'retrieval_workers': self.retrieval_workers,
+            'speculative_retrieval': self.speculative_retrieval,
+            'hybrid_bm25_source': self.hybrid_bm25_source
         }
 
 # 默认配置实例
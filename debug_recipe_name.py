@@ -3,7 +3,7 @@ from main import AdvancedGraphRAGSystem
 def check_recipe():
     sys = AdvancedGraphRAGSystem()
     sys.initialize_system()
-    with sys.data_module.driver.session() as session:
+    with sys.data_module.pool.session() as session:
         with open("debug_output.txt", "w", encoding="utf-8") as f:
             # 查找名字为 "菜谱" 的节点
             result = session.run("MATCH (r:Recipe) WHERE r.name = '菜谱' RETURN r").data()
@@ -362,6 +362,15 @@ OPTIONAL MATCH (r)-[:CONTAINS_STEP]->(s:CookingStep)
 WITH r, count(s) as stepCount
 SET r.stepCount = stepCount;
 
+// 为所有节点预计算度数（图检索的路径评分和启动索引直接读取，不再逐次 COUNT）
+MATCH (n)
+WHERE NOT n:GraphVersion
+SET n.degree = COUNT { (n)--() };
+
+// 图版本号：服务端的Cypher结果缓存按版本号失效，每次导入或修改图数据后递增
+MERGE (v:GraphVersion {id: 'graph'})
+SET v.version = coalesce(v.version, 0) + 1, v.updatedAt = datetime();
+
 RETURN 'Knowledge graph construction completed!';
 
 MATCH (n)
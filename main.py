@@ -69,7 +69,8 @@ class AdvancedGraphRAGSystem:
                 uri=self.config.neo4j_uri,
                 user=self.config.neo4j_user,
                 password=self.config.neo4j_password,
-                database=self.config.neo4j_database
+                database=self.config.neo4j_database,
+                config=self.config
             )
             
             # 2. 向量索引模块
@@ -198,7 +199,28 @@ class AdvancedGraphRAGSystem:
         
         self.system_ready = True
         print("✅ 检索引擎初始化完成！")
-    
+
+    def index_recipe(self, recipe_id: str) -> bool:
+        """
+        菜谱写入Neo4j（新增或修改）后增量更新检索索引，无需重启服务
+
+        Returns:
+            菜谱是否存在并已完成索引
+        """
+        if not self.system_ready:
+            raise ValueError("系统未就绪，请先构建知识库")
+        if not self.traditional_retrieval.index_recipe(recipe_id):
+            return False
+        self.graph_rag_retrieval.index_similar_recipe(recipe_id)
+        return True
+
+    def remove_recipe(self, recipe_id: str):
+        """菜谱从Neo4j删除后，从检索索引中移除"""
+        if not self.system_ready:
+            raise ValueError("系统未就绪，请先构建知识库")
+        self.traditional_retrieval.remove_recipe(recipe_id)
+        self.graph_rag_retrieval.remove_similar_recipe(recipe_id)
+
     def _show_knowledge_base_stats(self):
         """显示知识库统计信息"""
         print(f"\n知识库统计:")
@@ -219,6 +241,13 @@ class AdvancedGraphRAGSystem:
         route_stats = self.query_router.get_route_statistics()
         print(f"   路由统计: 总查询 {route_stats.get('total_queries', 0)} 次")
         
+        # Neo4j连接池统计
+        if self.data_module.pool:
+            pool_stats = self.data_module.pool.metrics()
+            print(f"   Neo4j连接池: {pool_stats.get('connections_in_use', 0)}/{pool_stats['max_pool_size']} 连接使用中, "
+                  f"读事务 {pool_stats['read_transactions']} 次, 平均 {pool_stats['avg_transaction_ms']:.1f}ms, "
+                  f"获取连接超时 {pool_stats['acquisition_timeouts']} 次")
+        
         if stats.get('categories'):
             categories = list(stats['categories'].keys())[:10]
             print(f"   🏷️ 主要分类: {', '.join(categories)}")
@@ -369,6 +398,10 @@ class AdvancedGraphRAGSystem:
             print(f"传统检索: {route_stats.get('traditional_count', 0)} ({route_stats.get('traditional_ratio', 0):.1%})")
             print(f"图RAG检索: {route_stats.get('graph_rag_count', 0)} ({route_stats.get('graph_rag_ratio', 0):.1%})")
             print(f"组合策略: {route_stats.get('combined_count', 0)} ({route_stats.get('combined_ratio', 0):.1%})")
+            speculation = route_stats.get('speculation', {})
+            if speculation.get('legs_started'):
+                print(f"投机检索: 命中 {speculation['hit_rate']:.1%}, 浪费 {speculation['waste_rate']:.1%}, "
+                      f"平均节省 {speculation['avg_saved_ms']:.0f}ms, 浪费后端耗时 {speculation['wasted_ms']:.0f}ms")
         else:
             print("暂无查询记录")
         
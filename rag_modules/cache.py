@@ -0,0 +1,105 @@
+"""
+检索结果缓存模块
+按内存占用上限淘汰的LRU缓存，每个条目记录写入时的图版本号，
+图数据更新（版本号变化）后旧条目自动失效
+"""
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """估算对象占用的内存字节数（递归统计容器、dataclass和其中的元素）"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    elif is_dataclass(obj) and not isinstance(obj, type):
+        size += sum(estimate_size(getattr(obj, f.name), _seen) for f in fields(obj))
+    return size
+
+class VersionedLRUCache:
+    """
+    带版本号的LRU缓存（线程安全）
+
+    特点：
+    1. 按估算的内存占用淘汰最久未使用的条目，总占用不超过 max_bytes
+    2. 读取时版本号不一致视为未命中并删除条目
+    3. 单个条目超过上限时不缓存
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (version, value, size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self._remove(key)
+                    self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: Any, value: Any):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.debug(f"缓存条目过大（{size} 字节），跳过缓存")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get_statistics(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale": self.stale,
+            "hit_rate": self.hits / total if total else 0.0
+        }
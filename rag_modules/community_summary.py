@@ -0,0 +1,366 @@
+"""
+社区摘要模块
+离线对 菜谱-食材-分类 图做Louvain社区划分，为每个社区生成一段紧凑摘要并缓存；
+"川菜有什么特色" 这类宽泛问题在查询时按关键词查找相关社区、直接使用预先生成的摘要，
+不再临时收集大范围邻域
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .graph_indexing import KeyNgramIndex
+from .graph_snapshot import GraphSnapshot
+from .relation_key_enrichment import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# ==================== Louvain ====================
+
+def _local_moving(graph: sparse.csr_matrix, resolution: float, rng: np.random.RandomState) -> Tuple[np.ndarray, bool]:
+    """Louvain第一阶段：逐个节点移动到模块度增益最大的相邻社区，直到没有节点移动"""
+    node_count = graph.shape[0]
+    indptr, indices, data = graph.indptr, graph.indices, graph.data
+    degree = np.asarray(graph.sum(axis=1)).ravel()
+    total_weight = degree.sum()
+    community = np.arange(node_count)
+    community_degree = degree.copy()
+    improved = False
+
+    moved = True
+    while moved:
+        moved = False
+        for node in rng.permutation(node_count):
+            current = community[node]
+            node_degree = degree[node]
+            links: Dict[int, float] = defaultdict(float)
+            for neighbor, weight in zip(indices[indptr[node]:indptr[node + 1]], data[indptr[node]:indptr[node + 1]]):
+                if neighbor != node:
+                    links[community[neighbor]] += weight
+
+            community_degree[current] -= node_degree
+            best = current
+            best_gain = links.get(current, 0.0) - resolution * community_degree[current] * node_degree / total_weight
+            for candidate, weight in links.items():
+                gain = weight - resolution * community_degree[candidate] * node_degree / total_weight
+                if gain > best_gain + 1e-12:
+                    best, best_gain = candidate, gain
+            community_degree[best] += node_degree
+
+            if best != current:
+                community[node] = best
+                moved = True
+                improved = True
+
+    return np.unique(community, return_inverse=True)[1], improved
+
+def louvain_communities(adjacency: sparse.csr_matrix, resolution: float = 1.0, seed: int = 0) -> np.ndarray:
+    """
+    Louvain社区划分
+
+    Args:
+        adjacency: 对称的带权邻接矩阵
+        resolution: 分辨率，越大社区越小
+        seed: 节点访问顺序的随机种子
+
+    Returns:
+        每个节点的社区编号（0..k-1）
+    """
+    rng = np.random.RandomState(seed)
+    membership = np.arange(adjacency.shape[0])
+    graph = adjacency.tocsr().astype(np.float64)
+    if graph.nnz == 0:
+        return membership
+
+    while True:
+        labels, improved = _local_moving(graph, resolution, rng)
+        if not improved:
+            break
+        membership = labels[membership]
+        # 第二阶段：社区收缩为节点，社区内部权重成为自环
+        assignment = sparse.csr_matrix(
+            (np.ones(len(labels)), (np.arange(len(labels)), labels)),
+            shape=(len(labels), labels.max() + 1)
+        )
+        graph = (assignment.T @ graph @ assignment).tocsr()
+        if graph.shape[0] == 1:
+            break
+
+    return membership
+
+def modularity(adjacency: sparse.csr_matrix, membership: np.ndarray, resolution: float = 1.0) -> float:
+    """划分的模块度"""
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    total_weight = degree.sum()
+    if total_weight == 0:
+        return 0.0
+    coo = adjacency.tocoo()
+    internal = coo.data[membership[coo.row] == membership[coo.col]].sum()
+    community_degree = np.bincount(membership, weights=degree)
+    return float(internal / total_weight - resolution * np.sum((community_degree / total_weight) ** 2))
+
+# ==================== 社区摘要 ====================
+
+def _split_values(value: Any) -> List[str]:
+    return [item.strip() for item in str(value or "").split(",") if item.strip()]
+
+class CommunitySummaryStore:
+    """
+    社区摘要存储
+
+    特点：
+    1. 每个社区保存成员菜谱、主要食材、菜系/分类统计和一段摘要文本
+    2. 关键词（菜谱名、食材名、分类、菜系、标签）-> 社区命中次数 的倒排表，查询时字典查找
+    3. 关键词不完全一致时用n-gram索引做包含匹配
+    """
+
+    def __init__(self, communities: Optional[List[Dict[str, Any]]] = None):
+        self.communities: Dict[int, Dict[str, Any]] = {}
+        self.keyword_hits: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.keyword_index = KeyNgramIndex()
+        for community in communities or []:
+            self._add(community)
+
+    def __len__(self) -> int:
+        return len(self.communities)
+
+    def _add(self, community: Dict[str, Any]):
+        community_id = community["id"]
+        self.communities[community_id] = community
+        for keyword, count in community["keywords"].items():
+            self.keyword_hits[keyword][community_id] = count
+            self.keyword_index.add(keyword)
+
+    @staticmethod
+    def recipe_concept_graph(snapshot: GraphSnapshot) -> Tuple[List[int], Dict[int, List[Tuple[str, str]]], sparse.csr_matrix]:
+        """
+        菜谱-概念 二部图：同名食材节点合并为一个概念（每个菜谱的食材是独立节点），
+        只保留与菜谱直接相连的食材和分类，避免食材分类（如"调料"）把所有食材连成一片
+
+        Returns:
+            (菜谱的快照序号, 菜谱位置 -> [(概念类型, 名称)], 对称CSR邻接矩阵（前len(菜谱)行为菜谱）)
+        """
+        recipes = [i for i, labels in enumerate(snapshot.node_labels) if "Recipe" in labels]
+        recipe_position = {node: position for position, node in enumerate(recipes)}
+        concept_position: Dict[Tuple[str, str], int] = {}
+        recipe_concepts: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        rows, cols = [], []
+
+        for source, target in zip(snapshot.edge_sources.tolist(), snapshot.edge_targets.tolist()):
+            for recipe, other in ((source, target), (target, source)):
+                position = recipe_position.get(recipe)
+                if position is None:
+                    continue
+                labels = snapshot.node_labels[other]
+                kind = "Ingredient" if "Ingredient" in labels else ("Category" if "Category" in labels else None)
+                name = snapshot.names[other]
+                if kind is None or not name:
+                    continue
+                concept = (kind, name)
+                if concept not in concept_position:
+                    concept_position[concept] = len(recipes) + len(concept_position)
+                recipe_concepts[position].append(concept)
+                rows.append(position)
+                cols.append(concept_position[concept])
+
+        size = len(recipes) + len(concept_position)
+        adjacency = sparse.coo_matrix(
+            (np.ones(2 * len(rows)), (np.array(rows + cols, dtype=np.int64), np.array(cols + rows, dtype=np.int64))),
+            shape=(size, size)
+        ).tocsr()
+        adjacency.sum_duplicates()
+        return recipes, recipe_concepts, adjacency
+
+    @classmethod
+    def build(cls, snapshot: GraphSnapshot, resolution: float = 1.0, min_recipes: int = 2,
+              top_items: int = 8) -> 'CommunitySummaryStore':
+        """
+        在快照的 菜谱-食材-分类 图上划分社区，并统计每个社区的特征
+
+        Args:
+            snapshot: 内存图快照
+            resolution: Louvain分辨率
+            min_recipes: 菜谱数少于该值的社区不生成摘要
+            top_items: 摘要中每类特征最多列出的数量
+        """
+        start_time = time.time()
+        recipes, recipe_concepts, adjacency = cls.recipe_concept_graph(snapshot)
+        membership = louvain_communities(adjacency, resolution)
+        logger.info(f"社区划分完成: {adjacency.shape[0]} 个节点, {len(set(membership[:len(recipes)].tolist()))} 个菜谱社区, "
+                    f"模块度 {modularity(adjacency, membership, resolution):.3f}, 耗时 {time.time() - start_time:.2f}秒")
+
+        # 菜谱按子图内度数排序，度数高的作为代表菜谱
+        degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        members: Dict[int, List[int]] = defaultdict(list)
+        for position in sorted(range(len(recipes)), key=lambda p: -degree[p]):
+            members[int(membership[position])].append(position)
+
+        # 同名食材的分类取第一个出现的节点
+        ingredient_category = {}
+        for node, labels in enumerate(snapshot.node_labels):
+            if "Ingredient" in labels:
+                ingredient_category.setdefault(snapshot.names[node], snapshot.categories[node])
+
+        communities = []
+        for positions in members.values():
+            if len(positions) < min_recipes:
+                continue
+            communities.append(cls._describe(
+                snapshot, len(communities), [recipes[p] for p in positions],
+                [recipe_concepts[p] for p in positions], ingredient_category, top_items
+            ))
+
+        logger.info(f"社区统计完成: {len(communities)} 个社区生成摘要")
+        return cls(communities)
+
+    @staticmethod
+    def _describe(snapshot: GraphSnapshot, community_id: int, recipes: List[int],
+                  concepts: List[List[Tuple[str, str]]], ingredient_category: Dict[str, str],
+                  top_items: int) -> Dict[str, Any]:
+        """统计社区内菜谱的特征并生成模板摘要"""
+        properties = snapshot.node_properties
+        cuisines = Counter(properties[r].get("cuisineType") for r in recipes if properties[r].get("cuisineType"))
+        categories = Counter(name for recipe_concepts in concepts for kind, name in set(recipe_concepts)
+                             if kind == "Category")
+        ingredients = Counter(name for recipe_concepts in concepts for kind, name in set(recipe_concepts)
+                              if kind == "Ingredient")
+        tags = Counter(t for r in recipes for t in _split_values(properties[r].get("tags")))
+        difficulties = Counter(properties[r].get("difficulty") for r in recipes if properties[r].get("difficulty"))
+        main_ingredients = [name for name, _ in ingredients.most_common() if ingredient_category.get(name) != "调料"]
+        seasonings = [name for name, _ in ingredients.most_common() if ingredient_category.get(name) == "调料"]
+
+        keywords: Counter = Counter(snapshot.names[r] for r in recipes)
+        for counter in (cuisines, categories, ingredients, tags):
+            keywords.update(counter)
+        keywords.pop("", None)
+
+        def top(counter: Counter) -> str:
+            return "、".join(f"{name}({count})" for name, count in counter.most_common(top_items))
+
+        parts = [f"包含 {len(recipes)} 道菜谱，代表菜谱：{'、'.join(snapshot.names[r] for r in recipes[:top_items])}"]
+        if cuisines:
+            parts.append(f"菜系：{top(cuisines)}")
+        if categories:
+            parts.append(f"分类：{top(categories)}")
+        if main_ingredients:
+            parts.append(f"主要食材：{'、'.join(main_ingredients[:top_items])}")
+        if seasonings:
+            parts.append(f"常用调料：{'、'.join(seasonings[:top_items])}")
+        if tags:
+            parts.append(f"特点：{'、'.join(name for name, _ in tags.most_common(top_items))}")
+        if difficulties:
+            parts.append(f"难度：{top(difficulties)}")
+        profile = "；".join(parts)
+
+        return {
+            "id": community_id,
+            "signature": hashlib.md5(",".join(sorted(snapshot.node_ids[r] for r in recipes)).encode("utf-8")).hexdigest(),
+            "recipe_ids": [snapshot.node_ids[r] for r in recipes],
+            "recipe_count": len(recipes),
+            "keywords": dict(keywords),
+            "profile": profile,
+            "summary": profile
+        }
+
+    def lookup(self, entities: List[str], limit: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        查找与实体相关的社区
+
+        Returns:
+            [(社区, 相关度)]，相关度 = 关键词在社区中的命中次数之和 / 最大值
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for entity in entities:
+            entity = str(entity).strip() if entity else ""
+            if not entity:
+                continue
+            keywords = [entity] if entity in self.keyword_hits else self.keyword_index.search(entity, limit=5)
+            for keyword in keywords:
+                for community_id, count in self.keyword_hits[keyword].items():
+                    scores[community_id] += count
+
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        max_score = ranked[0][1]
+        return [(self.communities[community_id], score / max_score) for community_id, score in ranked]
+
+    # ==================== 持久化 ====================
+
+    def save(self, path: str):
+        """写入临时文件后替换"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"communities": list(self.communities.values())}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"社区摘要已保存: {path} ({len(self)} 个社区)")
+
+    @classmethod
+    def load(cls, path: str) -> 'CommunitySummaryStore':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        store = cls(data["communities"])
+        logger.info(f"加载社区摘要: {len(store)} 个社区")
+        return store
+
+class CommunitySummarizer:
+    """
+    社区摘要LLM润色（可选）
+    以社区统计特征为输入生成摘要，按成员菜谱签名复用上一次的结果，社区未变化时不再调用LLM
+    """
+
+    def __init__(self, config, llm_client):
+        self.config = config
+        self.llm_client = llm_client
+        self.max_workers = getattr(config, 'community_summary_workers', 4)
+        self.rate_limiter = RateLimiter(getattr(config, 'community_summary_rate_limit', 3.0))
+
+    def summarize(self, store: CommunitySummaryStore, previous: Optional[CommunitySummaryStore] = None):
+        """为社区生成摘要（原地更新 community["summary"]）"""
+        cached = {}
+        if previous is not None:
+            cached = {c["signature"]: c["summary"] for c in previous.communities.values() if c["summary"] != c["profile"]}
+
+        pending = []
+        for community in store.communities.values():
+            if community["signature"] in cached:
+                community["summary"] = cached[community["signature"]]
+            else:
+                pending.append(community)
+        logger.info(f"社区摘要: {len(store) - len(pending)} 个复用缓存, {len(pending)} 个需要调用LLM")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="community-summary") as executor:
+            for community, summary in zip(pending, executor.map(self._summarize_one, pending)):
+                if summary:
+                    community["summary"] = summary
+
+    def _summarize_one(self, community: Dict[str, Any]) -> Optional[str]:
+        prompt = f"""
+        下面是一组关联紧密的菜谱及其统计特征：
+        {community["profile"]}
+
+        请用100字以内概括这组菜谱的共同特色（口味、食材、做法、适用场景），只输出概括内容。
+        """
+        self.rate_limiter.acquire()
+        try:
+            response = self.llm_client.chat.completions.create(
+                model=self.config.llm_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=300
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.warning(f"社区 {community['id']} 摘要生成失败，使用统计摘要: {e}")
+            return None
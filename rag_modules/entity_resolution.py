@@ -0,0 +1,142 @@
+"""
+实体解析模块
+在图遍历之前把查询中的实体字符串解析为节点elementId：
+名称/首选术语/同义词精确匹配 -> 内存n-gram子串匹配 -> Neo4j全文索引，
+遍历查询只按elementId定位起点，不再对全部节点做 CONTAINS 扫描
+"""
+
+import logging
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .graph_indexing import KeyNgramIndex
+
+logger = logging.getLogger(__name__)
+
+class EntityResolver:
+    """
+    实体解析器
+
+    特点：
+    1. 启动时建立 术语 -> 节点 映射（名称、preferredTerm、synonyms中的同义词）
+    2. 精确未命中时用n-gram索引做子串匹配，按 完全匹配 > 前缀 > 子串 排序并限制候选数量
+    3. 内存中仍未命中时查询菜谱/食材全文索引
+    """
+
+    # synonyms属性形如 "[{'term': '鸡子', 'language': 'zh', ...}, ...]"
+    SYNONYM_TERM = re.compile(r"""['"]term['"]\s*:\s*['"]([^'"]+)['"]""")
+    FULLTEXT_INDEXES = ("recipe_fulltext_index", "ingredient_fulltext_index")
+    LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+    def __init__(self, driver=None, max_matches: int = 20):
+        self.driver = driver
+        self.max_matches = max_matches
+        self.term_to_nodes: Dict[str, List[str]] = defaultdict(list)
+        self.node_id_to_element: Dict[str, str] = {}
+        self.term_index = KeyNgramIndex()
+
+    def __len__(self) -> int:
+        return len(self.term_to_nodes)
+
+    def add_node(self, element_id: str, properties: Dict[str, Any]):
+        """登记一个节点的全部可检索术语"""
+        node_id = properties.get("nodeId")
+        if node_id:
+            self.node_id_to_element[str(node_id)] = element_id
+
+        terms = {properties.get("name"), properties.get("preferredTerm")}
+        synonyms = properties.get("synonyms")
+        if synonyms:
+            terms.update(self.SYNONYM_TERM.findall(str(synonyms)))
+
+        for term in terms:
+            term = str(term).strip() if term else ""
+            if term:
+                self.term_to_nodes[term].append(element_id)
+                self.term_index.add(term)
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[Tuple[str, Dict[str, Any]]], driver=None,
+                   max_matches: int = 20) -> 'EntityResolver':
+        """由 (elementId, 属性) 序列构建"""
+        resolver = cls(driver, max_matches)
+        for element_id, properties in nodes:
+            resolver.add_node(element_id, properties)
+        logger.info(f"实体解析索引构建完成: {len(resolver)} 个术语")
+        return resolver
+
+    @classmethod
+    def from_neo4j(cls, driver, max_matches: int = 20) -> 'EntityResolver':
+        """启动时读取一次带名称的节点构建（没有内存图快照时使用）"""
+        query = """
+        MATCH (n)
+        WHERE n.name IS NOT NULL
+        RETURN elementId(n) as element_id,
+               n {.name, .nodeId, .preferredTerm, .synonyms} as properties
+        """
+        with driver.session() as session:
+            nodes = [(record["element_id"], record["properties"]) for record in session.run(query)]
+        return cls.from_nodes(nodes, driver, max_matches)
+
+    def resolve(self, entity: str) -> List[str]:
+        """
+        解析单个实体字符串
+
+        Returns:
+            匹配的节点elementId列表（最多max_matches个）
+        """
+        entity = str(entity).strip() if entity else ""
+        if not entity:
+            return []
+
+        element_id = self.node_id_to_element.get(entity)
+        if element_id is not None:
+            return [element_id]
+
+        exact = self.term_to_nodes.get(entity)
+        if exact:
+            return exact[:self.max_matches]
+
+        resolved: Dict[str, None] = {}
+        for term in self.term_index.search(entity, limit=self.max_matches):
+            for element_id in self.term_to_nodes.get(term, ()):
+                resolved.setdefault(element_id, None)
+                if len(resolved) >= self.max_matches:
+                    return list(resolved)
+        if resolved:
+            return list(resolved)
+
+        return self._fulltext_resolve(entity)
+
+    def resolve_all(self, entities: Optional[List[str]]) -> List[str]:
+        """解析多个实体字符串，结果按出现顺序去重"""
+        resolved: Dict[str, None] = {}
+        for entity in entities or []:
+            for element_id in self.resolve(entity):
+                resolved.setdefault(element_id, None)
+        return list(resolved)
+
+    def _fulltext_resolve(self, entity: str) -> List[str]:
+        """内存中未命中时查询菜谱/食材全文索引"""
+        if self.driver is None:
+            return []
+
+        query = """
+        UNWIND $indexes as index_name
+        CALL db.index.fulltext.queryNodes(index_name, $text) YIELD node, score
+        RETURN elementId(node) as element_id, score
+        ORDER BY score DESC
+        LIMIT $limit
+        """
+        try:
+            with self.driver.session() as session:
+                result = session.run(query, {
+                    "indexes": list(self.FULLTEXT_INDEXES),
+                    "text": self.LUCENE_SPECIAL.sub(r"\\\1", entity),
+                    "limit": self.max_matches
+                })
+                return [record["element_id"] for record in result]
+        except Exception as e:
+            logger.warning(f"全文索引实体解析失败 {entity}: {e}")
+            return []
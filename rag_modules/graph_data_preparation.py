@@ -7,9 +7,12 @@ import json
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
-from neo4j import GraphDatabase
 from langchain_core.documents import Document
 
+from .graph_projections import INGREDIENT_FIELDS, RECIPE_FIELDS, STEP_FIELDS, compact, projection
+from .neo4j_pool import Neo4jPool, get_pool
+from .query_constraints import recipe_total_minutes
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -31,7 +34,7 @@ class GraphRelation:
 class GraphDataPreparationModule:
     """图数据库数据准备模块 - 从Neo4j读取数据并转换为文档"""
     
-    def __init__(self, uri: str, user: str, password: str, database: str = "neo4j"):
+    def __init__(self, uri: str, user: str, password: str, database: str = "neo4j", config=None):
         """
         初始化图数据库连接
         
@@ -40,12 +43,14 @@ class GraphDataPreparationModule:
             user: 用户名
             password: 密码
             database: 数据库名称
+            config: 系统配置（提供连接池参数，连接池与检索模块共享）
         """
         self.uri = uri
         self.user = user
         self.password = password
         self.database = database
-        self.driver = None
+        self.config = config
+        self.pool: Optional[Neo4jPool] = None
         self.documents: List[Document] = []
         self.chunks: List[Document] = []
         self.recipes: List[GraphNode] = []
@@ -57,19 +62,13 @@ class GraphDataPreparationModule:
     def _connect(self):
         """建立Neo4j连接"""
         try:
-            self.driver = GraphDatabase.driver(
-                self.uri, 
-                auth=(self.user, self.password),
-                database=self.database
-            )
+            self.pool = get_pool(self.config, uri=self.uri, user=self.user,
+                                 password=self.password, database=self.database)
             logger.info(f"已连接到Neo4j数据库: {self.uri}")
             
             # 测试连接
-            with self.driver.session() as session:
-                result = session.run("RETURN 1 as test")
-                test_result = result.single()
-                if test_result:
-                    logger.info("Neo4j连接测试成功")
+            self.pool.verify()
+            logger.info("Neo4j连接测试成功")
                     
         except Exception as e:
             logger.error(f"连接Neo4j失败: {e}")
@@ -77,8 +76,9 @@ class GraphDataPreparationModule:
     
     def close(self):
         """关闭数据库连接"""
-        if hasattr(self, 'driver') and self.driver:
-            self.driver.close()
+        if getattr(self, 'pool', None):
+            self.pool.release()
+            self.pool = None
             logger.info("Neo4j连接已关闭")
     
     def load_graph_data(self) -> Dict[str, Any]:
@@ -90,15 +90,15 @@ class GraphDataPreparationModule:
         """
         logger.info("正在从Neo4j加载图数据...")
         
-        with self.driver.session() as session:
-            # 加载所有菜谱节点，从Category关系中读取分类信息
-            recipes_query = """
+        with self.pool.session() as session:
+            # 加载所有菜谱节点，从Category关系中读取分类信息（只投影文档和索引用到的属性）
+            recipes_query = f"""
             MATCH (r:Recipe)
             WHERE r.nodeId >= '200000000'
             OPTIONAL MATCH (r)-[:BELONGS_TO_CATEGORY]->(c:Category)
             WITH r, collect(c.name) as categories
             RETURN r.nodeId as nodeId, labels(r) as labels, r.name as name, 
-                   properties(r) as originalProperties,
+                   {projection("r", RECIPE_FIELDS)} as originalProperties,
                    CASE WHEN size(categories) > 0 
                         THEN categories[0] 
                         ELSE COALESCE(r.category, '未知') END as mainCategory,
@@ -112,7 +112,7 @@ class GraphDataPreparationModule:
             self.recipes = []
             for record in result:
                 # 合并原始属性和新的分类信息
-                properties = dict(record["originalProperties"])
+                properties = compact(record["originalProperties"])
                 properties["category"] = record["mainCategory"]
                 properties["all_categories"] = record["allCategories"]
                 
@@ -127,11 +127,11 @@ class GraphDataPreparationModule:
             logger.info(f"加载了 {len(self.recipes)} 个菜谱节点")
             
             # 加载所有食材节点
-            ingredients_query = """
+            ingredients_query = f"""
             MATCH (i:Ingredient)
             WHERE i.nodeId >= '200000000'
             RETURN i.nodeId as nodeId, labels(i) as labels, i.name as name,
-                   properties(i) as properties
+                   {projection("i", INGREDIENT_FIELDS)} as properties
             ORDER BY i.nodeId
             """
             
@@ -142,18 +142,18 @@ class GraphDataPreparationModule:
                     node_id=record["nodeId"],
                     labels=record["labels"],
                     name=record["name"],
-                    properties=record["properties"]
+                    properties=compact(record["properties"])
                 )
                 self.ingredients.append(node)
             
             logger.info(f"加载了 {len(self.ingredients)} 个食材节点")
             
             # 加载所有烹饪步骤节点
-            steps_query = """
+            steps_query = f"""
             MATCH (s:CookingStep)
             WHERE s.nodeId >= '200000000'
             RETURN s.nodeId as nodeId, labels(s) as labels, s.name as name,
-                   properties(s) as properties
+                   {projection("s", STEP_FIELDS)} as properties
             ORDER BY s.nodeId
             """
             
@@ -164,7 +164,7 @@ class GraphDataPreparationModule:
                     node_id=record["nodeId"],
                     labels=record["labels"],
                     name=record["name"],
-                    properties=record["properties"]
+                    properties=compact(record["properties"])
                 )
                 self.cooking_steps.append(node)
             
@@ -187,7 +187,7 @@ class GraphDataPreparationModule:
         
         documents = []
         
-        with self.driver.session() as session:
+        with self.pool.session() as session:
             for recipe in self.recipes:
                 try:
                     recipe_id = recipe.node_id
@@ -294,6 +294,8 @@ class GraphDataPreparationModule:
                             "prep_time": recipe.properties.get("prepTime", ""),
                             "cook_time": recipe.properties.get("cookTime", ""),
                             "servings": recipe.properties.get("servings", ""),
+                            "total_minutes": recipe_total_minutes(recipe.properties),
+                            "calories": recipe.properties.get("calories"),
                             "ingredients_count": len(ingredients_info),
                             "steps_count": len(steps_info),
                             "doc_type": "recipe",
@@ -5,14 +5,18 @@ K: 索引键（简短词汇或短语）
 V: 详细描述段落（包含相关文本片段）
 """
 
-import json
+import bisect
+import heapq
 import logging
-from typing import Dict, List, Tuple, Any, Optional
-from dataclasses import dataclass
+from array import array
+from typing import Dict, List, Tuple, Any, Iterable, Iterator, Optional
+from dataclasses import dataclass, field
 from collections import defaultdict
 
 from langchain_core.documents import Document
 
+from .relation_key_enrichment import RelationKeyEnricher
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -23,6 +27,15 @@ class EntityKeyValue:
     value_content: str     # 详细描述内容
     entity_type: str       # 实体类型 (Recipe, Ingredient, CookingStep)
     metadata: Dict[str, Any]
+    merged_contents: List[str] = field(default_factory=list)  # 同名重复实体的内容，读取时再拼接
+    merged_from: List[str] = field(default_factory=list)      # 与merged_contents一一对应的重复实体ID
+    
+    @property
+    def full_content(self) -> str:
+        """完整描述：主内容 + 去重时合并的补充信息（按需拼接）"""
+        if not self.merged_contents:
+            return self.value_content
+        return "\n\n".join([self.value_content] + [f"补充信息: {content}" for content in self.merged_contents])
 
 @dataclass 
 class RelationKeyValue:
@@ -35,6 +48,153 @@ class RelationKeyValue:
     target_entity: str     # 目标实体
     metadata: Dict[str, Any]
 
+def _new_posting() -> array:
+    """新建倒排表：有序的无符号32位整数ID数组"""
+    return array('I')
+
+def posting_add(posting: array, value: int):
+    """向有序倒排表插入ID（通常是追加，乱序时二分插入）"""
+    if not posting or posting[-1] < value:
+        posting.append(value)
+        return
+    index = bisect.bisect_left(posting, value)
+    if index == len(posting) or posting[index] != value:
+        posting.insert(index, value)
+
+def posting_remove(posting: array, value: int) -> bool:
+    """从有序倒排表删除ID，返回是否删除成功"""
+    index = bisect.bisect_left(posting, value)
+    if index < len(posting) and posting[index] == value:
+        del posting[index]
+        return True
+    return False
+
+def intersect_postings(postings: List[array]) -> array:
+    """
+    多个有序倒排表求交集
+    从最短的表开始，对较长的表用二分跳跃查找
+    """
+    if not postings:
+        return _new_posting()
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for posting in postings[1:]:
+        if not result:
+            break
+        merged = _new_posting()
+        start = 0
+        for value in result:
+            start = bisect.bisect_left(posting, value, start)
+            if start == len(posting):
+                break
+            if posting[start] == value:
+                merged.append(value)
+        result = merged
+    return array('I', result)
+
+def union_postings(postings: List[array]) -> array:
+    """多个有序倒排表求并集（多路归并去重）"""
+    result = _new_posting()
+    for value in heapq.merge(*postings):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+class KeyNgramIndex:
+    """
+    索引键的n-gram倒排索引
+    对每个键的字符unigram和bigram建立倒排表，支持子串和前缀匹配，
+    匹配结果按 完全匹配 > 前缀匹配 > 子串匹配、键长度差 排序
+    """
+
+    def __init__(self):
+        self.keys: List[Optional[str]] = []  # 已删除的键置为None，其ID留给后续添加的键复用
+        self._key_ids: Dict[str, int] = {}
+        self._free_ids: List[int] = []
+        self._postings: Dict[str, array] = defaultdict(_new_posting)
+
+    def __len__(self) -> int:
+        return len(self._key_ids)
+
+    @staticmethod
+    def _grams(text: str) -> set:
+        """字符unigram + bigram"""
+        grams = set(text)
+        grams.update(text[i:i + 2] for i in range(len(text) - 1))
+        return grams
+
+    @staticmethod
+    def _query_grams(text: str) -> set:
+        """查询只需bigram（单字查询使用unigram）即可约束候选"""
+        if len(text) == 1:
+            return {text}
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+
+    def add(self, key: str):
+        """添加索引键（重复添加忽略）"""
+        if not key or key in self._key_ids:
+            return
+        if self._free_ids:
+            key_id = self._free_ids.pop()
+            self.keys[key_id] = key
+        else:
+            key_id = len(self.keys)
+            self.keys.append(key)
+        self._key_ids[key] = key_id
+        for gram in self._grams(key):
+            posting_add(self._postings[gram], key_id)
+
+    def remove(self, key: str):
+        """删除索引键：从各n-gram倒排表中移除其ID（空表直接删除），ID回收复用"""
+        key_id = self._key_ids.pop(key, None)
+        if key_id is None:
+            return
+        self.keys[key_id] = None
+        self._free_ids.append(key_id)
+        for gram in self._grams(key):
+            posting = self._postings.get(gram)
+            if posting is not None and posting_remove(posting, key_id) and not posting:
+                del self._postings[gram]
+
+    def clear(self):
+        self.keys.clear()
+        self._key_ids.clear()
+        self._free_ids.clear()
+        self._postings.clear()
+
+    def search(self, query: str, limit: int = 5) -> List[str]:
+        """
+        查找包含query的索引键
+
+        Args:
+            query: 查询词
+            limit: 最多返回的键数量
+
+        Returns:
+            按匹配程度排序的索引键列表
+        """
+        if not query:
+            return []
+
+        postings = []
+        for gram in self._query_grams(query):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        # 求完整交集（截断放在校验和排序之后，避免丢掉后加入的完全/前缀匹配）
+        ranked = []
+        for key_id in intersect_postings(postings):
+            key = self.keys[key_id]
+            position = key.find(query)
+            if position < 0:
+                continue
+            match_rank = 0 if key == query else (1 if position == 0 else 2)
+            ranked.append((match_rank, len(key) - len(query), key))
+
+        return [key for _, _, key in heapq.nsmallest(limit, ranked)]
+
 class GraphIndexingModule:
     """
     图索引模块
@@ -53,9 +213,32 @@ class GraphIndexingModule:
         self.entity_kv_store: Dict[str, EntityKeyValue] = {}
         self.relation_kv_store: Dict[str, RelationKeyValue] = {}
         
-        # 索引映射：key -> entity/relation IDs
-        self.key_to_entities: Dict[str, List[str]] = defaultdict(list)
-        self.key_to_relations: Dict[str, List[str]] = defaultdict(list)
+        # 索引映射：key -> 有序的整数ID倒排表（array('I')）
+        self.key_to_entities: Dict[str, array] = defaultdict(_new_posting)
+        self.key_to_relations: Dict[str, array] = defaultdict(_new_posting)
+        
+        # 稠密整数ID与实体/关系ID的双向映射
+        self.entity_ids: List[str] = []
+        self.entity_int_ids: Dict[str, int] = {}
+        self.relation_ids: List[str] = []
+        self.relation_int_ids: Dict[str, int] = {}
+        
+        # 索引键的n-gram倒排索引（子串/前缀模糊匹配）
+        self.entity_key_index = KeyNgramIndex()
+        self.relation_key_index = KeyNgramIndex()
+        
+        # 插入时去重的状态
+        self.entity_name_to_id: Dict[str, str] = {}   # 实体名称 -> 规范实体ID
+        self.entity_aliases: Dict[str, str] = {}      # 被合并的重复实体ID -> 规范实体ID
+        self.relation_signatures: Dict[Tuple[str, str, str], str] = {}  # (源, 目标, 类型) -> 关系ID
+        self.duplicate_relation_count = 0
+        self._relation_seq = 0
+        
+        # LLM关系索引键增强器（按需创建）
+        self.relation_key_enricher: Optional[RelationKeyEnricher] = None
+        
+        # 实体ID -> 相连的关系ID（增量更新时定位受影响的关系）
+        self.entity_relations: Dict[str, List[str]] = defaultdict(list)
         
     def create_entity_key_values(self, recipes: List[Any], ingredients: List[Any], 
                                 cooking_steps: List[Any]) -> Dict[str, EntityKeyValue]:
@@ -65,160 +248,169 @@ class GraphIndexingModule:
         """
         logger.info("开始创建实体键值对...")
         
-        # 处理菜谱实体
-        for recipe in recipes:
-            entity_id = recipe.node_id
-            entity_name = recipe.name or f"菜谱_{entity_id}"
-            
-            # 构建详细内容
+        for entity_type, nodes in (("Recipe", recipes), ("Ingredient", ingredients), ("CookingStep", cooking_steps)):
+            for node in nodes:
+                self._insert_entity(node.node_id, self._build_entity_key_value(node, entity_type))
+        
+        logger.info(f"实体键值对创建完成，共 {len(self.entity_kv_store)} 个实体，合并 {len(self.entity_aliases)} 个同名实体")
+        return self.entity_kv_store
+    
+    def _build_entity_key_value(self, node: Any, entity_type: str) -> EntityKeyValue:
+        """
+        根据图节点构建实体键值对
+        每个实体使用其名称作为唯一索引键
+        """
+        entity_id = node.node_id
+        props = getattr(node, 'properties', {}) or {}
+        
+        if entity_type == "Recipe":
+            # 处理菜谱实体
+            entity_name = node.name or f"菜谱_{entity_id}"
             content_parts = [f"菜品名称: {entity_name}"]
-            
-            if hasattr(recipe, 'properties'):
-                props = recipe.properties
-                if props.get('description'):
-                    content_parts.append(f"描述: {props['description']}")
-                if props.get('category'):
-                    content_parts.append(f"分类: {props['category']}")
-                if props.get('cuisineType'):
-                    content_parts.append(f"菜系: {props['cuisineType']}")
-                if props.get('difficulty'):
-                    content_parts.append(f"难度: {props['difficulty']}")
-                if props.get('cookingTime'):
-                    content_parts.append(f"制作时间: {props['cookingTime']}")
-            
-            # 创建键值对
-            entity_kv = EntityKeyValue(
-                entity_name=entity_name,
-                index_keys=[entity_name],  # 使用名称作为唯一索引键
-                value_content='\n'.join(content_parts),
-                entity_type="Recipe",
-                metadata={
-                    "node_id": entity_id,
-                    "properties": getattr(recipe, 'properties', {})
-                }
-            )
-            
-            self.entity_kv_store[entity_id] = entity_kv
-            self.key_to_entities[entity_name].append(entity_id)
+            if props.get('description'):
+                content_parts.append(f"描述: {props['description']}")
+            if props.get('category'):
+                content_parts.append(f"分类: {props['category']}")
+            if props.get('cuisineType'):
+                content_parts.append(f"菜系: {props['cuisineType']}")
+            if props.get('difficulty'):
+                content_parts.append(f"难度: {props['difficulty']}")
+            if props.get('cookingTime'):
+                content_parts.append(f"制作时间: {props['cookingTime']}")
         
-        # 处理食材实体
-        for ingredient in ingredients:
-            entity_id = ingredient.node_id
-            entity_name = ingredient.name or f"食材_{entity_id}"
-            
+        elif entity_type == "Ingredient":
+            # 处理食材实体
+            entity_name = node.name or f"食材_{entity_id}"
             content_parts = [f"食材名称: {entity_name}"]
-            
-            if hasattr(ingredient, 'properties'):
-                props = ingredient.properties
-                if props.get('category'):
-                    content_parts.append(f"类别: {props['category']}")
-                if props.get('nutrition'):
-                    content_parts.append(f"营养信息: {props['nutrition']}")
-                if props.get('storage'):
-                    content_parts.append(f"储存方式: {props['storage']}")
-            
-            entity_kv = EntityKeyValue(
-                entity_name=entity_name,
-                index_keys=[entity_name],
-                value_content='\n'.join(content_parts),
-                entity_type="Ingredient",
-                metadata={
-                    "node_id": entity_id,
-                    "properties": getattr(ingredient, 'properties', {})
-                }
-            )
-            
-            self.entity_kv_store[entity_id] = entity_kv
-            self.key_to_entities[entity_name].append(entity_id)
+            if props.get('category'):
+                content_parts.append(f"类别: {props['category']}")
+            if props.get('nutrition'):
+                content_parts.append(f"营养信息: {props['nutrition']}")
+            if props.get('storage'):
+                content_parts.append(f"储存方式: {props['storage']}")
         
-        # 处理烹饪步骤实体
-        for step in cooking_steps:
-            entity_id = step.node_id
+        elif entity_type == "CookingStep":
+            # 处理烹饪步骤实体
             entity_name = f"步骤_{entity_id}"
-            
             content_parts = [f"烹饪步骤: {entity_name}"]
-            
-            if hasattr(step, 'properties'):
-                props = step.properties
-                if props.get('description'):
-                    content_parts.append(f"步骤描述: {props['description']}")
-                if props.get('order'):
-                    content_parts.append(f"步骤顺序: {props['order']}")
-                if props.get('technique'):
-                    content_parts.append(f"技巧: {props['technique']}")
-                if props.get('time'):
-                    content_parts.append(f"时间: {props['time']}")
-            
-            entity_kv = EntityKeyValue(
-                entity_name=entity_name,
-                index_keys=[entity_name],
-                value_content='\n'.join(content_parts),
-                entity_type="CookingStep", 
-                metadata={
-                    "node_id": entity_id,
-                    "properties": getattr(step, 'properties', {})
-                }
-            )
-            
-            self.entity_kv_store[entity_id] = entity_kv
-            self.key_to_entities[entity_name].append(entity_id)
+            if props.get('description'):
+                content_parts.append(f"步骤描述: {props['description']}")
+            if props.get('order'):
+                content_parts.append(f"步骤顺序: {props['order']}")
+            if props.get('technique'):
+                content_parts.append(f"技巧: {props['technique']}")
+            if props.get('time'):
+                content_parts.append(f"时间: {props['time']}")
         
-        logger.info(f"实体键值对创建完成，共 {len(self.entity_kv_store)} 个实体")
-        return self.entity_kv_store
+        else:
+            raise ValueError(f"不支持的实体类型: {entity_type}")
+        
+        # 创建键值对
+        return EntityKeyValue(
+            entity_name=entity_name,
+            index_keys=[entity_name],  # 使用名称作为唯一索引键
+            value_content='\n'.join(content_parts),
+            entity_type=entity_type,
+            metadata={
+                "node_id": entity_id,
+                "properties": props
+            }
+        )
     
-    def create_relation_key_values(self, relationships: List[Tuple[str, str, str]]) -> Dict[str, RelationKeyValue]:
+    def create_relation_key_values(self, relationships: Iterable[Tuple[str, str, str]]) -> Dict[str, RelationKeyValue]:
         """
         为关系创建键值对结构
         关系可能有多个索引键，包含从LLM增强的全局主题
+        relationships 可以是生成器，边读取边建立索引
         """
         logger.info("开始创建关系键值对...")
         
-        for i, (source_id, relation_type, target_id) in enumerate(relationships):
-            relation_id = f"rel_{i}_{source_id}_{target_id}"
-            
-            # 获取源实体和目标实体信息
-            source_entity = self.entity_kv_store.get(source_id)
-            target_entity = self.entity_kv_store.get(target_id)
-            
-            if not source_entity or not target_entity:
-                continue
-            
-            # 构建关系描述
-            content_parts = [
-                f"关系类型: {relation_type}",
-                f"源实体: {source_entity.entity_name} ({source_entity.entity_type})",
-                f"目标实体: {target_entity.entity_name} ({target_entity.entity_type})"
-            ]
-            
-            # 生成多个索引键（包含全局主题）
-            index_keys = self._generate_relation_index_keys(
-                source_entity, target_entity, relation_type
-            )
-            
-            # 创建关系键值对
-            relation_kv = RelationKeyValue(
-                relation_id=relation_id,
-                index_keys=index_keys,
-                value_content='\n'.join(content_parts),
-                relation_type=relation_type,
-                source_entity=source_id,
-                target_entity=target_id,
-                metadata={
-                    "source_name": source_entity.entity_name,
-                    "target_name": target_entity.entity_name,
-                    "created_from_graph": True
-                }
-            )
-            
-            self.relation_kv_store[relation_id] = relation_kv
-            
-            # 为每个索引键建立映射
-            for key in index_keys:
-                self.key_to_relations[key].append(relation_id)
+        for source_id, relation_type, target_id in relationships:
+            self._insert_relation(source_id, relation_type, target_id)
+        
+        # 使用LLM增强关系索引键（可选）
+        if getattr(self.config, 'enable_llm_relation_keys', False):
+            self.enhance_relation_keys()
         
         logger.info(f"关系键值对创建完成，共 {len(self.relation_kv_store)} 个关系")
         return self.relation_kv_store
     
+    def _insert_relation(self, raw_source_id: str, relation_type: str, raw_target_id: str) -> Optional[str]:
+        """
+        插入关系并在插入时去重
+        返回关系ID；端点不存在时返回None，重复关系返回已有关系ID
+        """
+        # 端点映射到去重后的规范实体（原始节点ID记录在metadata中，供增量更新时重新映射）
+        source_id = self.entity_aliases.get(raw_source_id, raw_source_id)
+        target_id = self.entity_aliases.get(raw_target_id, raw_target_id)
+        
+        if source_id not in self.entity_kv_store or target_id not in self.entity_kv_store:
+            return None
+        
+        # 关系去重：相同的 源-目标-类型 只保留第一条
+        signature = (source_id, target_id, relation_type)
+        existing_id = self.relation_signatures.get(signature)
+        if existing_id is not None:
+            # 记录重复关系的原始端点，规范关系的来源节点被删除时由它接替
+            existing_kv = self.relation_kv_store[existing_id]
+            endpoints = (raw_source_id, raw_target_id)
+            if endpoints not in self._relation_endpoints(existing_kv):
+                existing_kv.metadata.setdefault("duplicate_endpoints", []).append(endpoints)
+                self.duplicate_relation_count += 1
+            return existing_id
+        
+        relation_id = f"rel_{self._relation_seq}_{source_id}_{target_id}"
+        self._relation_seq += 1
+        
+        relation_kv = self._build_relation_key_value(relation_id, source_id, relation_type, target_id)
+        relation_kv.metadata["source_node_id"] = raw_source_id
+        relation_kv.metadata["target_node_id"] = raw_target_id
+        self.relation_kv_store[relation_id] = relation_kv
+        self.relation_signatures[signature] = relation_id
+        self.entity_relations[source_id].append(relation_id)
+        if target_id != source_id:
+            self.entity_relations[target_id].append(relation_id)
+        self._assign_int_id(relation_id, self.relation_ids, self.relation_int_ids)
+        
+        # 为每个索引键建立映射
+        for key in relation_kv.index_keys:
+            self._add_relation_key(key, relation_id)
+        return relation_id
+    
+    def _build_relation_key_value(self, relation_id: str, source_id: str,
+                                  relation_type: str, target_id: str) -> RelationKeyValue:
+        """根据两端的实体键值对构建关系键值对"""
+        # 获取源实体和目标实体信息
+        source_entity = self.entity_kv_store[source_id]
+        target_entity = self.entity_kv_store[target_id]
+        
+        # 构建关系描述
+        content_parts = [
+            f"关系类型: {relation_type}",
+            f"源实体: {source_entity.entity_name} ({source_entity.entity_type})",
+            f"目标实体: {target_entity.entity_name} ({target_entity.entity_type})"
+        ]
+        
+        # 生成多个索引键（包含全局主题）
+        index_keys = self._generate_relation_index_keys(
+            source_entity, target_entity, relation_type
+        )
+        
+        # 创建关系键值对
+        return RelationKeyValue(
+            relation_id=relation_id,
+            index_keys=index_keys,
+            value_content='\n'.join(content_parts),
+            relation_type=relation_type,
+            source_entity=source_id,
+            target_entity=target_id,
+            metadata={
+                "source_name": source_entity.entity_name,
+                "target_name": target_entity.entity_name,
+                "created_from_graph": True
+            }
+        )
+    
     def _generate_relation_index_keys(self, source_entity: EntityKeyValue, 
                                     target_entity: EntityKeyValue, 
                                     relation_type: str) -> List[str]:
@@ -252,125 +444,355 @@ class GraphIndexingModule:
                 target_entity.entity_name
             ])
         
-        # 使用LLM增强关系索引键（可选）
-        if getattr(self.config, 'enable_llm_relation_keys', False):
-            enhanced_keys = self._llm_enhance_relation_keys(source_entity, target_entity, relation_type)
-            keys.extend(enhanced_keys)
+        # LLM增强的主题键在关系创建完成后批量生成，见 enhance_relation_keys
         
         # 去重并返回
         return list(set(keys))
     
-    def _llm_enhance_relation_keys(self, source_entity: EntityKeyValue, 
-                                 target_entity: EntityKeyValue, 
-                                 relation_type: str) -> List[str]:
+    def enhance_relation_keys(self, relation_ids: Optional[List[str]] = None):
         """
-        使用LLM增强关系索引键，生成全局主题
+        使用LLM增强关系索引键，生成全局主题（批量、并发、带磁盘缓存）
+        
+        Args:
+            relation_ids: 需要增强的关系ID，默认全部关系
         """
-        prompt = f"""
-        分析以下实体关系，生成相关的主题关键词：
+        if self.relation_key_enricher is None:
+            self.relation_key_enricher = RelationKeyEnricher(self.config, self.llm_client)
         
-        源实体: {source_entity.entity_name} ({source_entity.entity_type})
-        目标实体: {target_entity.entity_name} ({target_entity.entity_type})
-        关系类型: {relation_type}
+        relation_ids = list(self.relation_kv_store) if relation_ids is None else relation_ids
+        descriptors = {}
+        for relation_id in relation_ids:
+            relation_kv = self.relation_kv_store.get(relation_id)
+            if relation_kv is None:
+                continue
+            source_entity = self.entity_kv_store[relation_kv.source_entity]
+            target_entity = self.entity_kv_store[relation_kv.target_entity]
+            descriptors[relation_id] = (source_entity.entity_name, source_entity.entity_type,
+                                        target_entity.entity_name, target_entity.entity_type,
+                                        relation_kv.relation_type)
         
-        请生成3-5个相关的主题关键词，用于索引和检索。
-        返回JSON格式：{{"keywords": ["关键词1", "关键词2", "关键词3"]}}
+        enhanced = self.relation_key_enricher.enrich(list(descriptors.values()))
+        
+        added = 0
+        for relation_id, (source_name, _, target_name, _, relation_type) in descriptors.items():
+            relation_kv = self.relation_kv_store[relation_id]
+            for key in enhanced.get((source_name, target_name, relation_type), []):
+                if key and key not in relation_kv.index_keys:
+                    relation_kv.index_keys.append(key)
+                    self._add_relation_key(key, relation_id)
+                    added += 1
+        
+        logger.info(f"LLM增强关系索引键完成: 新增 {added} 个索引键")
+    
+    def _insert_entity(self, entity_id: str, entity_kv: EntityKeyValue) -> str:
+        """
+        插入实体并在插入时去重
+        同名实体合并到第一个出现的规范实体上（内容追加到列表，读取时再拼接），
+        返回实体最终对应的规范ID
         """
+        canonical_id = self.entity_name_to_id.get(entity_kv.entity_name)
+        if canonical_id is not None and canonical_id != entity_id:
+            canonical_kv = self.entity_kv_store[canonical_id]
+            canonical_kv.merged_contents.append(entity_kv.value_content)
+            canonical_kv.merged_from.append(entity_id)
+            self.entity_aliases[entity_id] = canonical_id
+            return canonical_id
         
-        try:
-            response = self.llm_client.chat.completions.create(
-                model=self.config.llm_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=200
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            return result.get("keywords", [])
-            
-        except Exception as e:
-            logger.error(f"LLM增强关系索引键失败: {e}")
-            return []
+        self.entity_name_to_id[entity_kv.entity_name] = entity_id
+        self.entity_kv_store[entity_id] = entity_kv
+        self._assign_int_id(entity_id, self.entity_ids, self.entity_int_ids)
+        for key in entity_kv.index_keys:
+            self._add_entity_key(key, entity_id)
+        return entity_id
     
     def deduplicate_entities_and_relations(self):
         """
         去重相同的实体和关系，优化图操作
+        去重已在插入时通过 名称->规范ID 和 关系签名 完成，这里只汇总结果
         """
-        logger.info("开始去重实体和关系...")
-        
-        # 实体去重：基于名称
-        name_to_entities = defaultdict(list)
-        for entity_id, entity_kv in self.entity_kv_store.items():
-            name_to_entities[entity_kv.entity_name].append(entity_id)
-        
-        # 合并重复实体
-        entities_to_remove = []
-        for name, entity_ids in name_to_entities.items():
-            if len(entity_ids) > 1:
-                # 保留第一个，合并其他的内容
-                primary_id = entity_ids[0]
-                primary_entity = self.entity_kv_store[primary_id]
-                
-                for entity_id in entity_ids[1:]:
-                    duplicate_entity = self.entity_kv_store[entity_id]
-                    # 合并内容
-                    primary_entity.value_content += f"\n\n补充信息: {duplicate_entity.value_content}"
-                    # 标记删除
-                    entities_to_remove.append(entity_id)
-        
-        # 删除重复实体
-        for entity_id in entities_to_remove:
-            del self.entity_kv_store[entity_id]
-        
-        # 关系去重：基于源-目标-类型
-        relation_signature_to_ids = defaultdict(list)
-        for relation_id, relation_kv in self.relation_kv_store.items():
-            signature = f"{relation_kv.source_entity}_{relation_kv.target_entity}_{relation_kv.relation_type}"
-            relation_signature_to_ids[signature].append(relation_id)
-        
-        # 合并重复关系
-        relations_to_remove = []
-        for signature, relation_ids in relation_signature_to_ids.items():
-            if len(relation_ids) > 1:
-                # 保留第一个，删除其他
-                for relation_id in relation_ids[1:]:
-                    relations_to_remove.append(relation_id)
-        
-        # 删除重复关系
-        for relation_id in relations_to_remove:
-            del self.relation_kv_store[relation_id]
-        
-        # 重建索引映射
-        self._rebuild_key_mappings()
-        
-        logger.info(f"去重完成 - 删除了 {len(entities_to_remove)} 个重复实体，{len(relations_to_remove)} 个重复关系")
-    
-    def _rebuild_key_mappings(self):
-        """重建键到实体/关系的映射"""
-        self.key_to_entities.clear()
-        self.key_to_relations.clear()
-        
-        # 重建实体映射
-        for entity_id, entity_kv in self.entity_kv_store.items():
-            for key in entity_kv.index_keys:
-                self.key_to_entities[key].append(entity_id)
-        
-        # 重建关系映射
-        for relation_id, relation_kv in self.relation_kv_store.items():
-            for key in relation_kv.index_keys:
-                self.key_to_relations[key].append(relation_id)
-    
-    def get_entities_by_key(self, key: str) -> List[EntityKeyValue]:
-        """根据索引键获取实体"""
-        entity_ids = self.key_to_entities.get(key, [])
-        return [self.entity_kv_store[eid] for eid in entity_ids if eid in self.entity_kv_store]
-    
-    def get_relations_by_key(self, key: str) -> List[RelationKeyValue]:
-        """根据索引键获取关系"""
-        relation_ids = self.key_to_relations.get(key, [])
-        return [self.relation_kv_store[rid] for rid in relation_ids if rid in self.relation_kv_store]
+        logger.info(f"去重完成 - 合并了 {len(self.entity_aliases)} 个重复实体，"
+                    f"跳过了 {self.duplicate_relation_count} 个重复关系")
     
-
+    # ==================== 增量更新 ====================
+    
+    def upsert_entity(self, node: Any, entity_type: str) -> str:
+        """
+        新增或更新单个实体，同步维护索引键倒排表和去重状态
+        
+        Args:
+            node: 图节点（需要 node_id / name / properties）
+            entity_type: 实体类型 (Recipe, Ingredient, CookingStep)
+            
+        Returns:
+            实体最终对应的规范ID（同名时为已有实体的ID）
+        """
+        entity_id = node.node_id
+        entity_kv = self._build_entity_key_value(node, entity_type)
+        old_kv = self.entity_kv_store.get(entity_id)
+        
+        # 名称和类型不变的规范实体：就地替换内容，索引键和关系都不受影响
+        if old_kv is not None and old_kv.entity_name == entity_kv.entity_name \
+                and old_kv.entity_type == entity_kv.entity_type:
+            entity_kv.merged_contents = old_kv.merged_contents
+            entity_kv.merged_from = old_kv.merged_from
+            self._reindex_keys(entity_id, old_kv.index_keys, entity_kv.index_keys,
+                               self._add_entity_key, self._remove_entity_key)
+            self.entity_kv_store[entity_id] = entity_kv
+            return entity_id
+        
+        # 其余情况：摘下该节点自身的关系，移除旧实体后重新插入，再恢复关系
+        own_relations = []
+        if old_kv is not None or entity_id in self.entity_aliases:
+            own_relations = self.remove_node_relations(entity_id)
+            self.remove_entity(entity_id)
+        
+        canonical_id = self._insert_entity(entity_id, entity_kv)
+        for raw_source_id, relation_type, raw_target_id in own_relations:
+            self._insert_relation(raw_source_id, relation_type, raw_target_id)
+        return canonical_id
+    
+    def remove_entity(self, entity_id: str) -> bool:
+        """
+        删除单个实体及其关系
+        删除的是规范实体且存在同名重复实体时，由第一个重复实体接替，其关系改挂到新的规范实体上
+        """
+        canonical_id = self.entity_aliases.pop(entity_id, None)
+        if canonical_id is not None:
+            # 被合并的重复实体：撤销合并，删除以它为端点的关系
+            canonical_kv = self.entity_kv_store[canonical_id]
+            index = canonical_kv.merged_from.index(entity_id)
+            del canonical_kv.merged_from[index]
+            del canonical_kv.merged_contents[index]
+            self.remove_node_relations(entity_id)
+            return True
+        
+        entity_kv = self.entity_kv_store.pop(entity_id, None)
+        if entity_kv is None:
+            return False
+        
+        for key in entity_kv.index_keys:
+            self._remove_entity_key(key, entity_id)
+        if self.entity_name_to_id.get(entity_kv.entity_name) == entity_id:
+            del self.entity_name_to_id[entity_kv.entity_name]
+        
+        # 同名重复实体中的第一个接替为规范实体
+        if entity_kv.merged_from:
+            successor_id = entity_kv.merged_from[0]
+            successor_kv = EntityKeyValue(
+                entity_name=entity_kv.entity_name,
+                index_keys=list(entity_kv.index_keys),
+                value_content=entity_kv.merged_contents[0],
+                entity_type=entity_kv.entity_type,
+                metadata={**entity_kv.metadata, "node_id": successor_id},
+                merged_contents=entity_kv.merged_contents[1:],
+                merged_from=entity_kv.merged_from[1:]
+            )
+            del self.entity_aliases[successor_id]
+            for alias_id in successor_kv.merged_from:
+                self.entity_aliases[alias_id] = successor_id
+            self._insert_entity(successor_id, successor_kv)
+        
+        # 以被删节点为端点的关系删除，其余（来自重复实体或插入时被去重的）来源重新映射到接替者
+        for relation_id in list(self.entity_relations.pop(entity_id, ())):
+            relation_kv = self.relation_kv_store.get(relation_id)
+            if relation_kv is None:
+                continue
+            endpoints = self._relation_endpoints(relation_kv)
+            self.remove_relation(relation_id)
+            for raw_source_id, raw_target_id in endpoints:
+                if entity_id not in (raw_source_id, raw_target_id):
+                    self._insert_relation(raw_source_id, relation_kv.relation_type, raw_target_id)
+        return True
+    
+    def upsert_relation(self, source_id: str, relation_type: str, target_id: str,
+                        enhance: bool = True) -> Optional[str]:
+        """
+        新增或刷新单个关系
+        已存在时按两端实体的当前信息重新生成内容和索引键；端点不存在时返回None
+        批量更新时传 enhance=False，收集关系ID后统一调用 enhance_relation_keys
+        """
+        signature = (self.entity_aliases.get(source_id, source_id), 
+                     self.entity_aliases.get(target_id, target_id), 
+                     relation_type)
+        relation_id = self.relation_signatures.get(signature)
+        if relation_id is None:
+            relation_id = self._insert_relation(source_id, relation_type, target_id)
+            if relation_id and enhance and getattr(self.config, 'enable_llm_relation_keys', False):
+                self.enhance_relation_keys([relation_id])
+            return relation_id
+        
+        old_kv = self.relation_kv_store[relation_id]
+        relation_kv = self._build_relation_key_value(relation_id, signature[0], relation_type, signature[1])
+        endpoints = self._relation_endpoints(old_kv)
+        if (source_id, target_id) not in endpoints:
+            endpoints.append((source_id, target_id))
+        relation_kv.metadata["source_node_id"], relation_kv.metadata["target_node_id"] = endpoints[0]
+        if len(endpoints) > 1:
+            relation_kv.metadata["duplicate_endpoints"] = endpoints[1:]
+        self._reindex_keys(relation_id, old_kv.index_keys, relation_kv.index_keys,
+                           self._add_relation_key, self._remove_relation_key)
+        self.relation_kv_store[relation_id] = relation_kv
+        if enhance and getattr(self.config, 'enable_llm_relation_keys', False):
+            self.enhance_relation_keys([relation_id])
+        return relation_id
+    
+    def remove_relation(self, relation_id: str) -> bool:
+        """删除单个关系"""
+        relation_kv = self.relation_kv_store.pop(relation_id, None)
+        if relation_kv is None:
+            return False
+        
+        for key in relation_kv.index_keys:
+            self._remove_relation_key(key, relation_id)
+        
+        signature = (relation_kv.source_entity, relation_kv.target_entity, relation_kv.relation_type)
+        if self.relation_signatures.get(signature) == relation_id:
+            del self.relation_signatures[signature]
+        
+        for endpoint in {relation_kv.source_entity, relation_kv.target_entity}:
+            relation_ids = self.entity_relations.get(endpoint)
+            if relation_ids and relation_id in relation_ids:
+                relation_ids.remove(relation_id)
+        return True
+    
+    def remove_node_relations(self, node_id: str) -> List[Tuple[str, str, str]]:
+        """
+        删除以某个原始节点为端点的关系（节点可以是被合并的重复实体）
+        返回被删除关系的 (原始源ID, 类型, 原始目标ID)，便于实体更新后恢复
+        """
+        canonical_id = self.entity_aliases.get(node_id, node_id)
+        detached = []
+        for relation_id in list(self.entity_relations.get(canonical_id, ())):
+            relation_kv = self.relation_kv_store[relation_id]
+            endpoints = self._relation_endpoints(relation_kv)
+            kept = [pair for pair in endpoints if node_id not in pair]
+            if len(kept) == len(endpoints):
+                continue
+            detached.extend((raw_source_id, relation_kv.relation_type, raw_target_id)
+                            for raw_source_id, raw_target_id in endpoints if node_id in (raw_source_id, raw_target_id))
+            if kept:
+                # 关系还有其他来源：保留关系（及其索引键），由剩余的第一个来源作为主端点
+                relation_kv.metadata["source_node_id"], relation_kv.metadata["target_node_id"] = kept[0]
+                relation_kv.metadata["duplicate_endpoints"] = kept[1:]
+            else:
+                self.remove_relation(relation_id)
+        return detached
+    
+    @staticmethod
+    def _relation_endpoints(relation_kv: RelationKeyValue) -> List[Tuple[str, str]]:
+        """关系的全部原始来源 (原始源ID, 原始目标ID)：主端点在前，其后是插入时被去重的重复关系"""
+        primary = (relation_kv.metadata.get("source_node_id", relation_kv.source_entity),
+                   relation_kv.metadata.get("target_node_id", relation_kv.target_entity))
+        return [primary] + list(relation_kv.metadata.get("duplicate_endpoints", ()))
+    
+    @staticmethod
+    def _reindex_keys(item_id: str, old_keys: List[str], new_keys: List[str], add_key, remove_key):
+        """只对变化的索引键增删倒排表"""
+        old_set, new_set = set(old_keys), set(new_keys)
+        for key in old_set - new_set:
+            remove_key(key, item_id)
+        for key in new_set - old_set:
+            add_key(key, item_id)
+    
+    @staticmethod
+    def _assign_int_id(item_id: str, ids: List[str], int_ids: Dict[str, int]) -> int:
+        """为实体/关系分配稠密整数ID（已分配则直接返回）"""
+        int_id = int_ids.get(item_id)
+        if int_id is None:
+            int_id = len(ids)
+            ids.append(item_id)
+            int_ids[item_id] = int_id
+        return int_id
+    
+    def _add_entity_key(self, key: str, entity_id: str):
+        """登记实体索引键，新键同时加入n-gram索引"""
+        if key not in self.key_to_entities:
+            self.entity_key_index.add(key)
+        posting_add(self.key_to_entities[key], self.entity_int_ids[entity_id])
+    
+    def _add_relation_key(self, key: str, relation_id: str):
+        """登记关系索引键，新键同时加入n-gram索引"""
+        if key not in self.key_to_relations:
+            self.relation_key_index.add(key)
+        posting_add(self.key_to_relations[key], self.relation_int_ids[relation_id])
+    
+    def _remove_entity_key(self, key: str, entity_id: str):
+        """从实体索引键的倒排表中删除，倒排表为空时连同键一起删除"""
+        posting = self.key_to_entities.get(key)
+        if posting is not None and posting_remove(posting, self.entity_int_ids[entity_id]) and not posting:
+            del self.key_to_entities[key]
+            self.entity_key_index.remove(key)
+    
+    def _remove_relation_key(self, key: str, relation_id: str):
+        """从关系索引键的倒排表中删除，倒排表为空时连同键一起删除"""
+        posting = self.key_to_relations.get(key)
+        if posting is not None and posting_remove(posting, self.relation_int_ids[relation_id]) and not posting:
+            del self.key_to_relations[key]
+            self.relation_key_index.remove(key)
+    
+    def _match_keys(self, key: str, mapping: Dict[str, array], key_index: KeyNgramIndex,
+                    fuzzy: bool, max_keys: Optional[int]) -> List[str]:
+        """精确匹配优先；未命中且允许模糊匹配时，返回n-gram索引中排名靠前的键"""
+        if key in mapping or not fuzzy:
+            return [key]
+        limit = max_keys or getattr(self.config, 'fuzzy_key_limit', 5)
+        return key_index.search(key, limit=limit)
+    
+    def _entities_from_posting(self, posting: Iterable[int]) -> Iterator[EntityKeyValue]:
+        for int_id in posting:
+            entity_kv = self.entity_kv_store.get(self.entity_ids[int_id])
+            if entity_kv:
+                yield entity_kv
+    
+    def _relations_from_posting(self, posting: Iterable[int]) -> Iterator[RelationKeyValue]:
+        for int_id in posting:
+            relation_kv = self.relation_kv_store.get(self.relation_ids[int_id])
+            if relation_kv:
+                yield relation_kv
+    
+    def iter_entities_by_key(self, key: str, fuzzy: bool = False,
+                             max_keys: Optional[int] = None) -> Iterator[EntityKeyValue]:
+        """按索引键惰性遍历实体，调用方只消费需要的部分"""
+        for matched_key in self._match_keys(key, self.key_to_entities, self.entity_key_index, fuzzy, max_keys):
+            yield from self._entities_from_posting(self.key_to_entities.get(matched_key, ()))
+    
+    def iter_relations_by_key(self, key: str, fuzzy: bool = False,
+                              max_keys: Optional[int] = None) -> Iterator[RelationKeyValue]:
+        """按索引键惰性遍历关系，调用方只消费需要的部分"""
+        for matched_key in self._match_keys(key, self.key_to_relations, self.relation_key_index, fuzzy, max_keys):
+            yield from self._relations_from_posting(self.key_to_relations.get(matched_key, ()))
+    
+    def iter_relations_by_keys(self, keys: List[str], match_all: bool = True) -> Iterator[RelationKeyValue]:
+        """
+        多键关系查询（惰性）
+        match_all=True 时返回同时命中所有键的关系（倒排表求交集），否则返回命中任一键的关系（求并集）
+        """
+        postings = [self.key_to_relations.get(key) for key in keys]
+        if match_all:
+            if not postings or any(not posting for posting in postings):
+                return iter(())
+            return self._relations_from_posting(intersect_postings(postings))
+        return self._relations_from_posting(union_postings([p for p in postings if p]))
+    
+    def get_entities_by_key(self, key: str, fuzzy: bool = False,
+                            max_keys: Optional[int] = None) -> List[EntityKeyValue]:
+        """
+        根据索引键获取实体
+        fuzzy=True 时精确键未命中则按子串/前缀匹配（如"鸡胸"命中"鸡胸肉"）
+        """
+        return list(self.iter_entities_by_key(key, fuzzy, max_keys))
+    
+    def get_relations_by_key(self, key: str, fuzzy: bool = False,
+                             max_keys: Optional[int] = None) -> List[RelationKeyValue]:
+        """
+        根据索引键获取关系
+        fuzzy=True 时精确键未命中则按子串/前缀匹配
+        """
+        return list(self.iter_relations_by_key(key, fuzzy, max_keys))
+    
+    def get_relations_by_keys(self, keys: List[str], match_all: bool = True) -> List[RelationKeyValue]:
+        """多键关系查询，见 iter_relations_by_keys"""
+        return list(self.iter_relations_by_keys(keys, match_all))
     
     def get_statistics(self) -> Dict[str, Any]:
         """获取键值对存储统计信息"""
@@ -379,6 +801,8 @@ class GraphIndexingModule:
             "total_relations": len(self.relation_kv_store),
             "total_entity_keys": sum(len(kv.index_keys) for kv in self.entity_kv_store.values()),
             "total_relation_keys": sum(len(kv.index_keys) for kv in self.relation_kv_store.values()),
+            "posting_bytes": sum(p.buffer_info()[1] * p.itemsize for p in self.key_to_entities.values())
+                             + sum(p.buffer_info()[1] * p.itemsize for p in self.key_to_relations.values()),
             "entity_types": {
                 "Recipe": len([kv for kv in self.entity_kv_store.values() if kv.entity_type == "Recipe"]),
                 "Ingredient": len([kv for kv in self.entity_kv_store.values() if kv.entity_type == "Ingredient"]),
@@ -0,0 +1,62 @@
+"""
+Cypher属性投影模块
+按使用场景列出实际用到的节点属性，查询用map projection只返回这些属性，
+不再用 properties(n) 或整个节点对象把 textForEmbedding、描述等大文本属性全部经Bolt传回；
+场景之外的属性需要时按nodeId用 fetch_node_properties 单独读取
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# 检索结果中的节点（路径、子图）：只展示名称和分类
+SUMMARY_FIELDS = ("nodeId", "name", "category")
+
+# 内存图快照：名称/分类 + 实体解析（preferredTerm、synonyms）+ 社区摘要（cuisineType、tags、difficulty）
+# + 查询约束（totalTimeMinutes、calories，缺失时解析 prepTime/cookTime）
+SNAPSHOT_FIELDS = ("nodeId", "name", "category", "preferredTerm", "synonyms", "cuisineType", "tags", "difficulty",
+                   "totalTimeMinutes", "calories", "prepTime", "cookTime")
+
+# 菜谱文档、图索引键值对、主题倒排表和向量索引的约束字段
+RECIPE_FIELDS = ("nodeId", "name", "category", "description", "cuisineType", "difficulty",
+                 "prepTime", "cookTime", "cookingTime", "servings", "tags",
+                 "totalTimeMinutes", "prepTimeMinutes", "cookingTimeMinutes", "calories")
+
+# 图索引键值对
+INGREDIENT_FIELDS = ("nodeId", "name", "category", "nutrition", "storage")
+STEP_FIELDS = ("nodeId", "name", "description", "stepNumber", "order", "technique", "time")
+
+def projection(variable: str, fields: Iterable[str], **extra: str) -> str:
+    """
+    生成map projection，例如 projection("n", ("nodeId", "name"), labels="labels(n)")
+    得到 n {.nodeId, .name, labels: labels(n)}
+    """
+    items = [f".{field}" for field in fields] + [f"{key}: {value}" for key, value in extra.items()]
+    return f"{variable} {{{', '.join(items)}}}"
+
+def compact(properties: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """去掉投影中节点不存在的属性（null），与 properties(n) 的结果保持一致"""
+    return {key: value for key, value in (properties or {}).items() if value is not None}
+
+def fetch_node_properties(session, node_ids: Sequence[str],
+                          fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    按需读取节点属性（检索结果只带摘要属性，展示详情时再调用）
+
+    Args:
+        session: Neo4j会话
+        node_ids: 节点nodeId列表
+        fields: 需要的属性，为空时读取全部属性
+
+    Returns:
+        nodeId -> 属性字典
+    """
+    returned = projection("n", fields) if fields else "properties(n)"
+    result = session.run(f"""
+    MATCH (n)
+    WHERE n.nodeId IN $node_ids
+    RETURN n.nodeId as node_id, {returned} as properties
+    """, {"node_ids": list(dict.fromkeys(node_ids))})
+    return {record["node_id"]: compact(record["properties"]) for record in result}
+
+def unique_fields(*field_groups: Sequence[str]) -> List[str]:
+    """合并多个场景的属性列表（保持顺序去重）"""
+    return list(dict.fromkeys(field for fields in field_groups for field in fields))
@@ -3,18 +3,40 @@
 基于图结构的知识推理和检索，而非简单的关键词匹配
 """
 
+import heapq
 import json
 import logging
+import math
+import os
+import time
 from collections import defaultdict, deque
-from typing import List, Dict, Tuple, Any, Optional, Set
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional, Set, Iterator
+from dataclasses import dataclass, replace
 from enum import Enum
 
+import numpy as np
 from langchain_core.documents import Document
-from neo4j import GraphDatabase
+from neo4j import Query, Record
+from neo4j.exceptions import Neo4jError
+
+from .cache import VersionedLRUCache
+from .community_summary import CommunitySummaryStore
+from .entity_resolution import EntityResolver
+from .graph_projections import SUMMARY_FIELDS, compact, fetch_node_properties, projection
+from .graph_snapshot import GraphSnapshot
+from .neo4j_pool import Neo4jPool, get_pool
+from .personalized_pagerank import PersonalizedPageRank
+from .query_constraints import QueryConstraints, recipe_styles
+from .similar_recipes import SimilarRecipeIndex, load_recipe_features
+from .streaming_json import FieldCallback, stream_llm_json
 
 logger = logging.getLogger(__name__)
 
+# 路径查询的返回投影：节点只带摘要属性和标签，关系只带类型和（较小的）关系属性
+PATH_PROJECTION = f"""[n IN path_nodes | {projection("n", SUMMARY_FIELDS, labels="labels(n)")}] as path_nodes,
+           [r IN rels | {{type: type(r), properties: properties(r)}}] as rels"""
+
 class QueryType(Enum):
     """查询类型枚举"""
     ENTITY_RELATION = "entity_relation"  # 实体关系查询：A和B有什么关系？
@@ -32,7 +54,7 @@ class GraphQuery:
     relation_types: List[str] = None
     max_depth: int = 2
     max_nodes: int = 50
-    constraints: Dict[str, Any] = None
+    constraints: Optional[QueryConstraints] = None  # 下推到遍历查询的菜谱属性约束
 
 @dataclass
 class GraphPath:
@@ -42,6 +64,7 @@ class GraphPath:
     path_length: int
     relevance_score: float
     path_type: str
+    partial: bool = False  # 检索预算耗尽，结果只是已找到的部分
 
 @dataclass
 class KnowledgeSubgraph:
@@ -52,6 +75,43 @@ class KnowledgeSubgraph:
     graph_metrics: Dict[str, float]
     reasoning_chains: List[List[str]]
 
+class QueryBudget:
+    """
+    单次图检索的时间/行数预算
+    每条Cypher以剩余时间作为事务超时，流式读取结果时超时或超出行数立即停止，
+    预算耗尽后 exhausted 为True，调用方据此把已得到的结果标记为部分结果
+    """
+    
+    def __init__(self, timeout: float, max_rows: int):
+        self.deadline = time.monotonic() + timeout
+        self.max_rows = max_rows
+        self.rows = 0
+        self.exhausted = False
+    
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+    
+    def run(self, session, cypher: str, params: Dict[str, Any]) -> Iterator[Record]:
+        """在预算内执行查询并逐条返回记录"""
+        remaining = self.remaining()
+        if remaining <= 0 or self.rows >= self.max_rows:
+            self.exhausted = True
+            return
+        
+        try:
+            for record in session.run(Query(cypher, timeout=remaining), params):
+                if self.rows >= self.max_rows or time.monotonic() > self.deadline:
+                    self.exhausted = True
+                    return
+                self.rows += 1
+                yield record
+        except Neo4jError as e:
+            # 服务端事务超时：Neo.ClientError.Transaction.TransactionTimedOut*
+            if "TimedOut" not in (e.code or ""):
+                raise
+            logger.warning(f"图查询超出时间预算，返回已读取的结果: {e.code}")
+            self.exhausted = True
+
 class GraphRAGRetrieval:
     """
     真正的图RAG检索系统
@@ -66,45 +126,220 @@ class GraphRAGRetrieval:
     def __init__(self, config, llm_client):
         self.config = config
         self.llm_client = llm_client
-        self.driver = None
+        self.pool: Optional[Neo4jPool] = None
         
         # 图结构缓存
         self.entity_cache = {}
         self.relation_cache = {}
-        self.subgraph_cache = {}
+        
+        # 子图/路径检索结果缓存（按内存上限LRU淘汰，Neo4j中的图版本号或本地快照版本变化后失效）
+        self.subgraph_cache = VersionedLRUCache(getattr(config, 'graph_cache_max_bytes', 64 * 1024 * 1024))
+        self.graph_version = 0
+        
+        # 内存图快照（CSR邻接表），多跳遍历优先在进程内完成
+        self.graph_snapshot: Optional[GraphSnapshot] = None
+        
+        # 菜谱-食材-分类 稀疏矩阵上的个性化PageRank（随快照构建）
+        self.pagerank: Optional[PersonalizedPageRank] = None
+        
+        # 实体解析器：遍历前把实体字符串解析为节点elementId
+        self.entity_resolver: Optional[EntityResolver] = None
+        
+        # 图中实际存在的菜系/菜谱分类，LLM给出的风格约束只有在其中时才作为硬约束下推
+        self.style_vocabulary: Optional[Set[str]] = None
+        
+        # 离线生成的相似菜谱表，聚类查询直接查表
+        self.similar_recipes: Optional[SimilarRecipeIndex] = None
+        
+        # 离线生成的社区摘要，宽泛的子图类问题直接使用
+        self.community_summaries: Optional[CommunitySummaryStore] = None
+        
+        # 提前检索线程池（流式查询理解时提前启动图遍历）
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(config, 'retrieval_workers', 4),
+            thread_name_prefix="graph-rag"
+        )
         
     def initialize(self):
         """初始化图RAG检索系统"""
         logger.info("初始化图RAG检索系统...")
         
-        # 连接Neo4j
+        # 连接Neo4j（与其他模块共享连接池）
         try:
-            self.driver = GraphDatabase.driver(
-                self.config.neo4j_uri, 
-                auth=(self.config.neo4j_user, self.config.neo4j_password)
-            )
+            if self.pool is None:
+                self.pool = get_pool(self.config)
             # 测试连接
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            self.pool.verify()
             logger.info("Neo4j连接成功")
         except Exception as e:
             logger.error(f"Neo4j连接失败: {e}")
+            if self.pool:
+                self.pool.release()
+                self.pool = None
             return
         
+        # 加载内存图快照（度数和关系类型统计可直接从快照得到）
+        if getattr(self.config, 'enable_graph_snapshot', True):
+            self.refresh_graph_snapshot()
+        else:
+            self.refresh_entity_resolver()
+            self.refresh_style_vocabulary()
+        
         # 预热：构建实体和关系索引
         self._build_graph_index()
         
+        # 加载相似菜谱表和社区摘要
+        self._load_similar_recipes()
+        self._load_community_summaries()
+    
+    def refresh_graph_snapshot(self):
+        """重新加载内存图快照（图数据更新后调用），失败时多跳遍历回退到Neo4j"""
+        try:
+            self.graph_snapshot = GraphSnapshot.load_from_neo4j(self.pool)
+            self.bump_graph_version()
+        except Exception as e:
+            logger.error(f"加载图快照失败，多跳遍历将使用Neo4j: {e}")
+            self.graph_snapshot = None
+        self.refresh_entity_resolver()
+        self.refresh_style_vocabulary()
+        self.refresh_pagerank()
+    
+    def refresh_pagerank(self):
+        """由内存图快照构建个性化PageRank矩阵，没有快照时多跳查询使用路径遍历"""
+        self.pagerank = None
+        if self.graph_snapshot is None or getattr(self.config, 'multi_hop_mode', 'paths') != 'pagerank':
+            return
+        try:
+            self.pagerank = PersonalizedPageRank(
+                self.graph_snapshot,
+                alpha=getattr(self.config, 'ppr_alpha', 0.15),
+                iterations=getattr(self.config, 'ppr_iterations', 20)
+            )
+        except Exception as e:
+            logger.error(f"构建个性化PageRank矩阵失败，多跳查询将使用路径遍历: {e}")
+    
+    def refresh_entity_resolver(self):
+        """重建实体解析器：有图快照时直接使用快照中的节点属性，否则从Neo4j读取一次"""
+        max_matches = getattr(self.config, 'entity_resolution_limit', 20)
+        try:
+            if self.graph_snapshot is not None:
+                snapshot = self.graph_snapshot
+                self.entity_resolver = EntityResolver.from_nodes(
+                    zip(snapshot.element_ids, snapshot.node_properties), self.pool, max_matches
+                )
+            else:
+                self.entity_resolver = EntityResolver.from_neo4j(self.pool, max_matches)
+        except Exception as e:
+            logger.error(f"构建实体解析索引失败，仅使用全文索引解析实体: {e}")
+            self.entity_resolver = EntityResolver(self.pool, max_matches)
+    
+    def refresh_style_vocabulary(self):
+        """收集菜谱的菜系和分类取值（有图快照时直接从快照读取）"""
+        values: Set[str] = set()
+        try:
+            if self.graph_snapshot is not None:
+                snapshot = self.graph_snapshot
+                recipes = [props for labels, props in zip(snapshot.node_labels, snapshot.node_properties)
+                           if "Recipe" in labels]
+            else:
+                recipes = [record["properties"] for record in self.pool.read(
+                    "MATCH (r:Recipe) RETURN DISTINCT r {.cuisineType, .category} as properties"
+                )]
+            for properties in recipes:
+                values.update(recipe_styles(properties))
+            self.style_vocabulary = values
+        except Exception as e:
+            logger.error(f"读取菜系/分类取值失败，风格约束不下推: {e}")
+            self.style_vocabulary = set()
+    
+    def _resolve_entities(self, names: Optional[List[str]]) -> List[str]:
+        """实体字符串 -> 节点elementId列表"""
+        if not names or self.entity_resolver is None:
+            return []
+        return self.entity_resolver.resolve_all(names)
+        
+    def _load_similar_recipes(self):
+        """加载离线生成的相似菜谱表，不存在时聚类查询使用子图提取"""
+        path = getattr(self.config, 'similar_recipe_index_path', None)
+        if not path or not os.path.exists(path):
+            logger.info("未找到相似菜谱表，聚类查询将使用子图提取（运行 scripts/build_similar_recipes.py 生成）")
+            return
+        try:
+            self.similar_recipes = SimilarRecipeIndex.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"加载相似菜谱表失败: {e}")
+            self.similar_recipes = None
+    
+    def _load_community_summaries(self):
+        """加载离线生成的社区摘要，不存在时子图类问题使用子图提取"""
+        path = getattr(self.config, 'community_summary_path', None)
+        if not path or not os.path.exists(path):
+            logger.info("未找到社区摘要，子图类问题将使用子图提取（运行 scripts/build_community_summaries.py 生成）")
+            return
+        try:
+            self.community_summaries = CommunitySummaryStore.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"加载社区摘要失败: {e}")
+            self.community_summaries = None
+    
+    def index_similar_recipe(self, recipe_id: str) -> bool:
+        """
+        新增/更新菜谱后增量更新相似菜谱表（只重算同一LSH桶内的菜谱）并保存
+        
+        Returns:
+            是否更新成功
+        """
+        if self.similar_recipes is None or not self.pool:
+            return False
+        
+        try:
+            with self.pool.session() as session:
+                features = load_recipe_features(session, [recipe_id])
+        except Exception as e:
+            logger.error(f"读取菜谱特征失败 {recipe_id}: {e}")
+            return False
+        
+        if not features:
+            logger.warning(f"菜谱不存在: {recipe_id}")
+            return False
+        
+        for feature_recipe_id, name, tokens in features:
+            self.similar_recipes.add(feature_recipe_id, name, tokens)
+        self._save_similar_recipes()
+        return True
+    
+    def remove_similar_recipe(self, recipe_id: str):
+        """从相似菜谱表中移除菜谱并保存"""
+        if self.similar_recipes is None:
+            return
+        self.similar_recipes.remove(recipe_id)
+        self._save_similar_recipes()
+    
+    def _save_similar_recipes(self):
+        try:
+            self.similar_recipes.save(self.config.similar_recipe_index_path)
+        except OSError as e:
+            logger.warning(f"相似菜谱表写入失败: {e}")
+    
     def _build_graph_index(self):
-        """构建图索引以加速查询"""
+        """
+        构建图索引以加速查询
+        度数和关系类型统计优先取自内存快照；没有快照时读取导入时预计算的 n.degree，
+        关系类型数量按类型逐个计数（走Neo4j计数存储，不扫描关系）
+        """
         logger.info("构建图结构索引...")
         
+        if self.graph_snapshot is not None:
+            self._build_graph_index_from_snapshot()
+            return
+        
         try:
-            with self.driver.session() as session:
-                # 构建实体索引 - 修复Neo4j语法兼容性问题
+            with self.pool.session() as session:
+                # 构建实体索引（度数读取预计算属性，缺失时才现场计数）
                 entity_query = """
                 MATCH (n)
                 WHERE n.nodeId IS NOT NULL
-                WITH n, COUNT { (n)--() } as degree
+                WITH n, coalesce(n.degree, COUNT { (n)--() }) as degree
                 RETURN labels(n) as node_labels, n.nodeId as node_id, 
                        n.name as name, n.category as category, degree
                 ORDER BY degree DESC
@@ -121,27 +356,44 @@ class GraphRAGRetrieval:
                         "degree": record["degree"]
                     }
                 
-                # 构建关系类型索引
-                relation_query = """
-                MATCH ()-[r]->()
-                RETURN type(r) as rel_type, count(r) as frequency
-                ORDER BY frequency DESC
-                """
-                
-                result = session.run(relation_query)
-                for record in result:
-                    rel_type = record["rel_type"]
+                # 构建关系类型索引：固定类型的 count(r) 由计数存储直接返回
+                rel_types = [record["relationshipType"] for record in session.run(
+                    "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType"
+                )]
+                for rel_type in rel_types:
+                    escaped_type = rel_type.replace('`', '``')
+                    record = session.run(f"MATCH ()-[r:`{escaped_type}`]->() RETURN count(r) as frequency").single()
                     self.relation_cache[rel_type] = record["frequency"]
+                self.relation_cache = dict(sorted(self.relation_cache.items(), key=lambda item: item[1], reverse=True))
                     
                 logger.info(f"索引构建完成: {len(self.entity_cache)}个实体, {len(self.relation_cache)}个关系类型")
                 
         except Exception as e:
             logger.error(f"构建图索引失败: {e}")
     
-    def understand_graph_query(self, query: str) -> GraphQuery:
+    def _build_graph_index_from_snapshot(self):
+        """从内存快照的预计算度数和关系类型编码构建实体/关系类型索引"""
+        snapshot = self.graph_snapshot
+        
+        for index in snapshot.top_degree_nodes(1000):
+            properties = snapshot.node_properties[index]
+            self.entity_cache[snapshot.node_ids[index]] = {
+                "labels": snapshot.node_labels[index],
+                "name": properties.get("name"),
+                "category": properties.get("category"),
+                "degree": int(snapshot.degrees[index])
+            }
+        
+        type_counts = snapshot.relation_type_counts()
+        self.relation_cache = dict(sorted(type_counts.items(), key=lambda item: item[1], reverse=True))
+        
+        logger.info(f"索引构建完成（内存快照）: {len(self.entity_cache)}个实体, {len(self.relation_cache)}个关系类型")
+    
+    def understand_graph_query(self, query: str, on_field: Optional[FieldCallback] = None) -> GraphQuery:
         """
         理解查询的图结构意图
         这是图RAG的核心：从自然语言到图查询的转换
+        开启流式分析时，每个顶层字段闭合后立即通过 on_field 回调
         """
         prompt = f"""
         作为图数据库专家，分析以下查询的图结构意图，并将自然语言问题映射到**已有图结构**上。
@@ -185,13 +437,17 @@ class GraphRAGRetrieval:
         5. max_depth：建议的图遍历深度（1-3 之间的整数）
         
         6. constraints：可选的**属性级约束**，用于表达图结构之外的过滤条件，例如：
-           - 健康/饮食限制（如"糖尿病"、"低糖"）
-           - 时间限制（如"30分钟内"）
-           - 口味偏好（如"清淡"、"少油"）
+           - 健康/饮食限制（如"糖尿病"、"低糖"、"低卡"）
+           - 时间限制（如"30分钟内"），写成 time.max_minutes
+           - 热量限制（如"500大卡以内"），写成 calories.max
+           - 难度限制（如"新手"、"简单"），写成 difficulty.max（1-5）
+           - 菜系/分类或口味偏好（如"川菜"、"素菜"、"清淡"）
            用一个字典描述，例如：
            {{
              "health": ["糖尿病", "低糖"],
              "time": {{"max_minutes": 30}},
+             "calories": {{"max": 500}},
+             "difficulty": {{"max": 2}},
              "style": ["川菜"]
            }}
         
@@ -233,23 +489,25 @@ class GraphRAGRetrieval:
         """
         
         try:
-            response = self.llm_client.chat.completions.create(
-                model=self.config.llm_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=1000
-            )
+            if getattr(self.config, 'stream_query_analysis', False):
+                result = stream_llm_json(
+                    self.llm_client,
+                    model=self.config.llm_model,
+                    prompt=prompt,
+                    temperature=0.1,
+                    max_tokens=1000,
+                    on_field=on_field
+                )
+            else:
+                response = self.llm_client.chat.completions.create(
+                    model=self.config.llm_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.1,
+                    max_tokens=1000
+                )
+                result = json.loads(response.choices[0].message.content.strip())
             
-            result = json.loads(response.choices[0].message.content.strip())
-            
-            return GraphQuery(
-                query_type=QueryType(result.get("query_type", "subgraph")),
-                source_entities=result.get("source_entities", []),
-                target_entities=result.get("target_entities", []),
-                relation_types=result.get("relation_types", []),
-                max_depth=result.get("max_depth", 2),
-                max_nodes=50
-            )
+            return self._build_graph_query(result)
             
         except Exception as e:
             logger.error(f"查询意图理解失败: {e}")
@@ -260,21 +518,60 @@ class GraphRAGRetrieval:
                 max_depth=2
             )
     
+    def _build_graph_query(self, result: Dict[str, Any]) -> GraphQuery:
+        """将LLM分析结果转换为图查询结构（constraints 解析为类型化谓词）"""
+        constraints = QueryConstraints.from_llm(
+            result.get("constraints"),
+            style_vocabulary=self.style_vocabulary,
+            low_calorie_max=getattr(self.config, 'low_calorie_max', 400)
+        )
+        if constraints:
+            logger.info(f"查询约束: {constraints.describe()}")
+        return GraphQuery(
+            query_type=QueryType(result.get("query_type", "subgraph")),
+            source_entities=result.get("source_entities", []),
+            target_entities=result.get("target_entities", []),
+            relation_types=result.get("relation_types", []),
+            max_depth=result.get("max_depth", 2),
+            max_nodes=50,
+            constraints=constraints
+        )
+    
     def multi_hop_traversal(self, graph_query: GraphQuery) -> List[GraphPath]:
         """
         多跳图遍历：这是图RAG的核心优势
         通过图结构发现隐含的知识关联
         """
+        return self._cached_retrieval(graph_query, self._multi_hop_traversal)
+    
+    def _multi_hop_traversal(self, graph_query: GraphQuery) -> List[GraphPath]:
+        """多跳图遍历（不经过缓存）"""
         logger.info(f"执行多跳遍历: {graph_query.source_entities} -> {graph_query.target_entities}")
         
+        # 优先使用内存图快照，失败时回退到Neo4j
+        snapshot_handlers = {
+            QueryType.MULTI_HOP: self._snapshot_multi_hop,
+            QueryType.ENTITY_RELATION: self._snapshot_entity_relations,
+            QueryType.PATH_FINDING: self._snapshot_shortest_paths
+        }
+        handler = snapshot_handlers.get(graph_query.query_type)
+        if handler is not None and self.graph_snapshot is not None:
+            try:
+                paths = handler(graph_query)
+                logger.info(f"多跳遍历完成（内存快照），找到 {len(paths)} 条路径")
+                return paths
+            except Exception as e:
+                logger.warning(f"内存快照多跳遍历失败，回退到Neo4j: {e}")
+        
         paths = []
         
-        if not self.driver:
+        if not self.pool:
             logger.error("Neo4j连接未建立")
             return paths
             
+        budget = self._new_budget()
         try:
-            with self.driver.session() as session:
+            with self.pool.session() as session:
                 # 构建多跳遍历查询
                 source_entities = graph_query.source_entities
                 target_keywords = graph_query.target_entities or []
@@ -291,113 +588,210 @@ class GraphRAGRetrieval:
                         (target.category IS NOT NULL AND (toString(target.category) CONTAINS kw OR kw CONTAINS toString(target.category)))
                     )"""
                     
-                    cypher_query = f"""
-                    // 多跳推理查询
-                    UNWIND $source_entities as source_name
+                    # 查询约束：路径上的菜谱都要满足（预解析的数值属性上的谓词）
+                    constraint_clause, constraint_params = self._constraint_path_predicate(graph_query)
+                    if constraint_clause:
+                        target_filter_clause += f"\n                    AND {constraint_clause}"
+                    
+                    cypher_template = """
+                    // 多跳推理查询（起点已解析为elementId）
                     MATCH (source)
-                    WHERE source.name CONTAINS source_name OR source.nodeId = source_name
+                    WHERE elementId(source) IN $source_ids
                     
-                    // 执行多跳遍历
-                    MATCH path = (source)-[*1..{max_depth}]-(target)
+                    // 执行固定深度的遍历（由外层按深度逐层加深）
+                    MATCH path = (source)-[*{depth}]-(target)
                     WHERE NOT source = target{target_filter_clause}
                     
                     // 计算路径相关性
-                    WITH path, source, target,
-                         length(path) as path_len,
+                    WITH length(path) as path_len,
                          relationships(path) as rels,
                          nodes(path) as path_nodes
                     
                     // 路径评分：短路径 + 高度数节点 + 关系类型匹配
-                    WITH path, source, target, path_len, rels, path_nodes,
+                    WITH path_len, rels, path_nodes,
                          (1.0 / path_len) + 
-                         (REDUCE(s = 0.0, n IN path_nodes | s + COUNT {{ (n)--() }}) / 10.0 / size(path_nodes)) +
+                         (REDUCE(s = 0.0, n IN path_nodes | s + coalesce(n.degree, COUNT {{ (n)--() }})) / 10.0 / size(path_nodes)) +
                          (CASE WHEN ANY(r IN rels WHERE type(r) IN $relation_types) THEN 0.3 ELSE 0.0 END) as relevance
                     
                     ORDER BY relevance DESC
                     LIMIT 20
                     
-                    RETURN path, source, target, path_len, rels, path_nodes, relevance
+                    RETURN path_len, relevance,
+                           {path_projection}
                     """
                     
                     params = {
-                        "source_entities": source_entities,
+                        "source_ids": self._resolve_entities(source_entities),
                         "relation_types": graph_query.relation_types or []
                     }
                     if target_keywords:
                         params["target_keywords"] = target_keywords
+                    params.update(constraint_params)
                     
-                    result = session.run(cypher_query, params)
-                    
-                    for record in result:
-                        path_data = self._parse_neo4j_path(record)
-                        if path_data:
-                            paths.append(path_data)
+                    # 逐层加深：每层单独在剩余预算内执行，预算耗尽时保留较浅层已找到的路径
+                    for depth in range(1, int(max_depth) + 1):
+                        cypher_query = cypher_template.format(depth=depth, target_filter_clause=target_filter_clause,
+                                                              path_projection=PATH_PROJECTION)
+                        for record in budget.run(session, cypher_query, params):
+                            path_data = self._parse_neo4j_path(record)
+                            if path_data:
+                                paths.append(path_data)
+                        if budget.exhausted:
+                            break
+                    paths = heapq.nlargest(20, paths, key=lambda path: path.relevance_score)
                 
                 elif graph_query.query_type == QueryType.ENTITY_RELATION:
                     # 实体间关系查询
-                    paths.extend(self._find_entity_relations(graph_query, session))
+                    paths.extend(self._find_entity_relations(graph_query, session, budget))
                 
                 elif graph_query.query_type == QueryType.PATH_FINDING:
                     # 最短路径查找
-                    paths.extend(self._find_shortest_paths(graph_query, session))
+                    paths.extend(self._find_shortest_paths(graph_query, session, budget))
                     
         except Exception as e:
             logger.error(f"多跳遍历失败: {e}")
+        
+        if budget.exhausted:
+            logger.warning(f"多跳遍历预算耗尽（已读取 {budget.rows} 行），返回部分结果")
+            for path in paths:
+                path.partial = True
             
         logger.info(f"多跳遍历完成，找到 {len(paths)} 条路径")
         return paths
     
+    def _new_budget(self) -> QueryBudget:
+        """按配置创建单次检索的时间/行数预算"""
+        return QueryBudget(getattr(self.config, 'graph_query_timeout', 5.0),
+                           getattr(self.config, 'graph_query_max_rows', 5000))
+    
+    def _snapshot_graph_path(self, path_nodes, path_edges, score: float, path_type: str) -> GraphPath:
+        """把快照中的节点序号/关系编号序列转换为GraphPath"""
+        snapshot = self.graph_snapshot
+        return GraphPath(
+            nodes=[snapshot.node_dict(int(i)) for i in path_nodes],
+            relationships=[snapshot.edge_dict(int(e)) for e in path_edges],
+            path_length=len(path_edges),
+            relevance_score=score,
+            path_type=path_type
+        )
+    
+    def _snapshot_constraint_mask(self, graph_query: GraphQuery) -> Optional[np.ndarray]:
+        """查询约束的快照节点掩码（没有约束时为None），遍历时剪掉不满足约束的菜谱节点，与Cypher的路径谓词一致"""
+        if not graph_query.constraints:
+            return None
+        return self.graph_snapshot.node_mask(graph_query.constraints.allows)
+    
+    def _snapshot_resolve(self, names: List[str]) -> List[int]:
+        """实体名称 -> 快照节点序号（经实体解析器解析）"""
+        index_of = self.graph_snapshot.index_of
+        return [index_of[element_id] for element_id in self._resolve_entities(names) if element_id in index_of]
+    
+    def _snapshot_shortest_paths(self, graph_query: GraphQuery, path_type: str = "shortest_path") -> List[GraphPath]:
+        """
+        在内存快照上用双向BFS查找源实体到目标实体的最短路径
+        先按查询给出的关系类型限制遍历，找不到时放开限制；没有目标实体时按多跳遍历处理
+        """
+        if not graph_query.target_entities:
+            return self._snapshot_multi_hop(graph_query)
+        
+        snapshot = self.graph_snapshot
+        sources = self._snapshot_resolve(graph_query.source_entities)
+        targets = self._snapshot_resolve(graph_query.target_entities)
+        max_paths = getattr(self.config, 'path_max_paths', 10)
+        allowed_nodes = self._snapshot_constraint_mask(graph_query)
+        
+        paths = []
+        for allowed_types in ([graph_query.relation_types, None] if graph_query.relation_types else [None]):
+            paths = snapshot.shortest_paths(sources, targets, graph_query.max_depth,
+                                            allowed_relation_types=allowed_types, max_paths=max_paths,
+                                            allowed_nodes=allowed_nodes)
+            if paths:
+                break
+        
+        return [
+            self._snapshot_graph_path(path_nodes, path_edges,
+                                      snapshot.path_score(path_nodes, path_edges, graph_query.relation_types),
+                                      path_type)
+            for path_nodes, path_edges in paths
+        ]
+    
+    def _snapshot_entity_relations(self, graph_query: GraphQuery) -> List[GraphPath]:
+        """
+        实体关系查询：有目标实体时返回两者之间的最短连接，
+        否则返回源实体的直接关系（按关系类型过滤，最多 path_max_paths 条）
+        """
+        if graph_query.target_entities:
+            return self._snapshot_shortest_paths(graph_query, path_type="entity_relation")
+        
+        snapshot = self.graph_snapshot
+        max_paths = getattr(self.config, 'path_max_paths', 10)
+        allowed_types = snapshot.type_mask(graph_query.relation_types) if graph_query.relation_types else None
+        allowed_nodes = self._snapshot_constraint_mask(graph_query)
+        
+        relations = []
+        for source in self._snapshot_resolve(graph_query.source_entities):
+            if allowed_nodes is not None and not allowed_nodes[source]:
+                continue
+            for _, edge_id, neighbor, _ in snapshot.sample_neighbors([source], max_paths, allowed_nodes):
+                if allowed_types is None or allowed_types[snapshot.edge_types[edge_id]]:
+                    path_nodes, path_edges = [source, neighbor], [edge_id]
+                    relations.append((snapshot.path_score(path_nodes, path_edges, graph_query.relation_types),
+                                      path_nodes, path_edges))
+        
+        relations.sort(key=lambda item: -item[0])
+        return [
+            self._snapshot_graph_path(path_nodes, path_edges, score, "entity_relation")
+            for score, path_nodes, path_edges in relations[:max_paths]
+        ]
+    
+    def _snapshot_multi_hop(self, graph_query: GraphQuery) -> List[GraphPath]:
+        """在内存图快照上执行多跳遍历，评分规则与Cypher版本一致"""
+        snapshot = self.graph_snapshot
+        sources = self._snapshot_resolve(graph_query.source_entities)
+        
+        ranked = snapshot.multi_hop_paths(
+            sources,
+            max_depth=graph_query.max_depth,
+            relation_types=graph_query.relation_types or [],
+            target_keywords=graph_query.target_entities or [],
+            limit=20,
+            max_frontier=getattr(self.config, 'traversal_max_frontier', 200000),
+            allowed_nodes=self._snapshot_constraint_mask(graph_query)
+        )
+        
+        return [
+            self._snapshot_graph_path(path_nodes, path_edges, score, "multi_hop")
+            for path_nodes, path_edges, score in ranked
+        ]
+    
     def extract_knowledge_subgraph(self, graph_query: GraphQuery) -> KnowledgeSubgraph:
         """
         提取知识子图：获取实体相关的完整知识网络
         这体现了图RAG的整体性思维
         """
+        return self._cached_retrieval(graph_query, self._extract_knowledge_subgraph)
+    
+    def _extract_knowledge_subgraph(self, graph_query: GraphQuery) -> KnowledgeSubgraph:
+        """
+        提取知识子图（不经过缓存）
+        按跳做束搜索扩展，高度数节点采样并降权，达到max_nodes立即停止，
+        延迟与种子实体的连接规模无关
+        """
         logger.info(f"提取知识子图: {graph_query.source_entities}")
         
-        if not self.driver:
+        if self.graph_snapshot is not None:
+            try:
+                return self._snapshot_subgraph(graph_query)
+            except Exception as e:
+                logger.warning(f"内存快照子图提取失败，回退到Neo4j: {e}")
+        
+        if not self.pool:
             logger.error("Neo4j连接未建立")
             return self._fallback_subgraph_extraction(graph_query)
         
         try:
-            with self.driver.session() as session:
-                # 简化的子图提取（不依赖APOC）
-                cypher_query = f"""
-                // 找到源实体
-                UNWIND $source_entities as entity_name
-                MATCH (source)
-                WHERE source.name CONTAINS entity_name 
-                   OR source.nodeId = entity_name
-                
-                // 获取指定深度的邻居
-                MATCH (source)-[r*1..{graph_query.max_depth}]-(neighbor)
-                WITH source, collect(DISTINCT neighbor) as neighbors, 
-                     collect(DISTINCT r) as relationships
-                WHERE size(neighbors) <= $max_nodes
-                
-                // 计算图指标
-                WITH source, neighbors, relationships,
-                     size(neighbors) as node_count,
-                     size(relationships) as rel_count
-                
-                RETURN 
-                    source,
-                    neighbors[0..{graph_query.max_nodes}] as nodes,
-                    relationships[0..{graph_query.max_nodes}] as rels,
-                    {{
-                        node_count: node_count,
-                        relationship_count: rel_count,
-                        density: CASE WHEN node_count > 1 THEN toFloat(rel_count) / (node_count * (node_count - 1) / 2) ELSE 0.0 END
-                    }} as metrics
-                """
-                
-                result = session.run(cypher_query, {
-                    "source_entities": graph_query.source_entities,
-                    "max_nodes": graph_query.max_nodes
-                })
-                
-                record = result.single()
-                if record:
-                    return self._build_knowledge_subgraph(record)
+            with self.pool.session() as session:
+                return self._neo4j_subgraph(graph_query, session, self._new_budget())
                     
         except Exception as e:
             logger.error(f"子图提取失败: {e}")
@@ -405,6 +799,214 @@ class GraphRAGRetrieval:
         # 降级方案：简单邻居查询
         return self._fallback_subgraph_extraction(graph_query)
     
+    @staticmethod
+    def _normalize_graph_query(graph_query: GraphQuery) -> GraphQuery:
+        """规范化查询中的实体和关系类型（去空白、去重、排序），语义相同的查询共用缓存"""
+        def normalize(values: Optional[List[str]]) -> List[str]:
+            return sorted({str(v).strip() for v in values or [] if str(v).strip()})
+        
+        return replace(
+            graph_query,
+            source_entities=normalize(graph_query.source_entities),
+            target_entities=normalize(graph_query.target_entities),
+            relation_types=normalize(graph_query.relation_types)
+        )
+    
+    @staticmethod
+    def _cache_key(graph_query: GraphQuery) -> Tuple:
+        """结果缓存键：查询类型 + 实体/关系类型 + 深度 + 节点上限 + 约束"""
+        return (
+            graph_query.query_type.value,
+            tuple(graph_query.source_entities),
+            tuple(graph_query.target_entities),
+            tuple(graph_query.relation_types),
+            graph_query.max_depth,
+            graph_query.max_nodes,
+            graph_query.constraints or None
+        )
+    
+    @staticmethod
+    def _constraint_path_predicate(graph_query: GraphQuery) -> Tuple[str, Dict[str, Any]]:
+        """路径上所有菜谱节点满足查询约束的Cypher谓词"""
+        if not graph_query.constraints:
+            return "", {}
+        return graph_query.constraints.path_predicate("nodes(path)")
+    
+    def _cached_retrieval(self, graph_query: GraphQuery, compute):
+        """经过结果缓存执行图检索；空结果（可能是失败降级）和预算耗尽的部分结果不缓存"""
+        graph_query = self._normalize_graph_query(graph_query)
+        # 子图提取和路径遍历的查询规范化结果可能相同，缓存键带上检索函数名区分
+        key = (compute.__name__,) + self._cache_key(graph_query)
+        version = self._cache_version()
+        cached = self.subgraph_cache.get(key, version)
+        if cached is not None:
+            logger.info(f"图检索缓存命中: {key[1]} {list(key[2])}")
+            return cached
+        
+        result = compute(graph_query)
+        if result and not self._is_partial(result) and (not isinstance(result, KnowledgeSubgraph) or result.central_nodes):
+            self.subgraph_cache.put(key, version, result)
+        return result
+    
+    @staticmethod
+    def _is_partial(result) -> bool:
+        """预算耗尽得到的部分结果（不缓存）"""
+        if isinstance(result, KnowledgeSubgraph):
+            return bool(result.graph_metrics.get("partial"))
+        return any(path.partial for path in result)
+    
+    def _cache_version(self) -> Tuple[int, int]:
+        """结果缓存的版本：(Neo4j中的图版本号, 本地快照版本)，任一写入或快照刷新都使缓存失效"""
+        return (self.pool.graph_version() if self.pool else 0, self.graph_version)
+    
+    def bump_graph_version(self):
+        """图快照刷新等本地变化时调用，使缓存的子图/路径结果全部失效"""
+        self.graph_version += 1
+        logger.info(f"图版本更新为 {self.graph_version}，检索结果缓存失效")
+    
+    def _beam_expand(self, seeds: List[Any], expand, max_depth: int, max_nodes: int) -> Tuple[List[Any], List[Any]]:
+        """
+        逐跳束搜索扩展
+        expand(frontier) 返回 [(父节点, 关系, 邻居, 邻居度数)]，由实现方对高度数节点的邻居采样；
+        候选权重 = 父节点权重 / log2(2 + 邻居度数)，"盐"、"川菜"这类枢纽节点被降权，
+        每跳只保留权重最高的beam_width个新节点，节点总数达到max_nodes立即停止
+        
+        Returns:
+            (新增节点列表, 对应的扩展关系列表)
+        """
+        beam_width = getattr(self.config, 'subgraph_beam_width', 20)
+        weights = {seed: 1.0 for seed in seeds}
+        selected_nodes, selected_edges = [], []
+        frontier = list(seeds)
+        
+        for _ in range(max_depth):
+            remaining = max_nodes - len(selected_nodes)
+            if not frontier or remaining <= 0:
+                break
+            
+            best = {}
+            for parent, edge, neighbor, degree in expand(frontier):
+                if neighbor in weights:
+                    continue
+                weight = weights[parent] / math.log2(2 + degree)
+                if neighbor not in best or weight > best[neighbor][0]:
+                    best[neighbor] = (weight, edge)
+            
+            frontier = []
+            for neighbor, (weight, edge) in heapq.nlargest(min(beam_width, remaining), best.items(),
+                                                          key=lambda item: item[1][0]):
+                weights[neighbor] = weight
+                selected_nodes.append(neighbor)
+                selected_edges.append(edge)
+                frontier.append(neighbor)
+        
+        return selected_nodes, selected_edges
+    
+    @staticmethod
+    def _subgraph_metrics(node_count: int, rel_count: int) -> Dict[str, float]:
+        """子图指标（与原Cypher的计算方式一致）"""
+        return {
+            "node_count": node_count,
+            "relationship_count": rel_count,
+            "density": rel_count / (node_count * (node_count - 1) / 2) if node_count > 1 else 0.0
+        }
+    
+    def _snapshot_subgraph(self, graph_query: GraphQuery) -> KnowledgeSubgraph:
+        """在内存图快照上做束搜索子图扩展"""
+        snapshot = self.graph_snapshot
+        beam_width = getattr(self.config, 'subgraph_beam_width', 20)
+        hub_sample = getattr(self.config, 'subgraph_hub_sample', 50)
+        
+        seeds = self._snapshot_resolve(graph_query.source_entities)[:beam_width]
+        if not seeds:
+            return self._fallback_subgraph_extraction(graph_query)
+        
+        constraints = graph_query.constraints
+        
+        def expand(frontier: List[int]) -> List[Tuple[int, int, int, int]]:
+            expanded = snapshot.sample_neighbors(frontier, hub_sample)
+            if constraints:
+                # 不满足查询约束的菜谱不参与扩展
+                expanded = [item for item in expanded
+                            if constraints.allows(snapshot.node_labels[item[2]], snapshot.node_properties[item[2]])]
+            return expanded
+        
+        nodes, edges = self._beam_expand(seeds, expand, graph_query.max_depth, graph_query.max_nodes)
+        
+        return KnowledgeSubgraph(
+            central_nodes=[dict(snapshot.node_properties[i]) for i in seeds],
+            connected_nodes=[dict(snapshot.node_properties[i]) for i in nodes],
+            relationships=[snapshot.edge_dict(e)["properties"] for e in edges],
+            graph_metrics=self._subgraph_metrics(len(nodes), len(edges)),
+            reasoning_chains=[]
+        )
+    
+    def _neo4j_subgraph(self, graph_query: GraphQuery, session, budget: QueryBudget) -> KnowledgeSubgraph:
+        """
+        在Neo4j上逐跳做束搜索子图扩展，每个节点最多读取 subgraph_hub_sample 条关系；
+        预算耗尽时停止扩展，返回已选中的节点并在graph_metrics中标记partial
+        """
+        beam_width = getattr(self.config, 'subgraph_beam_width', 20)
+        hub_sample = getattr(self.config, 'subgraph_hub_sample', 50)
+        node_properties: Dict[str, Dict[str, Any]] = {}
+        edge_properties: Dict[str, Dict[str, Any]] = {}
+        
+        seed_query = f"""
+        MATCH (source)
+        WHERE elementId(source) IN $source_ids
+        RETURN elementId(source) as element_id, {projection("source", SUMMARY_FIELDS)} as properties
+        """
+        seeds = []
+        source_ids = self._resolve_entities(graph_query.source_entities)[:beam_width]
+        for record in budget.run(session, seed_query, {"source_ids": source_ids}):
+            seeds.append(record["element_id"])
+            node_properties[record["element_id"]] = compact(record["properties"])
+        if not seeds:
+            return self._fallback_subgraph_extraction(graph_query)
+        
+        # 查询约束：不满足约束的菜谱不参与扩展
+        constraint_clause, constraint_params = (graph_query.constraints.node_predicate("m")
+                                                if graph_query.constraints else ("", {}))
+        neighbor_query = f"""
+        UNWIND $frontier as element_id
+        MATCH (n) WHERE elementId(n) = element_id
+        CALL {{
+            WITH n
+            MATCH (n)-[r]-(m)
+            {f"WHERE {constraint_clause}" if constraint_clause else ""}
+            RETURN r, m
+            LIMIT $per_node
+        }}
+        RETURN element_id as parent, elementId(r) as edge_id, properties(r) as edge_properties,
+               elementId(m) as neighbor, {projection("m", SUMMARY_FIELDS)} as properties,
+               coalesce(m.degree, COUNT {{ (m)--() }}) as degree
+        """
+        
+        def expand(frontier: List[str]) -> List[Tuple[str, str, str, int]]:
+            expanded = []
+            for record in budget.run(session, neighbor_query,
+                                     {"frontier": frontier, "per_node": hub_sample, **constraint_params}):
+                if record["neighbor"] not in node_properties:
+                    node_properties[record["neighbor"]] = compact(record["properties"])
+                edge_properties.setdefault(record["edge_id"], record["edge_properties"])
+                expanded.append((record["parent"], record["edge_id"], record["neighbor"], record["degree"]))
+            return expanded
+        
+        nodes, edges = self._beam_expand(seeds, expand, graph_query.max_depth, graph_query.max_nodes)
+        
+        graph_metrics = self._subgraph_metrics(len(nodes), len(edges))
+        if budget.exhausted:
+            logger.warning(f"子图提取预算耗尽（已读取 {budget.rows} 行），返回部分子图")
+            graph_metrics["partial"] = True
+        
+        return KnowledgeSubgraph(
+            central_nodes=[dict(node_properties[i]) for i in seeds],
+            connected_nodes=[dict(node_properties[i]) for i in nodes],
+            relationships=[dict(edge_properties[e]) for e in edges],
+            graph_metrics=graph_metrics,
+            reasoning_chains=[]
+        )
+    
     def graph_structure_reasoning(self, subgraph: KnowledgeSubgraph, query: str) -> List[str]:
         """
         基于图结构的推理：这是图RAG的智能之处
@@ -485,26 +1087,40 @@ class GraphRAGRetrieval:
         """
         logger.info(f"开始图RAG检索: {query}")
         
-        if not self.driver:
+        if not self.pool:
             logger.warning("Neo4j连接未建立，返回空结果")
             return []
         
-        # 1. 查询意图理解
-        graph_query = self.understand_graph_query(query)
+        # 1. 查询意图理解（流式时结构字段齐全即提前启动图检索，与剩余字段的生成重叠）
+        early = {}
+        
+        def on_field(key: str, value: Any):
+            early.setdefault("fields", {})[key] = value
+            if "future" not in early and self.EARLY_RETRIEVAL_FIELDS.issubset(early["fields"]):
+                early_query = self._build_graph_query(early["fields"])
+                early["query"] = early_query
+                early["future"] = self.executor.submit(self._execute_graph_retrieval, early_query)
+        
+        graph_query = self.understand_graph_query(query, on_field=on_field)
         logger.info(f"查询类型: {graph_query.query_type.value}")
         
         results = []
         
         try:
-            # 2. 根据查询类型执行不同策略
-            if graph_query.query_type in [QueryType.MULTI_HOP, QueryType.PATH_FINDING]:
+            # 2. 根据查询类型执行不同策略（复用结构一致的提前检索结果）
+            retrieved = self._collect_early_retrieval(early, graph_query, top_k)
+            
+            if self._is_documents(retrieved):
+                # 相似菜谱表 / 个性化PageRank 直接给出文档
+                results.extend(retrieved)
+                
+            elif graph_query.query_type in [QueryType.MULTI_HOP, QueryType.PATH_FINDING]:
                 # 多跳遍历 / 路径查找
-                paths = self.multi_hop_traversal(graph_query)
-                results.extend(self._paths_to_documents(paths, query))
+                results.extend(self._paths_to_documents(retrieved, query))
                 
             elif graph_query.query_type in [QueryType.SUBGRAPH, QueryType.CLUSTERING]:
-                # 子图提取 / 聚类查询：都视为“围绕核心实体的局部知识网络”
-                subgraph = self.extract_knowledge_subgraph(graph_query)
+                # 子图提取 / 聚类查询（相似菜谱表未命中）：都视为“围绕核心实体的局部知识网络”
+                subgraph = retrieved
                 
                 # 图结构推理
                 reasoning_chains = self.graph_structure_reasoning(subgraph, query)
@@ -513,8 +1129,7 @@ class GraphRAGRetrieval:
                 
             elif graph_query.query_type == QueryType.ENTITY_RELATION:
                 # 实体关系查询（可以视为一跳 / 少量跳的路径查询）
-                paths = self.multi_hop_traversal(graph_query)
-                results.extend(self._paths_to_documents(paths, query))
+                results.extend(self._paths_to_documents(retrieved, query))
             
             # 3. 图结构相关性排序
             results = self._rank_by_graph_relevance(results, query)
@@ -528,23 +1143,165 @@ class GraphRAGRetrieval:
     
     # ========== 辅助方法 ==========
     
-    def _parse_neo4j_path(self, record) -> Optional[GraphPath]:
-        """解析Neo4j路径记录"""
+    # 启动提前检索所需的查询结构字段；constraints 在最后解析，提前检索不带约束，结束后按约束重新过滤路径
+    EARLY_RETRIEVAL_FIELDS = {"query_type", "source_entities", "target_entities", "relation_types", "max_depth"}
+    
+    def _execute_graph_retrieval(self, graph_query: GraphQuery):
+        """
+        按查询类型执行图检索：路径类查询返回路径列表，子图类查询返回知识子图；
+        聚类查询优先使用相似菜谱表、多跳查询优先使用个性化PageRank、子图查询优先使用社区摘要，
+        直接返回文档列表
+        """
+        if graph_query.query_type == QueryType.SUBGRAPH and self.community_summaries is not None:
+            documents = self.community_retrieval(graph_query)
+            if documents:
+                return documents
+        if graph_query.query_type == QueryType.CLUSTERING:
+            similar = self._lookup_similar_recipes(graph_query)
+            if similar:
+                return self._similar_recipes_to_documents(similar)
+        if graph_query.query_type == QueryType.MULTI_HOP and self.pagerank is not None:
+            documents = self.pagerank_retrieval(graph_query)
+            if documents:
+                return documents
+        if graph_query.query_type in [QueryType.SUBGRAPH, QueryType.CLUSTERING]:
+            return self.extract_knowledge_subgraph(graph_query)
+        return self.multi_hop_traversal(graph_query)
+    
+    @staticmethod
+    def _is_documents(retrieved) -> bool:
+        return isinstance(retrieved, list) and bool(retrieved) and isinstance(retrieved[0], Document)
+    
+    def pagerank_retrieval(self, graph_query: GraphQuery) -> List[Document]:
+        """
+        个性化PageRank检索：每个源实体解析出的节点作为一组种子，
+        全部种子一次批量迭代，返回与种子关联最强的目标节点
+        """
+        start_time = time.time()
+        seed_groups = [self._snapshot_resolve([entity]) for entity in graph_query.source_entities]
+        seeds = [seed for group in seed_groups for seed in group]
+        top_k = getattr(self.config, 'ppr_top_k', 10)
+        snapshot = self.graph_snapshot
+        # 不满足查询约束的菜谱在排序之前剔除
+        ranked = self.pagerank.top_nodes(seed_groups, top_k, target_keywords=graph_query.target_entities,
+                                         allowed_nodes=self._snapshot_constraint_mask(graph_query))
+        if not ranked:
+            return []
+        
+        seed_names = "、".join(dict.fromkeys(snapshot.names[seed] for seed in seeds))
+        max_score = ranked[0][1]
+        documents = []
+        for node, score in ranked:
+            labels = snapshot.node_labels[node]
+            label = next((l for l in PersonalizedPageRank.LABELS if l in labels), labels[0] if labels else "")
+            content = f"{snapshot.names[node]}（{label}）：与 {seed_names} 的关联得分 {score:.4f}"
+            shared = self.pagerank.shared_recipes(node, seeds)
+            if shared:
+                content += f"；共同出现的菜谱：{'、'.join(shared)}"
+            
+            documents.append(Document(
+                page_content=content,
+                metadata={
+                    "search_type": "personalized_pagerank",
+                    "node_id": snapshot.node_ids[node],
+                    "node_type": label,
+                    "pagerank_score": score,
+                    "relevance_score": score / max_score,
+                    "recipe_name": snapshot.names[node]
+                }
+            ))
+        
+        logger.info(f"个性化PageRank检索完成: {len(seeds)} 个种子, {len(documents)} 个结果, "
+                    f"耗时 {(time.time() - start_time) * 1000:.1f}ms")
+        return documents
+    
+    def community_retrieval(self, graph_query: GraphQuery) -> List[Document]:
+        """按源实体查找相关社区，返回预先生成的社区摘要"""
+        communities = self.community_summaries.lookup(
+            graph_query.source_entities + (graph_query.target_entities or []),
+            limit=getattr(self.config, 'community_top_k', 3)
+        )
+        
+        documents = []
+        for community, relevance in communities:
+            content = community["summary"]
+            if content != community["profile"]:
+                content = f"{content}\n{community['profile']}"
+            documents.append(Document(
+                page_content=content,
+                metadata={
+                    "search_type": "community_summary",
+                    "community_id": community["id"],
+                    "recipe_count": community["recipe_count"],
+                    "relevance_score": relevance,
+                    "recipe_name": "社区摘要"
+                }
+            ))
+        
+        logger.info(f"社区摘要检索完成: {len(documents)} 个社区")
+        return documents
+    
+    def _lookup_similar_recipes(self, graph_query: GraphQuery) -> List[Dict[str, Any]]:
+        """在相似菜谱表中查找源实体的相似菜谱"""
+        if self.similar_recipes is None:
+            return []
+        limit = getattr(self.config, 'similar_recipe_top_n', 10)
+        results = []
+        for entity in graph_query.source_entities:
+            results.extend(self.similar_recipes.lookup(entity, limit))
+        return results
+    
+    def _collect_early_retrieval(self, early: Dict[str, Any], graph_query: GraphQuery, top_k: int):
+        """
+        获取提前检索结果：提前检索不带约束，按去掉约束后的查询结构比较；
+        有约束时用约束重新过滤提前得到的路径，过滤后不足 top_k 条（或结果不是路径）时带约束重新检索
+        """
+        future = early.get("future")
+        if future is not None:
+            if replace(early["query"], constraints=None) == replace(graph_query, constraints=None):
+                try:
+                    retrieved = future.result()
+                    if not graph_query.constraints:
+                        return retrieved
+                    paths = self._paths_within_constraints(retrieved, graph_query.constraints)
+                    # 未过滤结果按得分截断，满足约束的部分即带约束检索结果的前缀；数量足够时直接复用
+                    if paths is not None and len(paths) >= top_k:
+                        return paths
+                    logger.info("提前检索结果按约束过滤后不足，带约束重新检索")
+                except Exception as e:
+                    logger.error(f"提前图检索失败，重新检索: {e}")
+            else:
+                future.cancel()
+        
+        return self._execute_graph_retrieval(graph_query)
+    
+    @staticmethod
+    def _paths_within_constraints(retrieved, constraints: QueryConstraints) -> Optional[List[GraphPath]]:
+        """保留所有节点都满足约束的路径；结果不是路径列表（文档或子图）时返回 None"""
+        if not isinstance(retrieved, list) or GraphRAGRetrieval._is_documents(retrieved):
+            return None
+        return [path for path in retrieved
+                if all(constraints.allows(node["labels"], node["properties"]) for node in path.nodes)]
+        
+    def _parse_neo4j_path(self, record, path_type: str = "multi_hop") -> Optional[GraphPath]:
+        """解析Neo4j路径记录（PATH_PROJECTION 投影后的节点和关系）"""
         try:
             path_nodes = []
             for node in record["path_nodes"]:
+                properties = compact(node)
+                labels = properties.pop("labels", [])
                 path_nodes.append({
-                    "id": node.get("nodeId", ""),
-                    "name": node.get("name", ""),
-                    "labels": list(node.labels),
-                    "properties": dict(node)
+                    "id": properties.get("nodeId", ""),
+                    "name": properties.get("name", ""),
+                    "labels": list(labels),
+                    "properties": properties
                 })
             
             relationships = []
             for rel in record["rels"]:
                 relationships.append({
-                    "type": type(rel).__name__,
-                    "properties": dict(rel)
+                    "type": rel["type"],
+                    "properties": dict(rel["properties"] or {})
                 })
             
             return GraphPath(
@@ -552,37 +1309,13 @@ class GraphRAGRetrieval:
                 relationships=relationships,
                 path_length=record["path_len"],
                 relevance_score=record["relevance"],
-                path_type="multi_hop"
+                path_type=path_type
             )
             
         except Exception as e:
             logger.error(f"路径解析失败: {e}")
             return None
     
-    def _build_knowledge_subgraph(self, record) -> KnowledgeSubgraph:
-        """构建知识子图对象"""
-        try:
-            central_nodes = [dict(record["source"])]
-            connected_nodes = [dict(node) for node in record["nodes"]]
-            relationships = [dict(rel) for rel in record["rels"]]
-            
-            return KnowledgeSubgraph(
-                central_nodes=central_nodes,
-                connected_nodes=connected_nodes,
-                relationships=relationships,
-                graph_metrics=record["metrics"],
-                reasoning_chains=[]
-            )
-        except Exception as e:
-            logger.error(f"构建知识子图失败: {e}")
-            return KnowledgeSubgraph(
-                central_nodes=[],
-                connected_nodes=[],
-                relationships=[],
-                graph_metrics={},
-                reasoning_chains=[]
-            )
-    
     def _paths_to_documents(self, paths: List[GraphPath], query: str) -> List[Document]:
         """将图路径转换为Document对象"""
         documents = []
@@ -600,6 +1333,7 @@ class GraphRAGRetrieval:
                     "path_type": path.path_type,
                     "node_count": len(path.nodes),
                     "relationship_count": len(path.relationships),
+                    "partial": path.partial,
                     "recipe_name": path.nodes[0].get("name", "图结构结果") if path.nodes else "图结构结果"
                 }
             )
@@ -623,6 +1357,7 @@ class GraphRAGRetrieval:
                 "relationship_count": len(subgraph.relationships),
                 "graph_density": subgraph.graph_metrics.get("density", 0.0),
                 "reasoning_chains": reasoning_chains,
+                "partial": bool(subgraph.graph_metrics.get("partial")),
                 "recipe_name": subgraph.central_nodes[0].get("name", "知识子图") if subgraph.central_nodes else "知识子图"
             }
         )
@@ -630,6 +1365,32 @@ class GraphRAGRetrieval:
         
         return documents
     
+    def _similar_recipes_to_documents(self, similar: List[Dict[str, Any]]) -> List[Document]:
+        """将相似菜谱表的结果转换为Document对象"""
+        documents = []
+        
+        for item in similar:
+            shared = []
+            if item["shared_ingredients"]:
+                shared.append(f"共同食材：{'、'.join(item['shared_ingredients'])}")
+            if item["shared_methods"]:
+                shared.append(f"共同做法：{'、'.join(item['shared_methods'])}")
+            
+            doc = Document(
+                page_content=f"与 {item['source_name']} 相似的菜谱：{item['name']}"
+                             f"（相似度 {item['similarity']:.2f}）。{'；'.join(shared)}",
+                metadata={
+                    "search_type": "similar_recipe",
+                    "node_id": item["recipe_id"],
+                    "source_recipe": item["source_name"],
+                    "relevance_score": item["similarity"],
+                    "recipe_name": item["name"]
+                }
+            )
+            documents.append(doc)
+        
+        return documents
+    
     def _build_path_description(self, path: GraphPath) -> str:
         """构建路径的自然语言描述"""
         if not path.nodes:
@@ -676,13 +1437,62 @@ class GraphRAGRetrieval:
         """验证推理链"""
         return chains[:3]
     
-    def _find_entity_relations(self, graph_query: GraphQuery, session) -> List[GraphPath]:
-        """查找实体间关系"""
-        return []
+    # 最短路径/实体关系的Neo4j回退查询（没有内存快照时使用）
+    PATH_SCORE_CLAUSE = """
+        WITH length(path) as path_len, relationships(path) as rels, nodes(path) as path_nodes
+        WITH path_len, rels, path_nodes,
+             (1.0 / path_len) +
+             (REDUCE(s = 0.0, n IN path_nodes | s + coalesce(n.degree, COUNT { (n)--() })) / 10.0 / size(path_nodes)) +
+             (CASE WHEN ANY(r IN rels WHERE type(r) IN $relation_types) THEN 0.3 ELSE 0.0 END) as relevance
+        ORDER BY path_len ASC, relevance DESC
+        LIMIT $limit
+        RETURN path_len, relevance,
+               """ + PATH_PROJECTION
+    
+    def _find_entity_relations(self, graph_query: GraphQuery, session, budget: QueryBudget) -> List[GraphPath]:
+        """查找实体间关系：有目标实体时查最短连接，否则查源实体的直接关系"""
+        if graph_query.target_entities:
+            return self._find_shortest_paths(graph_query, session, budget, path_type="entity_relation")
+        
+        constraint_clause, constraint_params = self._constraint_path_predicate(graph_query)
+        cypher_query = """
+        MATCH (source)
+        WHERE elementId(source) IN $source_ids
+        MATCH path = (source)-[r]-(target)
+        WHERE (size($relation_types) = 0 OR type(r) IN $relation_types)
+        """ + (f"AND {constraint_clause}" if constraint_clause else "") + self.PATH_SCORE_CLAUSE
+        
+        result = budget.run(session, cypher_query, {
+            "source_ids": self._resolve_entities(graph_query.source_entities),
+            "relation_types": graph_query.relation_types or [],
+            "limit": getattr(self.config, 'path_max_paths', 10),
+            **constraint_params
+        })
+        return [path for path in (self._parse_neo4j_path(record, "entity_relation") for record in result) if path]
     
-    def _find_shortest_paths(self, graph_query: GraphQuery, session) -> List[GraphPath]:
+    def _find_shortest_paths(self, graph_query: GraphQuery, session, budget: QueryBudget,
+                             path_type: str = "shortest_path") -> List[GraphPath]:
         """查找最短路径"""
-        return []
+        if not graph_query.target_entities:
+            return []
+        
+        constraint_clause, constraint_params = self._constraint_path_predicate(graph_query)
+        cypher_query = f"""
+        MATCH (source)
+        WHERE elementId(source) IN $source_ids
+        MATCH (target)
+        WHERE elementId(target) IN $target_ids AND source <> target
+        MATCH path = shortestPath((source)-[*..{int(graph_query.max_depth)}]-(target))
+        """ + (f"WHERE {constraint_clause}" if constraint_clause else "") + self.PATH_SCORE_CLAUSE
+        
+        result = budget.run(session, cypher_query, {
+            "source_ids": self._resolve_entities(graph_query.source_entities),
+            "target_ids": self._resolve_entities(graph_query.target_entities),
+            "relation_types": graph_query.relation_types or [],
+            "limit": getattr(self.config, 'path_max_paths', 10),
+            **constraint_params
+        })
+        return [path for path in (self._parse_neo4j_path(record, path_type) for record in result) if path]
     
     def _fallback_subgraph_extraction(self, graph_query: GraphQuery) -> KnowledgeSubgraph:
         """降级子图提取"""
@@ -694,8 +1504,20 @@ class GraphRAGRetrieval:
             reasoning_chains=[]
         )
     
+    def fetch_node_properties(self, node_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        按需读取节点属性：路径和子图结果中的节点只带摘要属性（SUMMARY_FIELDS），
+        需要描述等其他属性时按nodeId单独读取
+        """
+        if not self.pool or not node_ids:
+            return {}
+        with self.pool.session() as session:
+            return fetch_node_properties(session, node_ids, fields)
+    
     def close(self):
         """关闭资源连接"""
-        if hasattr(self, 'driver') and self.driver:
-            self.driver.close()
+        self.executor.shutdown(wait=False)
+        if getattr(self, 'pool', None):
+            self.pool.release()
+            self.pool = None
             logger.info("图RAG检索系统已关闭") 
\ No newline at end of file
@@ -0,0 +1,430 @@
+"""
+图快照模块
+把Neo4j中的节点和关系加载为内存中的CSR邻接结构（按elementId编号），
+在进程内完成多跳遍历和向量化路径评分，避免变长路径Cypher在高度数食材节点上的组合爆炸
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .graph_projections import SNAPSHOT_FIELDS, compact, projection
+
+logger = logging.getLogger(__name__)
+
+class GraphSnapshot:
+    """
+    图的只读内存快照
+
+    特点：
+    1. 无向CSR邻接表（indptr / indices / edge_ids），与Cypher中 -[*]- 的无方向匹配一致
+    2. 预计算节点度数，路径评分只需数组索引
+    3. 关系类型编码为整数，类型过滤和加分都是向量化的掩码运算
+    """
+
+    def __init__(self, element_ids: List[str], node_labels: List[List[str]], node_properties: List[Dict[str, Any]],
+                 edge_sources: Sequence[int], edge_targets: Sequence[int], edge_types: Sequence[int],
+                 type_names: List[str], edge_properties: List[Optional[Dict[str, Any]]]):
+        self.element_ids = element_ids
+        self.index_of: Dict[str, int] = {eid: i for i, eid in enumerate(element_ids)}
+        self.node_labels = node_labels
+        self.node_properties = node_properties
+        self.names: List[str] = [str(props.get("name") or "") for props in node_properties]
+        self.node_ids: List[str] = [str(props.get("nodeId") or "") for props in node_properties]
+        self.categories: List[str] = [str(props.get("category") or "") for props in node_properties]
+
+        self.type_names = type_names
+        self.type_codes: Dict[str, int] = {name: i for i, name in enumerate(type_names)}
+        self.edge_sources = np.asarray(edge_sources, dtype=np.int32)
+        self.edge_targets = np.asarray(edge_targets, dtype=np.int32)
+        self.edge_types = np.asarray(edge_types, dtype=np.int16)
+        self.edge_properties = edge_properties
+
+        # 无向CSR：每条关系在两个端点下各出现一次，共用同一个关系编号
+        node_count = len(element_ids)
+        edge_count = len(self.edge_sources)
+        heads = np.concatenate([self.edge_sources, self.edge_targets])
+        tails = np.concatenate([self.edge_targets, self.edge_sources])
+        edge_ids = np.concatenate([np.arange(edge_count, dtype=np.int32)] * 2)
+        order = np.argsort(heads, kind="stable")
+        self.indices = tails[order]
+        self.edge_ids = edge_ids[order]
+        self.indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=node_count), out=self.indptr[1:])
+        self.degrees = np.diff(self.indptr)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.element_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_sources)
+
+    @classmethod
+    def load_from_neo4j(cls, driver) -> 'GraphSnapshot':
+        """从Neo4j流式读取全部节点和关系，构建快照（节点只投影 SNAPSHOT_FIELDS 属性，不含图版本节点）"""
+        start_time = time.time()
+        element_ids, node_labels, node_properties = [], [], []
+        edge_sources, edge_targets, edge_types, edge_properties = [], [], [], []
+        type_codes: Dict[str, int] = {}
+
+        with driver.session() as session:
+            result = session.run(f"""
+            MATCH (n)
+            WHERE NOT n:GraphVersion
+            RETURN elementId(n) as element_id, labels(n) as labels, {projection("n", SNAPSHOT_FIELDS)} as properties
+            """)
+            for record in result:
+                element_ids.append(record["element_id"])
+                node_labels.append(record["labels"])
+                node_properties.append(compact(record["properties"]))
+
+            index_of = {eid: i for i, eid in enumerate(element_ids)}
+
+            result = session.run("""
+            MATCH (a)-[r]->(b)
+            RETURN elementId(a) as source, elementId(b) as target,
+                   type(r) as rel_type, properties(r) as properties
+            """)
+            for record in result:
+                source = index_of.get(record["source"])
+                target = index_of.get(record["target"])
+                if source is None or target is None:
+                    continue
+                rel_type = record["rel_type"]
+                if rel_type not in type_codes:
+                    type_codes[rel_type] = len(type_codes)
+                edge_sources.append(source)
+                edge_targets.append(target)
+                edge_types.append(type_codes[rel_type])
+                edge_properties.append(record["properties"] or None)
+
+        snapshot = cls(element_ids, node_labels, node_properties,
+                       edge_sources, edge_targets, edge_types,
+                       list(type_codes), edge_properties)
+        logger.info(f"图快照加载完成: {snapshot.node_count} 个节点, {snapshot.edge_count} 条关系, "
+                    f"耗时 {time.time() - start_time:.2f}秒")
+        return snapshot
+
+    def top_degree_nodes(self, limit: int) -> List[int]:
+        """度数最高的limit个带nodeId的节点（按度数降序）"""
+        has_node_id = np.fromiter((bool(node_id) for node_id in self.node_ids), dtype=bool, count=self.node_count)
+        candidates = np.flatnonzero(has_node_id)
+        order = np.argsort(-self.degrees[candidates], kind="stable")[:limit]
+        return candidates[order].tolist()
+
+    def relation_type_counts(self) -> Dict[str, int]:
+        """各关系类型的关系数量"""
+        counts = np.bincount(self.edge_types, minlength=len(self.type_names))
+        return {name: int(counts[i]) for i, name in enumerate(self.type_names)}
+
+    # ==================== 节点查找 ====================
+
+    def target_mask(self, keywords: List[str]) -> np.ndarray:
+        """目标谓词：名称或分类与任一关键词互相包含"""
+        mask = np.zeros(self.node_count, dtype=bool)
+        for i, (name, category) in enumerate(zip(self.names, self.categories)):
+            for kw in keywords:
+                if (name and (kw in name or name in kw)) or (category and (kw in category or category in kw)):
+                    mask[i] = True
+                    break
+        return mask
+
+    def node_mask(self, predicate: Callable[[List[str], Dict[str, Any]], bool]) -> np.ndarray:
+        """节点谓词掩码（按快照序号索引），predicate 接收 (标签, 属性)"""
+        return np.fromiter((predicate(labels, properties)
+                            for labels, properties in zip(self.node_labels, self.node_properties)),
+                           dtype=bool, count=self.node_count)
+
+    def type_mask(self, relation_types: Optional[List[str]]) -> np.ndarray:
+        """关系类型掩码（按类型编码索引）"""
+        mask = np.zeros(max(len(self.type_names), 1), dtype=bool)
+        for rel_type in relation_types or []:
+            code = self.type_codes.get(rel_type)
+            if code is not None:
+                mask[code] = True
+        return mask
+
+    # ==================== 多跳遍历 ====================
+
+    def multi_hop_paths(self, sources: List[int], max_depth: int,
+                        relation_types: Optional[List[str]] = None,
+                        target_keywords: Optional[List[str]] = None,
+                        allowed_relation_types: Optional[List[str]] = None,
+                        limit: int = 20, max_frontier: int = 200000,
+                        allowed_nodes: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray, float]]:
+        """
+        逐层扩展路径并向量化评分，返回得分最高的limit条路径 [(节点序号, 关系编号, 得分)]
+
+        评分与原Cypher一致：1/路径长度 + 路径节点平均度数/10 + 命中关系类型时0.3
+        路径中同一条关系不重复使用（与Cypher的关系唯一性语义一致）；
+        每层展开的路径数超过 max_frontier 时，优先展开节点度数和较大的部分路径；
+        allowed_nodes（节点掩码，如查询约束）在展开时剪掉经过不允许节点的路径，先于limit截断
+        """
+        if allowed_nodes is not None:
+            sources = [source for source in sources if allowed_nodes[source]]
+        if not sources or max_depth < 1:
+            return []
+
+        bonus_types = self.type_mask(relation_types)
+        allowed_types = self.type_mask(allowed_relation_types) if allowed_relation_types else None
+        targets = self.target_mask(target_keywords) if target_keywords else None
+
+        nodes = np.unique(np.asarray(sources, dtype=np.int32))[:, None]
+        edges = np.empty((len(nodes), 0), dtype=np.int32)
+        degree_sums = self.degrees[nodes[:, 0]].astype(np.float64)
+
+        # 每个深度各保留前limit条候选（同一深度的路径等长，可直接用二维数组）
+        candidates: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        pruned = False
+
+        for depth in range(1, max_depth + 1):
+            last = nodes[:, -1]
+            counts = self.degrees[last]
+
+            # 展开预算：超出时保留度数和最大的部分路径
+            if counts.sum() > max_frontier:
+                order = np.argsort(-degree_sums, kind="stable")
+                keep_count = max(1, int(np.searchsorted(np.cumsum(counts[order]), max_frontier, side="right")))
+                keep = order[:keep_count]
+                nodes, edges, degree_sums = nodes[keep], edges[keep], degree_sums[keep]
+                last, counts = nodes[:, -1], counts[keep]
+                pruned = True
+
+            total = int(counts.sum())
+            if total == 0:
+                break
+
+            # CSR批量展开：每条路径按末端节点的邻接区间复制
+            rows = np.repeat(np.arange(len(nodes)), counts)
+            row_starts = np.cumsum(counts) - counts
+            positions = np.repeat(self.indptr[last] - row_starts, counts) + np.arange(total)
+            neighbors = self.indices[positions]
+            edge_ids = self.edge_ids[positions]
+
+            valid = np.ones(total, dtype=bool)
+            if allowed_types is not None:
+                valid &= allowed_types[self.edge_types[edge_ids]]
+            if allowed_nodes is not None:
+                valid &= allowed_nodes[neighbors]
+            if depth > 1:
+                valid &= ~(edges[rows] == edge_ids[:, None]).any(axis=1)
+
+            rows, neighbors, edge_ids = rows[valid], neighbors[valid], edge_ids[valid]
+            nodes = np.hstack([nodes[rows], neighbors[:, None]])
+            edges = np.hstack([edges[rows], edge_ids[:, None]])
+            degree_sums = degree_sums[rows] + self.degrees[neighbors]
+
+            # 对以当前节点为终点的路径评分
+            complete = nodes[:, 0] != neighbors
+            if targets is not None:
+                complete &= targets[neighbors]
+            if complete.any():
+                scores = (1.0 / depth
+                          + degree_sums[complete] / 10.0 / (depth + 1)
+                          + np.where(bonus_types[self.edge_types[edges[complete]]].any(axis=1), 0.3, 0.0))
+                complete_nodes, complete_edges = nodes[complete], edges[complete]
+                if len(scores) > limit:
+                    top = np.argpartition(-scores, limit - 1)[:limit]
+                    complete_nodes, complete_edges, scores = complete_nodes[top], complete_edges[top], scores[top]
+                candidates.append((complete_nodes, complete_edges, scores))
+
+        if pruned:
+            logger.info(f"多跳遍历展开超过 {max_frontier} 条路径，已按节点度数裁剪")
+
+        ranked = [
+            (path_nodes[i], path_edges[i], float(scores[i]))
+            for path_nodes, path_edges, scores in candidates
+            for i in range(len(scores))
+        ]
+        ranked.sort(key=lambda item: -item[2])
+        return ranked[:limit]
+
+    # ==================== 最短路径 ====================
+
+    def _expand_level(self, frontier: List[int], dist: Dict[int, int], parents: Dict[int, List[Tuple[int, int]]],
+                      allowed_types: Optional[np.ndarray], allowed_nodes: Optional[np.ndarray] = None) -> List[int]:
+        """BFS向外扩展一层，记录所有同层父节点（用于枚举全部最短路径），不进入 allowed_nodes 之外的节点"""
+        next_frontier = []
+        for node in frontier:
+            level = dist[node] + 1
+            start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+            neighbors = self.indices[start:end]
+            edge_ids = self.edge_ids[start:end]
+            if allowed_types is not None:
+                keep = allowed_types[self.edge_types[edge_ids]]
+                neighbors, edge_ids = neighbors[keep], edge_ids[keep]
+            if allowed_nodes is not None:
+                keep = allowed_nodes[neighbors]
+                neighbors, edge_ids = neighbors[keep], edge_ids[keep]
+            for neighbor, edge_id in zip(neighbors.tolist(), edge_ids.tolist()):
+                known = dist.get(neighbor)
+                if known is None:
+                    dist[neighbor] = level
+                    parents[neighbor] = [(node, edge_id)]
+                    next_frontier.append(neighbor)
+                elif known == level:
+                    parents[neighbor].append((node, edge_id))
+        return next_frontier
+
+    @staticmethod
+    def _walk_parents(node: int, parents: Dict[int, List[Tuple[int, int]]], limit: int) -> List[Tuple[List[int], List[int]]]:
+        """沿父节点指针枚举从起点到node的全部最短路径（最多limit条），返回 [(节点序列, 关系序列)]"""
+        if node not in parents:
+            return [([node], [])]
+        walks = []
+        for parent, edge_id in parents[node]:
+            for walk_nodes, walk_edges in GraphSnapshot._walk_parents(parent, parents, limit - len(walks)):
+                walks.append((walk_nodes + [node], walk_edges + [edge_id]))
+                if len(walks) >= limit:
+                    return walks
+        return walks
+
+    def shortest_paths(self, sources: List[int], targets: List[int], max_depth: int,
+                       allowed_relation_types: Optional[List[str]] = None,
+                       max_paths: int = 10,
+                       allowed_nodes: Optional[np.ndarray] = None) -> List[Tuple[List[int], List[int]]]:
+        """
+        双向BFS求起点集合到终点集合的全部最短路径（最多max_paths条）
+
+        每轮扩展两侧中较小的前沿，两侧访问集合相遇时即得到最短长度，
+        再沿两侧的父节点指针拼接路径；allowed_relation_types 限制可经过的关系类型，
+        allowed_nodes（节点掩码）限制可经过的节点
+        """
+        sources = list(dict.fromkeys(sources))
+        targets = list(dict.fromkeys(targets))
+        if allowed_nodes is not None:
+            sources = [node for node in sources if allowed_nodes[node]]
+            targets = [node for node in targets if allowed_nodes[node]]
+        if not sources or not targets:
+            return []
+
+        # 起点和终点是同一节点的组合跳过（与Cypher的 source <> target 一致），其余组合分组求最短路径
+        overlap = [node for node in sources if node in set(targets)]
+        if overlap:
+            groups = [([node for node in sources if node not in overlap], targets)]
+            groups.extend(([node], [target for target in targets if target != node]) for node in overlap)
+            paths = []
+            for group_sources, group_targets in groups:
+                paths.extend(self.shortest_paths(group_sources, group_targets, max_depth,
+                                                 allowed_relation_types, max_paths, allowed_nodes))
+            paths.sort(key=lambda path: len(path[1]))
+            return paths[:max_paths]
+
+        allowed_types = self.type_mask(allowed_relation_types) if allowed_relation_types else None
+        dist_s = {node: 0 for node in sources}
+        dist_t = {node: 0 for node in targets}
+        parents_s: Dict[int, List[Tuple[int, int]]] = {}
+        parents_t: Dict[int, List[Tuple[int, int]]] = {}
+        frontier_s, frontier_t = list(sources), list(targets)
+
+        meeting: List[int] = []
+        depth = 0
+        while not meeting and frontier_s and frontier_t and depth < max_depth:
+            # 扩展较小的一侧
+            if len(frontier_s) <= len(frontier_t):
+                frontier_s = self._expand_level(frontier_s, dist_s, parents_s, allowed_types, allowed_nodes)
+                meeting = [node for node in frontier_s if node in dist_t]
+            else:
+                frontier_t = self._expand_level(frontier_t, dist_t, parents_t, allowed_types, allowed_nodes)
+                meeting = [node for node in frontier_t if node in dist_s]
+            depth += 1
+
+        if not meeting:
+            return []
+
+        # 只保留总长度最短的相遇点
+        best = min(dist_s[node] + dist_t[node] for node in meeting)
+        paths = []
+        for node in meeting:
+            if dist_s[node] + dist_t[node] != best:
+                continue
+            for head_nodes, head_edges in self._walk_parents(node, parents_s, max_paths):
+                for tail_nodes, tail_edges in self._walk_parents(node, parents_t, max_paths):
+                    # 终点一侧的路径需要反转方向
+                    paths.append((head_nodes + tail_nodes[::-1][1:], head_edges + tail_edges[::-1]))
+                    if len(paths) >= max_paths:
+                        return paths
+        return paths
+
+    def path_score(self, path_nodes: Sequence[int], path_edges: Sequence[int],
+                   relation_types: Optional[List[str]] = None) -> float:
+        """单条路径的评分，与多跳遍历的评分公式一致"""
+        if not path_edges:
+            return 0.0
+        bonus_types = self.type_mask(relation_types)
+        score = 1.0 / len(path_edges) + float(self.degrees[list(path_nodes)].sum()) / 10.0 / len(path_nodes)
+        if bonus_types[self.edge_types[list(path_edges)]].any():
+            score += 0.3
+        return score
+
+    # ==================== 子图扩展 ====================
+
+    def sample_neighbors(self, frontier: List[int], per_node_limit: int,
+                         allowed_nodes: Optional[np.ndarray] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        取一批节点的邻居 [(父节点, 关系编号, 邻居, 邻居度数)]
+        度数超过 per_node_limit 的枢纽节点在邻接区间内等距采样，单个节点的开销有上界；
+        allowed_nodes（节点掩码）在采样之前过滤邻居
+        """
+        expanded = []
+        for parent in frontier:
+            positions = np.arange(int(self.indptr[parent]), int(self.indptr[parent + 1]))
+            if allowed_nodes is not None:
+                positions = positions[allowed_nodes[self.indices[positions]]]
+            if len(positions) > per_node_limit:
+                positions = positions[np.linspace(0, len(positions) - 1, per_node_limit).astype(np.int64)]
+            neighbors = self.indices[positions]
+            for edge_id, neighbor, degree in zip(self.edge_ids[positions].tolist(), neighbors.tolist(),
+                                                 self.degrees[neighbors].tolist()):
+                expanded.append((parent, edge_id, neighbor, degree))
+        return expanded
+
+    # ==================== 子图矩阵 ====================
+
+    def label_subgraph(self, labels: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+        """
+        只保留两端节点都带有指定标签之一的关系，构建无向邻接矩阵（重复关系累加权重）
+
+        Returns:
+            (子图节点的快照序号, 快照序号 -> 子图位置（不在子图中为-1）, 对称CSR邻接矩阵)
+        """
+        in_graph = np.fromiter((any(label in labels for label in node_labels) for node_labels in self.node_labels),
+                               dtype=bool, count=self.node_count)
+        nodes = np.flatnonzero(in_graph)
+        position = np.full(self.node_count, -1, dtype=np.int64)
+        position[nodes] = np.arange(len(nodes))
+
+        keep = in_graph[self.edge_sources] & in_graph[self.edge_targets]
+        sources = position[self.edge_sources[keep]]
+        targets = position[self.edge_targets[keep]]
+        adjacency = sparse.coo_matrix(
+            (np.ones(2 * len(sources), dtype=np.float32),
+             (np.concatenate([sources, targets]), np.concatenate([targets, sources]))),
+            shape=(len(nodes), len(nodes))
+        ).tocsr()
+        adjacency.sum_duplicates()
+        return nodes, position, adjacency
+
+    # ==================== 结果转换 ====================
+
+    def node_dict(self, index: int) -> Dict[str, Any]:
+        """节点的字典表示（与Neo4j路径解析结果的格式一致）"""
+        properties = self.node_properties[index]
+        return {
+            "id": properties.get("nodeId", ""),
+            "name": properties.get("name", ""),
+            "labels": list(self.node_labels[index]),
+            "properties": dict(properties)
+        }
+
+    def edge_dict(self, edge_id: int) -> Dict[str, Any]:
+        """关系的字典表示"""
+        return {
+            "type": self.type_names[self.edge_types[edge_id]],
+            "properties": dict(self.edge_properties[edge_id] or {})
+        }
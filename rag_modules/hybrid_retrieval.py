@@ -4,15 +4,26 @@
 结合图结构检索和向量检索，使用Round-robin轮询策略
 """
 
+import heapq
 import json
 import logging
-from typing import List, Dict, Tuple, Any
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Tuple, Any, Callable, Iterable, Iterator, Optional
 from dataclasses import dataclass
 
 from langchain_core.documents import Document
 from langchain_community.retrievers import BM25Retriever
-from neo4j import GraphDatabase
+from .graph_data_preparation import GraphNode
 from .graph_indexing import GraphIndexingModule
+from .graph_projections import INGREDIENT_FIELDS, RECIPE_FIELDS, STEP_FIELDS, compact, projection, unique_fields
+from .neo4j_pool import Neo4jPool, get_pool
+from .query_constraints import QueryConstraints
+from .streaming_json import FieldCallback, stream_llm_json
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +37,72 @@ class RetrievalResult:
     retrieval_level: str  # 'low' or 'high'
     metadata: Dict[str, Any]
 
+class SpeculativeRetrieval:
+    """
+    路由进行中提前启动的低成本检索分支（向量检索、BM25词法检索）
+
+    所选策略需要某个分支时用 take 取走结果（top_k不超过提前检索的top_k时截取前缀），
+    路由结束后 finish 取消未使用的分支并统计命中/浪费
+    """
+    
+    def __init__(self, query: str, top_k: int, stats: Dict[str, float], lock):
+        self.query = query
+        self.top_k = top_k
+        self.futures: Dict[str, Future] = {}
+        self.timings: Dict[str, List[float]] = {}  # 分支 -> [开始时间, 结束时间]
+        self._stats = stats
+        self._lock = lock
+    
+    def submit(self, executor: ThreadPoolExecutor, leg: str, retrieval: Callable[[], List[Document]]):
+        timing = self.timings[leg] = [0.0, 0.0]
+        
+        def run() -> List[Document]:
+            timing[0] = time.perf_counter()
+            try:
+                return retrieval()
+            finally:
+                timing[1] = time.perf_counter()
+        
+        self.futures[leg] = executor.submit(run)
+        self._count("legs_started")
+    
+    def take(self, leg: str, top_k: int) -> Optional[List[Document]]:
+        """取走分支结果；没有该分支、top_k更大或分支失败时返回None（由调用方重新检索）"""
+        future = self.futures.pop(leg, None) if top_k <= self.top_k else None
+        if future is None:
+            return None
+        waited_at = time.perf_counter()
+        try:
+            documents = future.result()
+        except Exception as e:
+            logger.error(f"提前检索分支失败，重新检索 ({leg}): {e}")
+            self._count("legs_failed")
+            return None
+        start, end = self.timings[leg]
+        with self._lock:
+            self._stats["legs_used"] += 1
+            # 节省的延迟：需要结果之前分支已经运行的时间
+            self._stats["saved_ms"] += (min(end, waited_at) - start) * 1000
+        return documents[:top_k]
+    
+    def finish(self):
+        """取消未使用的分支：尚未开始的直接取消，已在执行或已完成的计为浪费"""
+        for leg, future in self.futures.items():
+            if future.cancel():
+                self._count("legs_cancelled")
+            else:
+                self._count("legs_wasted")
+                future.add_done_callback(lambda _, timing=self.timings[leg]: self._add_wasted(timing))
+        self.futures.clear()
+    
+    def _add_wasted(self, timing: List[float]):
+        with self._lock:
+            self._stats["wasted_ms"] += (timing[1] - timing[0]) * 1000
+    
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
 class HybridRetrievalModule:
     """
     混合检索模块
@@ -42,26 +119,46 @@ class HybridRetrievalModule:
         self.milvus_module = milvus_module
         self.data_module = data_module
         self.llm_client = llm_client
-        self.driver = None
+        self.pool: Optional[Neo4jPool] = None
         self.bm25_retriever = None
         
         # 图索引模块
         self.graph_indexing = GraphIndexingModule(config, llm_client)
         self.graph_indexed = False
         
+        # 主题倒排表：主题(分类/菜系/标签) -> 菜谱nodeId
+        self.topic_to_recipes: Dict[str, List[str]] = defaultdict(list)
+        self.recipe_sort_keys: Dict[str, Tuple] = {}
+        
+        # 投机检索统计：路由进行中提前启动的分支被使用/浪费的次数和耗时
+        self.speculation_stats: Dict[str, float] = {
+            "speculations": 0, "legs_started": 0, "legs_used": 0, "legs_wasted": 0,
+            "legs_cancelled": 0, "legs_failed": 0, "saved_ms": 0.0, "wasted_ms": 0.0
+        }
+        self._speculation_lock = threading.Lock()
+        # BM25词法检索（字符二元组分词）作为混合检索的第三路来源（可选），投机检索只提前执行已启用的分支
+        self.lexical_search = getattr(config, 'hybrid_bm25_source', False)
+        
+        # 提前检索线程池（流式关键词提取时并行执行实体/主题检索，路由时投机执行低成本分支）
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(config, 'retrieval_workers', 4),
+            thread_name_prefix="hybrid-retrieval"
+        )
+        
     def initialize(self, chunks: List[Document]):
         """初始化检索系统"""
         logger.info("初始化混合检索模块...")
         
-        # 连接Neo4j
-        self.driver = GraphDatabase.driver(
-            self.config.neo4j_uri, 
-            auth=(self.config.neo4j_user, self.config.neo4j_password)
-        )
+        # 连接Neo4j（与其他模块共享连接池）
+        if self.pool is None:
+            self.pool = get_pool(self.config)
         
         # 初始化BM25检索器
         if chunks:
-            self.bm25_retriever = BM25Retriever.from_documents(chunks)
+            if self.lexical_search:
+                self.bm25_retriever = BM25Retriever.from_documents(chunks, preprocess_func=self._lexical_tokens)
+            else:
+                self.bm25_retriever = BM25Retriever.from_documents(chunks)
             logger.info(f"BM25检索器初始化完成，文档数量: {len(chunks)}")
         
         # 初始化图索引
@@ -83,9 +180,11 @@ class HybridRetrievalModule:
             # 创建实体键值对
             self.graph_indexing.create_entity_key_values(recipes, ingredients, cooking_steps)
             
-            # 创建关系键值对（这里需要从Neo4j获取关系数据）
-            relationships = self._extract_relationships_from_graph()
-            self.graph_indexing.create_relation_key_values(relationships)
+            # 主题倒排表（主题级Neo4j补充检索使用）
+            self._build_topic_index()
+            
+            # 创建关系键值对（从Neo4j分页流式读取关系，边读边建索引）
+            self.graph_indexing.create_relation_key_values(self._iter_relationships_from_graph())
             
             # 去重优化
             self.graph_indexing.deduplicate_entities_and_relations()
@@ -97,35 +196,72 @@ class HybridRetrievalModule:
         except Exception as e:
             logger.error(f"构建图索引失败: {e}")
             
-    def _extract_relationships_from_graph(self) -> List[Tuple[str, str, str]]:
-        """从Neo4j图中提取关系"""
-        relationships = []
+    # 关系源节点的标签：只有这些节点会进入实体键值存储，其他源节点的关系在建索引时会被丢弃
+    RELATION_SOURCE_LABELS = ("Recipe", "Ingredient", "CookingStep")
+    
+    def _iter_relationships_from_graph(self, page_size: Optional[int] = None) -> Iterator[Tuple[str, str, str]]:
+        """
+        从Neo4j图中流式提取关系
+        按源节点nodeId做键集分页（走唯一约束索引），每次只在内存中保留一页，
+        避免一次性拉取全部关系造成启动时的内存峰值
+        """
+        page_size = page_size or getattr(self.config, 'relationship_page_size', 2000)
+        total_rows = 0
+        start_time = time.time()
         
-        try:
-            with self.driver.session() as session:
-                query = """
-                MATCH (source)-[r]->(target)
-                WHERE source.nodeId >= '200000000' OR target.nodeId >= '200000000'
-                RETURN source.nodeId as source_id, type(r) as relation_type, target.nodeId as target_id
-                LIMIT 1000
-                """
-                result = session.run(query)
+        for label in self.RELATION_SOURCE_LABELS:
+            query = f"""
+            MATCH (source:{label})
+            WHERE source.nodeId > $last_node_id
+            WITH source
+            ORDER BY source.nodeId
+            LIMIT $page_size
+            RETURN source.nodeId as source_id,
+                   [(source)-[r]->(target)
+                    WHERE source.nodeId >= '200000000' OR target.nodeId >= '200000000'
+                    | [type(r), target.nodeId]] as rels
+            """
+            last_node_id = ""
+            label_rows = 0
+            
+            while True:
+                try:
+                    page = [record.values() for record in self.pool.read(query, {
+                        "last_node_id": last_node_id,
+                        "page_size": page_size
+                    })]
+                except Exception as e:
+                    logger.error(f"提取图关系失败 ({label}, 起始nodeId: {last_node_id}): {e}")
+                    break
                 
-                for record in result:
-                    relationships.append((
-                        record["source_id"],
-                        record["relation_type"],
-                        record["target_id"]
-                    ))
-                    
-        except Exception as e:
-            logger.error(f"提取图关系失败: {e}")
+                if not page:
+                    break
+                
+                for source_id, rels in page:
+                    for relation_type, target_id in rels:
+                        label_rows += 1
+                        yield source_id, relation_type, target_id
+                
+                last_node_id = page[-1][0]
+                elapsed = time.time() - start_time
+                logger.debug(f"关系分页加载 {label}: 已读取 {total_rows + label_rows} 条, "
+                             f"{(total_rows + label_rows) / elapsed if elapsed > 0 else 0:.0f} 行/秒")
+                
+                if len(page) < page_size:
+                    break
             
-        return relationships
+            total_rows += label_rows
+            logger.info(f"{label} 关系加载完成: {label_rows} 条")
+        
+        elapsed = time.time() - start_time
+        logger.info(f"图关系流式加载完成: 共 {total_rows} 条, 耗时 {elapsed:.2f}秒, "
+                    f"{total_rows / elapsed if elapsed > 0 else 0:.0f} 行/秒")
             
-    def extract_query_keywords(self, query: str) -> Tuple[List[str], List[str]]:
+    def extract_query_keywords(self, query: str,
+                               on_field: Optional[FieldCallback] = None) -> Tuple[List[str], List[str]]:
         """
         提取查询关键词：实体级 + 主题级
+        开启流式分析时，entity_keywords / topic_keywords 数组一闭合就通过 on_field 回调
         """
         prompt = f"""
         作为烹饪知识助手，请分析以下查询并提取关键词，分为两个层次：
@@ -162,14 +298,24 @@ class HybridRetrievalModule:
         """
         
         try:
-            response = self.llm_client.chat.completions.create(
-                model=self.config.llm_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=500
-            )
+            if getattr(self.config, 'stream_query_analysis', False):
+                result = stream_llm_json(
+                    self.llm_client,
+                    model=self.config.llm_model,
+                    prompt=prompt,
+                    temperature=0.1,
+                    max_tokens=500,
+                    on_field=on_field
+                )
+            else:
+                response = self.llm_client.chat.completions.create(
+                    model=self.config.llm_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.1,
+                    max_tokens=500
+                )
+                result = json.loads(response.choices[0].message.content.strip())
             
-            result = json.loads(response.choices[0].message.content.strip())
             entity_keywords = result.get("entity_keywords", [])
             topic_keywords = result.get("topic_keywords", [])
             
@@ -187,35 +333,18 @@ class HybridRetrievalModule:
         实体级检索：专注于具体实体和关系
         使用图索引的键值对结构进行检索
         """
-        results = []
-        
-        # 1. 使用图索引进行实体检索
+        # 1. 使用图索引进行实体检索：先收集轻量候选，只为入选的top_k个实体查询邻居、构建内容
+        streams = []
         for keyword in entity_keywords:
-            # 检索匹配的实体
-            entities = self.graph_indexing.get_entities_by_key(keyword)
-            
-            for entity in entities:
-                # 获取邻居信息
-                neighbors = self._get_node_neighbors(entity.metadata["node_id"], max_neighbors=2)
-                
-                # 构建增强内容
-                enhanced_content = entity.value_content
-                if neighbors:
-                    enhanced_content += f"\n相关信息: {', '.join(neighbors)}"
-                
-                results.append(RetrievalResult(
-                    content=enhanced_content,
-                    node_id=entity.metadata["node_id"],
-                    node_type=entity.entity_type,
-                    relevance_score=0.9,  # 精确匹配得分较高
-                    retrieval_level="entity",
-                    metadata={
-                        "entity_name": entity.entity_name,
-                        "entity_type": entity.entity_type,
-                        "index_keys": entity.index_keys,
-                        "matched_keyword": keyword
-                    }
-                ))
+            # 检索匹配的实体（精确键未命中时在进程内做子串/前缀匹配）
+            entities = list(islice(self.graph_indexing.iter_entities_by_key(keyword), top_k))
+            score = 0.9  # 精确匹配得分较高
+            if not entities:
+                entities = self.graph_indexing.iter_entities_by_key(keyword, fuzzy=True)
+                score = 0.8  # 模糊匹配得分略低
+            streams.append((score, keyword, entities, self._entity_result))
+        
+        results = [build(item, keyword, score) for score, keyword, item, build in self._select_top_k(streams, top_k)]
         
         # 2. 如果图索引结果不足，使用Neo4j进行补充检索
         if len(results) < top_k:
@@ -228,51 +357,91 @@ class HybridRetrievalModule:
         logger.info(f"实体级检索完成，返回 {len(results)} 个结果")
         return results[:top_k]
     
+    def _entity_result(self, entity, keyword: str, score: float) -> RetrievalResult:
+        """将入选的实体构建为实体级检索结果（含邻居信息）"""
+        # 获取邻居信息
+        neighbors = self._get_node_neighbors(entity.metadata["node_id"], max_neighbors=2)
+        
+        # 构建增强内容
+        enhanced_content = entity.full_content
+        if neighbors:
+            enhanced_content += f"\n相关信息: {', '.join(neighbors)}"
+        
+        return RetrievalResult(
+            content=enhanced_content,
+            node_id=entity.metadata["node_id"],
+            node_type=entity.entity_type,
+            relevance_score=score,
+            retrieval_level="entity",
+            metadata={
+                "entity_name": entity.entity_name,
+                "entity_type": entity.entity_type,
+                "index_keys": entity.index_keys,
+                "matched_keyword": keyword
+            }
+        )
+    
+    @staticmethod
+    def _select_top_k(streams: List[Tuple[float, str, Iterable, Callable]], top_k: int) -> List[Tuple[float, str, Any, Callable]]:
+        """
+        从多路候选流中选出得分最高的top_k个候选
+        
+        每路候选为 (得分, 匹配关键词, 惰性候选迭代器, 结果构建函数)，同一路内得分相同，
+        因此每路最多取前top_k个即可；候选只是轻量元组，内容构建和邻居查询留给入选者
+        """
+        candidates = []
+        for score, keyword, items, build in streams:
+            for item in islice(items, top_k):
+                # 序号保证同分时保持原有顺序，且不比较候选对象本身
+                candidates.append((-score, len(candidates), keyword, item, build))
+        
+        return [(-neg_score, keyword, item, build)
+                for neg_score, _, keyword, item, build in heapq.nsmallest(top_k, candidates)]
+    
     def _neo4j_entity_level_search(self, keywords: List[str], limit: int) -> List[RetrievalResult]:
         """Neo4j补充检索"""
         results = []
         
         try:
-            with self.driver.session() as session:
-                cypher_query = """
-                UNWIND $keywords as keyword
-                CALL db.index.fulltext.queryNodes('recipe_fulltext_index', keyword + '*') 
-                YIELD node, score
-                WHERE node:Recipe
-                RETURN 
-                    node.nodeId as node_id,
-                    node.name as name,
-                    node.description as description,
-                    labels(node) as labels,
-                    score
-                ORDER BY score DESC
-                LIMIT $limit
-                """
+            cypher_query = """
+            UNWIND $keywords as keyword
+            CALL db.index.fulltext.queryNodes('recipe_fulltext_index', keyword + '*') 
+            YIELD node, score
+            WHERE node:Recipe
+            RETURN 
+                node.nodeId as node_id,
+                node.name as name,
+                node.description as description,
+                labels(node) as labels,
+                score
+            ORDER BY score DESC
+            LIMIT $limit
+            """
                 
-                result = session.run(cypher_query, {
-                    "keywords": keywords,
-                    "limit": limit
-                })
+            result = self.pool.cached_read(cypher_query, {
+                "keywords": keywords,
+                "limit": limit
+            })
                 
-                for record in result:
-                    content_parts = []
-                    if record["name"]:
-                        content_parts.append(f"菜品: {record['name']}")
-                    if record["description"]:
-                        content_parts.append(f"描述: {record['description']}")
+            for record in result:
+                content_parts = []
+                if record["name"]:
+                    content_parts.append(f"菜品: {record['name']}")
+                if record["description"]:
+                    content_parts.append(f"描述: {record['description']}")
                     
-                    results.append(RetrievalResult(
-                        content='\n'.join(content_parts),
-                        node_id=record["node_id"],
-                        node_type="Recipe",
-                        relevance_score=float(record["score"]) * 0.7,  # 补充检索得分较低
-                        retrieval_level="entity",
-                        metadata={
-                            "name": record["name"],
-                            "labels": record["labels"],
-                            "source": "neo4j_fallback"
-                        }
-                    ))
+                results.append(RetrievalResult(
+                    content='\n'.join(content_parts),
+                    node_id=record["node_id"],
+                    node_type="Recipe",
+                    relevance_score=float(record["score"]) * 0.7,  # 补充检索得分较低
+                    retrieval_level="entity",
+                    metadata={
+                        "name": record["name"],
+                        "labels": record["labels"],
+                        "source": "neo4j_fallback"
+                    }
+                ))
                     
         except Exception as e:
             logger.error(f"Neo4j补充检索失败: {e}")
@@ -284,146 +453,312 @@ class HybridRetrievalModule:
         主题级检索：专注于广泛主题和概念
         使用图索引的关系键值对结构进行主题检索
         """
-        results = []
+        # 先按得分分层收集轻量候选，只为入选的top_k个候选构建内容
+        streams = []
         
-        # 1. 使用图索引进行关系/主题检索
+        # 1. 多个主题词同时命中的关系（倒排表求交集），得分最高
+        if len(topic_keywords) > 1:
+            relations = self.graph_indexing.iter_relations_by_keys(topic_keywords, match_all=True)
+            streams.append((0.98, "+".join(topic_keywords), filter(self._relation_has_entities, relations),
+                            self._relation_topic_result))
+        
+        # 2. 使用图索引进行关系/主题检索
         for keyword in topic_keywords:
-            # 检索匹配的关系
-            relations = self.graph_indexing.get_relations_by_key(keyword)
-            
-            for relation in relations:
-                # 获取相关实体信息
-                source_entity = self.graph_indexing.entity_kv_store.get(relation.source_entity)
-                target_entity = self.graph_indexing.entity_kv_store.get(relation.target_entity)
-                
-                if source_entity and target_entity:
-                    # 构建丰富的主题内容
-                    content_parts = [
-                        f"主题: {keyword}",
-                        relation.value_content,
-                        f"相关菜品: {source_entity.entity_name}",
-                        f"相关信息: {target_entity.entity_name}"
-                    ]
-                    
-                    # 添加源实体的详细信息
-                    if source_entity.entity_type == "Recipe":
-                        newline = '\n'
-                        content_parts.append(f"菜品详情: {source_entity.value_content.split(newline)[0]}")
-                    
-                    results.append(RetrievalResult(
-                        content='\n'.join(content_parts),
-                        node_id=relation.source_entity,  # 以主要实体为ID
-                        node_type=source_entity.entity_type,
-                        relevance_score=0.95,  # 主题匹配得分
-                        retrieval_level="topic",
-                        metadata={
-                            "relation_id": relation.relation_id,
-                            "relation_type": relation.relation_type,
-                            "source_name": source_entity.entity_name,
-                            "target_name": target_entity.entity_name,
-                            "matched_keyword": keyword,
-                            "index_keys": relation.index_keys
-                        }
-                    ))
-        
-        # 2. 使用实体的分类信息进行主题检索
+            # 检索匹配的关系（精确键未命中时在进程内做子串/前缀匹配），已在交集中出现的跳过
+            relations = self.graph_indexing.iter_relations_by_key(keyword, fuzzy=True)
+            relations = (
+                relation for relation in relations
+                if self._relation_has_entities(relation)
+                and not (len(topic_keywords) > 1 and all(k in relation.index_keys for k in topic_keywords))
+            )
+            streams.append((0.95, keyword, relations, self._relation_topic_result))  # 主题匹配得分
+        
+        # 3. 使用实体的分类信息进行主题检索
         for keyword in topic_keywords:
-            entities = self.graph_indexing.get_entities_by_key(keyword)
-            for entity in entities:
-                if entity.entity_type == "Recipe":
-                    # 构建分类主题内容
-                    content_parts = [
-                        f"主题分类: {keyword}",
-                        entity.value_content
-                    ]
-                    
-                    results.append(RetrievalResult(
-                        content='\n'.join(content_parts),
-                        node_id=entity.metadata["node_id"],
-                        node_type=entity.entity_type,
-                        relevance_score=0.85,  # 分类匹配得分
-                        retrieval_level="topic",
-                        metadata={
-                            "entity_name": entity.entity_name,
-                            "entity_type": entity.entity_type,
-                            "matched_keyword": keyword,
-                            "source": "category_match"
-                        }
-                    ))
-        
-        # 3. 如果结果不足，使用Neo4j进行补充检索
+            entities = (
+                entity for entity in self.graph_indexing.iter_entities_by_key(keyword)
+                if entity.entity_type == "Recipe"
+            )
+            streams.append((0.85, keyword, entities, self._category_topic_result))  # 分类匹配得分
+        
+        results = [build(item, keyword, score) for score, keyword, item, build in self._select_top_k(streams, top_k)]
+        
+        # 4. 如果结果不足，使用Neo4j进行补充检索
         if len(results) < top_k:
             neo4j_results = self._neo4j_topic_level_search(topic_keywords, top_k - len(results))
             results.extend(neo4j_results)
             
-        # 4. 按相关性排序并返回
+        # 5. 按相关性排序并返回
         results.sort(key=lambda x: x.relevance_score, reverse=True)
         
         logger.info(f"主题级检索完成，返回 {len(results)} 个结果")
         return results[:top_k]
     
+    def _relation_has_entities(self, relation) -> bool:
+        """关系的两端实体是否都在图索引中"""
+        entity_kv_store = self.graph_indexing.entity_kv_store
+        return relation.source_entity in entity_kv_store and relation.target_entity in entity_kv_store
+    
+    def _relation_topic_result(self, relation, keyword: str, score: float) -> RetrievalResult:
+        """将入选的关系键值对构建为主题级检索结果"""
+        # 获取相关实体信息
+        source_entity = self.graph_indexing.entity_kv_store[relation.source_entity]
+        target_entity = self.graph_indexing.entity_kv_store[relation.target_entity]
+        
+        # 构建丰富的主题内容
+        content_parts = [
+            f"主题: {keyword}",
+            relation.value_content,
+            f"相关菜品: {source_entity.entity_name}",
+            f"相关信息: {target_entity.entity_name}"
+        ]
+        
+        # 添加源实体的详细信息
+        if source_entity.entity_type == "Recipe":
+            newline = '\n'
+            content_parts.append(f"菜品详情: {source_entity.value_content.split(newline)[0]}")
+        
+        return RetrievalResult(
+            content='\n'.join(content_parts),
+            node_id=relation.source_entity,  # 以主要实体为ID
+            node_type=source_entity.entity_type,
+            relevance_score=score,
+            retrieval_level="topic",
+            metadata={
+                "relation_id": relation.relation_id,
+                "relation_type": relation.relation_type,
+                "source_name": source_entity.entity_name,
+                "target_name": target_entity.entity_name,
+                "matched_keyword": keyword,
+                "index_keys": relation.index_keys
+            }
+        )
+    
+    def _category_topic_result(self, entity, keyword: str, score: float) -> RetrievalResult:
+        """将入选的菜谱实体构建为分类主题检索结果"""
+        # 构建分类主题内容
+        content_parts = [
+            f"主题分类: {keyword}",
+            entity.full_content
+        ]
+        
+        return RetrievalResult(
+            content='\n'.join(content_parts),
+            node_id=entity.metadata["node_id"],
+            node_type=entity.entity_type,
+            relevance_score=score,
+            retrieval_level="topic",
+            metadata={
+                "entity_name": entity.entity_name,
+                "entity_type": entity.entity_type,
+                "matched_keyword": keyword,
+                "source": "category_match"
+            }
+        )
+    
+    # 菜谱标签的分隔符（中英文逗号、顿号、分号、空白）
+    TOPIC_TAG_SEPARATORS = re.compile(r"[,，、;；\s]+")
+    
+    def _build_topic_index(self):
+        """
+        构建主题 -> 菜谱的倒排表
+        主题来自菜谱的分类、菜系和拆分后的标签，替代对Recipe标签的CONTAINS全量扫描
+        """
+        self.topic_to_recipes.clear()
+        self.recipe_sort_keys.clear()
+        
+        for recipe in self.data_module.recipes:
+            self._add_recipe_topics(recipe)
+        
+        logger.info(f"主题倒排表构建完成: {len(self.topic_to_recipes)} 个主题, {len(self.recipe_sort_keys)} 个菜谱")
+    
+    def _add_recipe_topics(self, recipe):
+        """把单个菜谱加入主题倒排表"""
+        props = recipe.properties or {}
+        topics = set()
+        
+        for value in [props.get('category'), props.get('cuisineType')] + list(props.get('all_categories') or []):
+            if value:
+                topics.add(str(value).strip())
+        if props.get('tags'):
+            topics.update(t.strip() for t in self.TOPIC_TAG_SEPARATORS.split(str(props['tags'])))
+        
+        for topic in topics:
+            if topic:
+                self.topic_to_recipes[topic].append(recipe.node_id)
+        
+        # 与原Cypher的 ORDER BY r.difficulty ASC, r.name 保持一致（null排在最后）
+        difficulty = props.get('difficulty')
+        self.recipe_sort_keys[recipe.node_id] = (
+            difficulty is None,
+            difficulty if isinstance(difficulty, (int, float)) else 0,
+            recipe.name or ""
+        )
+    
+    def _remove_recipe_topics(self, recipe_id: str):
+        """把单个菜谱从主题倒排表中移除"""
+        if self.recipe_sort_keys.pop(recipe_id, None) is None:
+            return
+        for topic in list(self.topic_to_recipes):
+            recipe_ids = self.topic_to_recipes[topic]
+            if recipe_id in recipe_ids:
+                recipe_ids.remove(recipe_id)
+                if not recipe_ids:
+                    del self.topic_to_recipes[topic]
+    
+    def index_recipe(self, recipe_id: str) -> bool:
+        """
+        增量索引单个菜谱（新增或修改后调用），无需重建图索引或重启服务
+        从Neo4j读取菜谱及其食材、步骤和关系，更新图索引键值对和主题倒排表
+        
+        Returns:
+            菜谱是否存在并已完成索引
+        """
+        query = f"""
+        MATCH (r:Recipe {{nodeId: $recipe_id}})
+        OPTIONAL MATCH (r)-[:BELONGS_TO_CATEGORY]->(c:Category)
+        WITH r, collect(c.name) as categories
+        OPTIONAL MATCH (r)-[:REQUIRES|CONTAINS_STEP]->(n)
+        WHERE n:Ingredient OR n:CookingStep
+        WITH r, categories, collect(DISTINCT n) as neighbors
+        RETURN r.nodeId as nodeId, labels(r) as labels, r.name as name,
+               {projection("r", RECIPE_FIELDS)} as properties, categories,
+               [n IN neighbors | {{nodeId: n.nodeId, labels: labels(n), name: n.name,
+                                  properties: {projection("n", unique_fields(INGREDIENT_FIELDS, STEP_FIELDS))}}}] as neighbors,
+               [n IN [r] + neighbors | [(n)-[rel]->(target)
+                    WHERE n.nodeId >= '200000000' OR target.nodeId >= '200000000'
+                    | [n.nodeId, type(rel), target.nodeId]]] as relationships
+        """
+        
+        try:
+            records = self.pool.read(query, {"recipe_id": recipe_id})
+        except Exception as e:
+            logger.error(f"读取菜谱失败 {recipe_id}: {e}")
+            return False
+        
+        if not records:
+            logger.warning(f"菜谱不存在: {recipe_id}")
+            return False
+        
+        start_time = time.time()
+        record = records[0]
+        
+        # 与数据准备模块一致：分类信息来自Category关系
+        properties = compact(record["properties"])
+        categories = record["categories"]
+        properties["category"] = categories[0] if categories else properties.get("category", "未知")
+        properties["all_categories"] = categories or [properties["category"]]
+        recipe = GraphNode(node_id=record["nodeId"], labels=record["labels"],
+                           name=record["name"], properties=properties)
+        
+        # 菜谱原有的关系先移除，避免已删除的食材/步骤残留
+        self.graph_indexing.remove_node_relations(recipe_id)
+        self.graph_indexing.upsert_entity(recipe, "Recipe")
+        for neighbor in record["neighbors"]:
+            entity_type = "Ingredient" if "Ingredient" in neighbor["labels"] else "CookingStep"
+            node = GraphNode(node_id=neighbor["nodeId"], labels=neighbor["labels"],
+                             name=neighbor["name"], properties=compact(neighbor["properties"]))
+            self.graph_indexing.upsert_entity(node, entity_type)
+        
+        # 关系的LLM索引键在全部关系写入后一次批量生成
+        relation_ids = []
+        for relationships in record["relationships"]:
+            for source_id, relation_type, target_id in relationships:
+                relation_id = self.graph_indexing.upsert_relation(source_id, relation_type, target_id, enhance=False)
+                if relation_id:
+                    relation_ids.append(relation_id)
+        relation_ids = list(dict.fromkeys(relation_ids))
+        if relation_ids and getattr(self.config, 'enable_llm_relation_keys', False):
+            self.graph_indexing.enhance_relation_keys(relation_ids)
+        
+        self._remove_recipe_topics(recipe_id)
+        self._add_recipe_topics(recipe)
+        
+        logger.info(f"菜谱 {recipe.name} 增量索引完成: {len(record['neighbors'])} 个关联节点, "
+                    f"{len(relation_ids)} 条关系, 耗时 {(time.time() - start_time) * 1000:.1f}ms")
+        return True
+    
+    def remove_recipe(self, recipe_id: str):
+        """从图索引和主题倒排表中移除菜谱（食材、步骤节点由调用方按需移除）"""
+        self.graph_indexing.remove_entity(recipe_id)
+        self._remove_recipe_topics(recipe_id)
+    
+    def _lookup_topic_recipes(self, keywords: List[str], limit: int) -> List[Dict[str, str]]:
+        """
+        在主题倒排表中查找关键词命中的菜谱
+        主题完全匹配或主题包含关键词（等价于原来的 CONTAINS 语义），按难度和名称取前limit个
+        """
+        matched_keyword = {}
+        for keyword in keywords:
+            if not keyword:
+                continue
+            for topic, recipe_ids in self.topic_to_recipes.items():
+                if keyword in topic:
+                    for recipe_id in recipe_ids:
+                        matched_keyword.setdefault(recipe_id, keyword)
+        
+        ordered = sorted(matched_keyword, key=lambda rid: self.recipe_sort_keys.get(rid, (True, 0, "")))
+        return [{"node_id": rid, "keyword": matched_keyword[rid]} for rid in ordered[:limit]]
+    
     def _neo4j_topic_level_search(self, keywords: List[str], limit: int) -> List[RetrievalResult]:
         """Neo4j主题级检索补充"""
         results = []
         
+        # 从主题倒排表中选出候选菜谱，只把最终需要的菜谱ID交给Neo4j
+        matches = self._lookup_topic_recipes(keywords, limit)
+        if not matches:
+            return results
+        
         try:
-            with self.driver.session() as session:
-                cypher_query = """
-                UNWIND $keywords as keyword
-                MATCH (r:Recipe)
-                WHERE r.category CONTAINS keyword 
-                   OR r.cuisineType CONTAINS keyword
-                   OR r.tags CONTAINS keyword
-                WITH r, keyword
-                OPTIONAL MATCH (r)-[:REQUIRES]->(i:Ingredient)
-                WITH r, keyword, collect(i.name)[0..3] as ingredients
-                RETURN 
-                    r.nodeId as node_id,
-                    r.name as name,
-                    r.category as category,
-                    r.cuisineType as cuisine_type,
-                    r.difficulty as difficulty,
-                    ingredients,
-                    keyword as matched_keyword
-                ORDER BY r.difficulty ASC, r.name
-                LIMIT $limit
-                """
+            cypher_query = """
+            UNWIND $matches as match
+            MATCH (r:Recipe {nodeId: match.node_id})
+            WITH r, match.keyword as keyword
+            OPTIONAL MATCH (r)-[:REQUIRES]->(i:Ingredient)
+            WITH r, keyword, collect(i.name)[0..3] as ingredients
+            RETURN 
+                r.nodeId as node_id,
+                r.name as name,
+                r.category as category,
+                r.cuisineType as cuisine_type,
+                r.difficulty as difficulty,
+                ingredients,
+                keyword as matched_keyword
+            ORDER BY r.difficulty ASC, r.name
+            """
                 
-                result = session.run(cypher_query, {
-                    "keywords": keywords,
-                    "limit": limit
-                })
+            result = self.pool.cached_read(cypher_query, {"matches": matches})
                 
-                for record in result:
-                    content_parts = []
-                    content_parts.append(f"菜品: {record['name']}")
+            for record in result:
+                content_parts = []
+                content_parts.append(f"菜品: {record['name']}")
                     
-                    if record["category"]:
-                        content_parts.append(f"分类: {record['category']}")
-                    if record["cuisine_type"]:
-                        content_parts.append(f"菜系: {record['cuisine_type']}")
-                    if record["difficulty"]:
-                        content_parts.append(f"难度: {record['difficulty']}")
+                if record["category"]:
+                    content_parts.append(f"分类: {record['category']}")
+                if record["cuisine_type"]:
+                    content_parts.append(f"菜系: {record['cuisine_type']}")
+                if record["difficulty"]:
+                    content_parts.append(f"难度: {record['difficulty']}")
                     
-                    if record["ingredients"]:
-                        ingredients_str = ', '.join(record["ingredients"][:3])
-                        content_parts.append(f"主要食材: {ingredients_str}")
+                if record["ingredients"]:
+                    ingredients_str = ', '.join(record["ingredients"][:3])
+                    content_parts.append(f"主要食材: {ingredients_str}")
                     
-                    results.append(RetrievalResult(
-                        content='\n'.join(content_parts),
-                        node_id=record["node_id"],
-                        node_type="Recipe",
-                        relevance_score=0.75,  # 补充检索得分
-                        retrieval_level="topic",
-                        metadata={
-                            "name": record["name"],
-                            "category": record["category"],
-                            "cuisine_type": record["cuisine_type"],
-                            "difficulty": record["difficulty"],
-                            "matched_keyword": record["matched_keyword"],
-                            "source": "neo4j_fallback"
-                        }
-                    ))
+                results.append(RetrievalResult(
+                    content='\n'.join(content_parts),
+                    node_id=record["node_id"],
+                    node_type="Recipe",
+                    relevance_score=0.75,  # 补充检索得分
+                    retrieval_level="topic",
+                    metadata={
+                        "name": record["name"],
+                        "category": record["category"],
+                        "cuisine_type": record["cuisine_type"],
+                        "difficulty": record["difficulty"],
+                        "matched_keyword": record["matched_keyword"],
+                        "source": "neo4j_fallback"
+                    }
+                ))
                     
         except Exception as e:
             logger.error(f"Neo4j主题级检索失败: {e}")
@@ -436,12 +771,23 @@ class HybridRetrievalModule:
         """
         logger.info(f"开始双层检索: {query}")
         
-        # 1. 提取关键词
-        entity_keywords, topic_keywords = self.extract_query_keywords(query)
+        # 1. 提取关键词（流式时关键词数组一闭合就提前开始对应层级的检索）
+        early_futures = {}
         
-        # 2. 执行双层检索
-        entity_results = self.entity_level_retrieval(entity_keywords, top_k)
-        topic_results = self.topic_level_retrieval(topic_keywords, top_k)
+        def on_field(key: str, value: Any):
+            if key in ("entity_keywords", "topic_keywords") and isinstance(value, list) and key not in early_futures:
+                retrieval = self.entity_level_retrieval if key == "entity_keywords" else self.topic_level_retrieval
+                early_futures[key] = (value, self.executor.submit(retrieval, value, top_k))
+        
+        entity_keywords, topic_keywords = self.extract_query_keywords(query, on_field=on_field)
+        
+        # 2. 执行双层检索（复用关键词一致的提前检索结果）
+        entity_results = self._collect_early_results(
+            early_futures.get("entity_keywords"), entity_keywords, self.entity_level_retrieval, top_k
+        )
+        topic_results = self._collect_early_results(
+            early_futures.get("topic_keywords"), topic_keywords, self.topic_level_retrieval, top_k
+        )
         
         # 3. 结果合并和排序
         all_results = entity_results + topic_results
@@ -478,13 +824,29 @@ class HybridRetrievalModule:
         logger.info(f"双层检索完成，返回 {len(documents)} 个文档")
         return documents
     
-    def vector_search_enhanced(self, query: str, top_k: int = 5) -> List[Document]:
+    def _collect_early_results(self, early, keywords: List[str], retrieval, top_k: int) -> List[RetrievalResult]:
+        """获取提前检索的结果；关键词不一致或提前检索失败时重新检索"""
+        if early:
+            early_keywords, future = early
+            if early_keywords == keywords:
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.error(f"提前检索失败，重新检索: {e}")
+            else:
+                future.cancel()
+        
+        return retrieval(keywords, top_k)
+    
+    def vector_search_enhanced(self, query: str, top_k: int = 5,
+                               constraints: Optional[QueryConstraints] = None) -> List[Document]:
         """
         增强的向量检索：结合图信息
+        查询约束（时间、热量等）下推为Milvus标量过滤，不满足约束的菜谱不会进入候选
         """
         try:
             # 使用Milvus进行向量检索
-            vector_docs = self.milvus_module.similarity_search(query, k=top_k*2)
+            vector_docs = self.milvus_module.similarity_search(query, k=top_k*2, constraints=constraints)
             
             # 用图信息增强结果并转换为Document对象
             enhanced_docs = []
@@ -530,36 +892,89 @@ class HybridRetrievalModule:
     def _get_node_neighbors(self, node_id: str, max_neighbors: int = 3) -> List[str]:
         """获取节点的邻居信息"""
         try:
-            with self.driver.session() as session:
-                query = """
-                MATCH (n {nodeId: $node_id})-[r]-(neighbor)
-                RETURN neighbor.name as name
-                LIMIT $limit
-                """
-                result = session.run(query, {"node_id": node_id, "limit": max_neighbors})
-                return [record["name"] for record in result if record["name"]]
+            query = """
+            MATCH (n {nodeId: $node_id})-[r]-(neighbor)
+            RETURN neighbor.name as name
+            LIMIT $limit
+            """
+            result = self.pool.cached_read(query, {"node_id": node_id, "limit": max_neighbors})
+            return [record["name"] for record in result if record["name"]]
         except Exception as e:
             logger.error(f"获取邻居节点失败: {e}")
             return []
     
-    def hybrid_search(self, query: str, top_k: int = 5) -> List[Document]:
+    @staticmethod
+    def _lexical_tokens(text: str) -> List[str]:
+        """BM25分词：中文没有空格分隔，使用去掉空白和标点后的字符二元组"""
+        text = re.sub(r"[\s\W_]+", "", text.lower())
+        return [text[i:i + 2] for i in range(len(text) - 1)] or ([text] if text else [])
+    
+    def bm25_search(self, query: str, top_k: int = 5) -> List[Document]:
+        """本地BM25词法检索（不访问外部服务）"""
+        if self.bm25_retriever is None:
+            return []
+        # 直接调用底层BM25，避免修改共享检索器的k
+        retriever = self.bm25_retriever
+        documents = retriever.vectorizer.get_top_n(retriever.preprocess_func(query), retriever.docs, n=top_k)
+        return [Document(page_content=doc.page_content, metadata={**doc.metadata, "search_type": "bm25"})
+                for doc in documents]
+    
+    def _vector_constraints(self, query: str) -> QueryConstraints:
+        """查询文本中明确的时间/热量上限，下推到Milvus"""
+        return QueryConstraints.from_text(query, getattr(self.config, 'low_calorie_max', 400))
+    
+    def start_speculation(self, query: str, top_k: int) -> SpeculativeRetrieval:
+        """
+        投机检索：在路由分析（LLM调用）进行时提前启动向量检索和BM25检索，
+        路由选择的策略需要时直接使用结果，否则由 finish 取消
+        """
+        speculation = SpeculativeRetrieval(query, top_k, self.speculation_stats, self._speculation_lock)
+        with self._speculation_lock:
+            self.speculation_stats["speculations"] += 1
+        constraints = self._vector_constraints(query)
+        speculation.submit(self.executor, "vector",
+                           lambda: self.vector_search_enhanced(query, top_k, constraints))
+        if self.lexical_search and self.bm25_retriever is not None:
+            speculation.submit(self.executor, "bm25", lambda: self.bm25_search(query, top_k))
+        return speculation
+    
+    def get_speculation_statistics(self) -> Dict[str, Any]:
+        """投机检索统计：命中率、节省的延迟和浪费的后端耗时"""
+        with self._speculation_lock:
+            stats = dict(self.speculation_stats)
+        started = stats["legs_started"]
+        stats["hit_rate"] = stats["legs_used"] / started if started else 0.0
+        stats["waste_rate"] = stats["legs_wasted"] / started if started else 0.0
+        stats["avg_saved_ms"] = stats["saved_ms"] / stats["legs_used"] if stats["legs_used"] else 0.0
+        return stats
+    
+    def hybrid_search(self, query: str, top_k: int = 5,
+                      speculation: Optional[SpeculativeRetrieval] = None) -> List[Document]:
         """
         混合检索：使用Round-robin轮询合并策略
-        公平轮询合并不同检索结果，不使用权重配置
+        公平轮询合并不同检索结果，不使用权重配置；
+        speculation 为路由时投机启动的检索，其中的向量/BM25结果直接复用
         """
         logger.info(f"开始混合检索: {query}")
         
         # 1. 双层检索（实体+主题检索）
         dual_docs = self.dual_level_retrieval(query, top_k)
         
-        # 2. 增强向量检索
-        vector_docs = self.vector_search_enhanced(query, top_k)
+        # 2. 增强向量检索（查询文本中明确的时间/热量上限下推到Milvus）
+        vector_docs = speculation.take("vector", top_k) if speculation else None
+        if vector_docs is None:
+            vector_docs = self.vector_search_enhanced(query, top_k, self._vector_constraints(query))
+        
+        # 3. BM25词法检索（开启 hybrid_bm25_source 时参与合并，关闭时结果与原来的两路合并一致）
+        lexical_docs = speculation.take("bm25", top_k) if speculation else None
+        if lexical_docs is None:
+            lexical_docs = self.bm25_search(query, top_k) if self.lexical_search else []
         
-        # 3. Round-robin轮询合并
+        # 4. Round-robin轮询合并
         merged_docs = []
         seen_doc_ids = set()
-        max_len = max(len(dual_docs), len(vector_docs))
-        origin_len = len(dual_docs) + len(vector_docs)
+        max_len = max(len(dual_docs), len(vector_docs), len(lexical_docs))
+        origin_len = len(dual_docs) + len(vector_docs) + len(lexical_docs)
         
         for i in range(max_len):
             # 先添加双层检索结果
@@ -588,6 +1003,17 @@ class HybridRetrievalModule:
                     similarity_score = max(0.0, 1.0 - vector_score) if vector_score <= 1.0 else 0.0
                     doc.metadata["final_score"] = similarity_score
                     merged_docs.append(doc)
+            
+            # 最后添加BM25结果（没有可比的得分，按名次给分）
+            if i < len(lexical_docs):
+                doc = lexical_docs[i]
+                doc_id = doc.metadata.get("node_id", hash(doc.page_content))
+                if doc_id not in seen_doc_ids:
+                    seen_doc_ids.add(doc_id)
+                    doc.metadata["search_method"] = "bm25"
+                    doc.metadata["round_robin_order"] = len(merged_docs)
+                    doc.metadata["final_score"] = 1.0 / (i + 1)
+                    merged_docs.append(doc)
         
         # 取前top_k个结果
         final_docs = merged_docs[:top_k]
@@ -598,6 +1024,8 @@ class HybridRetrievalModule:
         
     def close(self):
         """关闭资源连接"""
-        if self.driver:
-            self.driver.close()
+        self.executor.shutdown(wait=False)
+        if self.pool:
+            self.pool.release()
+            self.pool = None
             logger.info("Neo4j连接已关闭") 
\ No newline at end of file
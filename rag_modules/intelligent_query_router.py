@@ -7,12 +7,16 @@
 
 import json
 import logging
+import os
+import time
 from typing import List, Dict, Tuple, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
 from langchain_core.documents import Document
 
+from .local_router import LocalRouter, RoutingDecisionLog
+
 logger = logging.getLogger(__name__)
 
 class SearchStrategy(Enum):
@@ -41,6 +45,7 @@ class IntelligentQueryRouter:
     2. 关系密集度评估：判断是否需要图结构优势
     3. 策略自动选择：路由到最适合的检索引擎
     4. 结果质量监控：基于反馈优化路由决策
+    5. 本地路由模型：由LLM决策日志训练，置信度足够时不调用LLM
     """
     
     def __init__(self, 
@@ -58,16 +63,48 @@ class IntelligentQueryRouter:
             "traditional_count": 0,
             "graph_rag_count": 0,
             "combined_count": 0,
-            "total_queries": 0
+            "total_queries": 0,
+            "local_router_count": 0,
+            "llm_router_count": 0
         }
         
+        # LLM路由决策日志（本地路由模型的训练数据）
+        log_path = getattr(config, 'routing_log_path', None)
+        self.decision_log = RoutingDecisionLog(
+            log_path, max_bytes=getattr(config, 'routing_log_max_bytes', 20 * 1024 * 1024)
+        ) if log_path else None
+        
+        # 本地路由模型
+        self.local_router: Optional[LocalRouter] = None
+        self.local_router_threshold = getattr(config, 'local_router_threshold', 0.8)
+        self._load_local_router()
+        
+    def _load_local_router(self):
+        """加载本地路由模型，不存在时每个查询都由LLM分析"""
+        path = getattr(self.config, 'local_router_path', None)
+        if not path or not os.path.exists(path):
+            logger.info("未找到本地路由模型，查询路由使用LLM分析（运行 scripts/train_local_router.py 训练）")
+            return
+        try:
+            self.local_router = LocalRouter.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"加载本地路由模型失败: {e}")
+            self.local_router = None
+        
     def analyze_query(self, query: str) -> QueryAnalysis:
         """
         深度分析查询特征，决定最佳检索策略
         """
         logger.info(f"分析查询特征: {query}")
         
-        # 使用LLM进行智能分析
+        # 本地路由模型置信度足够时直接使用
+        local_analysis = self._local_analysis(query)
+        if local_analysis is not None:
+            return local_analysis
+        return self._llm_analysis(query)
+    
+    def _llm_analysis(self, query: str) -> QueryAnalysis:
+        """使用LLM进行智能分析"""
         analysis_prompt = f"""
         作为RAG系统的查询分析专家，请深度分析以下查询的特征：
         
@@ -132,6 +169,9 @@ class IntelligentQueryRouter:
             )
             
             logger.info(f"查询分析完成: {analysis.recommended_strategy.value} (置信度: {analysis.confidence:.2f})")
+            self.route_stats["llm_router_count"] += 1
+            if self.decision_log:
+                self.decision_log.append(query, analysis.recommended_strategy.value, analysis.confidence)
             return analysis
             
         except Exception as e:
@@ -139,6 +179,28 @@ class IntelligentQueryRouter:
             # 降级方案：基于规则的简单分析
             return self._rule_based_analysis(query)
     
+    def _local_analysis(self, query: str) -> Optional[QueryAnalysis]:
+        """本地路由模型分析，置信度低于阈值时返回None（回退到LLM）"""
+        if self.local_router is None:
+            return None
+        
+        start_time = time.perf_counter()
+        strategy, confidence = self.local_router.predict(query)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        if confidence < self.local_router_threshold:
+            logger.info(f"本地路由置信度不足: {strategy} ({confidence:.2f} < {self.local_router_threshold})，使用LLM分析")
+            return None
+        
+        self.route_stats["local_router_count"] += 1
+        logger.info(f"本地路由完成: {strategy} (置信度: {confidence:.2f}, 耗时 {elapsed_ms:.3f}ms)")
+        # 复杂度等特征沿用规则估计，策略和置信度来自本地模型
+        return replace(
+            self._rule_based_analysis(query),
+            recommended_strategy=SearchStrategy(strategy),
+            confidence=confidence,
+            reasoning="本地路由模型（由LLM路由决策训练）"
+        )
+    
     def _rule_based_analysis(self, query: str) -> QueryAnalysis:
         """基于规则的降级分析"""
         # 简单的规则判断
@@ -169,8 +231,13 @@ class IntelligentQueryRouter:
         """
         logger.info(f"开始智能路由: {query}")
         
-        # 1. 分析查询特征
-        analysis = self.analyze_query(query)
+        # 1. 分析查询特征（需要LLM分析时，可在等待期间投机启动向量/BM25检索）
+        speculation = None
+        analysis = self._local_analysis(query)
+        if analysis is None:
+            if getattr(self.config, 'speculative_retrieval', False):
+                speculation = self.traditional_retrieval.start_speculation(query, top_k)
+            analysis = self._llm_analysis(query)
         
         # 2. 更新统计
         self._update_route_stats(analysis.recommended_strategy)
@@ -181,7 +248,7 @@ class IntelligentQueryRouter:
         try:
             if analysis.recommended_strategy == SearchStrategy.HYBRID_TRADITIONAL:
                 logger.info("使用传统混合检索")
-                documents = self.traditional_retrieval.hybrid_search(query, top_k)
+                documents = self.traditional_retrieval.hybrid_search(query, top_k, speculation)
                 
             elif analysis.recommended_strategy == SearchStrategy.GRAPH_RAG:
                 logger.info("🕸️ 使用图RAG检索")
@@ -189,7 +256,7 @@ class IntelligentQueryRouter:
                 
             elif analysis.recommended_strategy == SearchStrategy.COMBINED:
                 logger.info("🔄 使用组合检索策略")
-                documents = self._combined_search(query, top_k)
+                documents = self._combined_search(query, top_k, speculation)
             
             # 4. 结果后处理
             documents = self._post_process_results(documents, analysis)
@@ -200,10 +267,15 @@ class IntelligentQueryRouter:
         except Exception as e:
             logger.error(f"查询路由失败: {e}")
             # 降级到传统检索
-            documents = self.traditional_retrieval.hybrid_search(query, top_k)
+            documents = self.traditional_retrieval.hybrid_search(query, top_k, speculation)
             return documents, analysis
+        
+        finally:
+            # 所选策略没有用到的投机分支取消（已执行的计为浪费）
+            if speculation:
+                speculation.finish()
     
-    def _combined_search(self, query: str, top_k: int) -> List[Document]:
+    def _combined_search(self, query: str, top_k: int, speculation=None) -> List[Document]:
         """
         组合搜索策略：结合传统检索和图RAG的优势
         """
@@ -212,7 +284,7 @@ class IntelligentQueryRouter:
         graph_k = top_k - traditional_k
         
         # 执行两种检索
-        traditional_docs = self.traditional_retrieval.hybrid_search(query, traditional_k)
+        traditional_docs = self.traditional_retrieval.hybrid_search(query, traditional_k, speculation)
         graph_docs = self.graph_rag_retrieval.graph_rag_search(query, graph_k)
         
         # 合并和去重
@@ -275,6 +347,7 @@ class IntelligentQueryRouter:
         
         return {
             **self.route_stats,
+            "speculation": self.traditional_retrieval.get_speculation_statistics(),
             "traditional_ratio": self.route_stats["traditional_count"] / total,
             "graph_rag_ratio": self.route_stats["graph_rag_count"] / total,
             "combined_ratio": self.route_stats["combined_count"] / total
@@ -0,0 +1,205 @@
+"""
+本地路由模型模块
+用LLM路由决策日志训练的轻量分类器：查询的字符n-gram（二值、L2归一化）上的多类逻辑回归，
+推理只是查表累加权重再做softmax，不依赖LLM和向量模型，单次预测在0.1毫秒量级；
+置信度低于阈值时由路由器回退到LLM分析，LLM的决策继续写入日志作为新的训练数据
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROUTE_LABELS = ("hybrid_traditional", "graph_rag", "combined")
+
+_NON_WORD = re.compile(r"[\s\W_]+", re.UNICODE)
+
+def char_ngrams(query: str, ngram_range: Tuple[int, int] = (1, 3)) -> List[str]:
+    """查询的字符n-gram（去掉空白和标点，转小写，去重并保持顺序）"""
+    text = _NON_WORD.sub("", query.lower())
+    low, high = ngram_range
+    grams = (text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1))
+    return list(dict.fromkeys(grams))
+
+class LocalRouter:
+    """
+    本地路由分类器
+
+    特点：
+    1. 特征为训练集中出现至少 min_count 次的字符n-gram，每个查询的特征向量按命中n-gram数L2归一化
+    2. 模型只保存每个n-gram对各策略的权重和截距（JSON），加载后无需scikit-learn
+    3. predict 返回 (策略, 置信度)，置信度为softmax后的最大概率
+    """
+
+    def __init__(self, labels: Sequence[str], weights: Dict[str, List[float]], intercept: Sequence[float],
+                 ngram_range: Tuple[int, int] = (1, 3), metrics: Optional[Dict[str, Any]] = None):
+        self.labels = list(labels)
+        self.weights = weights
+        self.intercept = list(intercept)
+        self.ngram_range = tuple(ngram_range)
+        self.metrics = metrics or {}
+
+    def predict_proba(self, query: str) -> List[float]:
+        """各策略的概率（与 labels 顺序一致）"""
+        grams = char_ngrams(query, self.ngram_range)
+        scale = 1.0 / math.sqrt(len(grams)) if grams else 0.0
+        logits = list(self.intercept)
+        for gram in grams:
+            row = self.weights.get(gram)
+            if row is not None:
+                for i, weight in enumerate(row):
+                    logits[i] += weight * scale
+        top = max(logits)
+        exps = [math.exp(logit - top) for logit in logits]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        probabilities = self.predict_proba(query)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.labels[best], probabilities[best]
+
+    # ==================== 训练 ====================
+
+    @classmethod
+    def train(cls, queries: Sequence[str], labels: Sequence[str], ngram_range: Tuple[int, int] = (1, 3),
+              min_count: int = 2, C: float = 4.0, balanced: bool = True) -> 'LocalRouter':
+        """
+        训练逻辑回归（只有训练时需要scikit-learn）
+
+        Args:
+            queries: 查询文本
+            labels: LLM给出的路由策略
+            ngram_range: 字符n-gram长度范围
+            min_count: n-gram在训练集中至少出现的查询数
+            C: 逆正则化强度
+            balanced: 按类别频率加权（combined 通常很少）
+        """
+        import numpy as np
+        from scipy import sparse
+        from sklearn.linear_model import LogisticRegression
+
+        query_grams = [char_ngrams(query, ngram_range) for query in queries]
+        counts: Dict[str, int] = {}
+        for grams in query_grams:
+            for gram in grams:
+                counts[gram] = counts.get(gram, 0) + 1
+        vocabulary = {gram: i for i, gram in enumerate(g for g, c in counts.items() if c >= min_count)}
+
+        rows, cols, values = [], [], []
+        for row, grams in enumerate(query_grams):
+            scale = 1.0 / math.sqrt(len(grams)) if grams else 0.0
+            for gram in grams:
+                col = vocabulary.get(gram)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(scale)
+        features = sparse.csr_matrix((values, (rows, cols)), shape=(len(queries), len(vocabulary)))
+
+        model = LogisticRegression(C=C, max_iter=2000, class_weight="balanced" if balanced else None)
+        model.fit(features, list(labels))
+
+        classes = [str(label) for label in model.classes_]
+        coef, intercept = model.coef_, model.intercept_
+        if len(classes) == 2:
+            # 二分类只有一组权重：softmax([0, z]) 与 sigmoid(z) 等价
+            coef = np.vstack([np.zeros_like(coef), coef])
+            intercept = np.concatenate([[0.0], intercept])
+
+        weights = {}
+        for gram, col in vocabulary.items():
+            row = coef[:, col]
+            if np.abs(row).max() > 1e-4:
+                weights[gram] = [round(float(w), 5) for w in row]
+        return cls(classes, weights, [float(b) for b in intercept], ngram_range)
+
+    # ==================== 持久化 ====================
+
+    def save(self, path: str):
+        """写入临时文件后替换"""
+        data = {
+            "labels": self.labels,
+            "ngram_range": list(self.ngram_range),
+            "intercept": self.intercept,
+            "weights": self.weights,
+            "metrics": self.metrics
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"本地路由模型已保存: {path} ({len(self.weights)} 个n-gram特征)")
+
+    @classmethod
+    def load(cls, path: str) -> 'LocalRouter':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        router = cls(data["labels"], data["weights"], data["intercept"],
+                     tuple(data["ngram_range"]), data.get("metrics"))
+        logger.info(f"加载本地路由模型: {len(router.weights)} 个n-gram特征, 策略 {router.labels}")
+        return router
+
+class RoutingDecisionLog:
+    """
+    LLM路由决策日志（JSONL，每行一个决策），作为本地路由模型的训练数据
+
+    日志记录原始查询文本，只在配置了路径时开启；文件超过 max_bytes 时轮转为 <路径>.1
+    （覆盖上一份旧日志），磁盘占用不超过 2 * max_bytes
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def rotated_path(path: str) -> str:
+        return f"{path}.1"
+
+    def append(self, query: str, strategy: str, confidence: float, source: str = "llm"):
+        record = {"query": query, "strategy": strategy, "confidence": confidence,
+                  "source": source, "timestamp": time.time()}
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, self.rotated_path(self.path))
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"写入路由决策日志失败: {e}")
+
+    @staticmethod
+    def load(path: str, source: str = "llm") -> List[Tuple[str, str]]:
+        """读取日志（先读轮转出的旧日志）中指定来源的 (查询, 策略)，同一查询以最后一次决策为准"""
+        decisions: Dict[str, str] = {}
+        for log_path in (RoutingDecisionLog.rotated_path(path), path):
+            if not os.path.exists(log_path):
+                continue
+            with open(log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    query, strategy = record.get("query"), record.get("strategy")
+                    if query and strategy in ROUTE_LABELS and record.get("source", "llm") == source:
+                        decisions.pop(query, None)
+                        decisions[query] = strategy
+        return list(decisions.items())
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path) or os.path.exists(RoutingDecisionLog.rotated_path(path))
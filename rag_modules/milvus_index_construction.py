@@ -11,6 +11,8 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 import numpy as np
 
+from .query_constraints import QueryConstraints
+
 logger = logging.getLogger(__name__)
 
 class MilvusIndexConstructionModule:
@@ -41,10 +43,19 @@ class MilvusIndexConstructionModule:
         self.client = None
         self.embeddings = None
         self.collection_created = False
+        self.collection_fields = None  # 已有集合的字段名（旧集合可能缺少约束字段）
         
         self._setup_client()
         self._setup_embeddings()
     
+    @staticmethod
+    def _int_or_unknown(value: Any) -> int:
+        """数值约束字段：缺失或无法转换时记为-1（未知）"""
+        try:
+            return int(value) if value is not None else -1
+        except (TypeError, ValueError):
+            return -1
+    
     def _safe_truncate(self, text: str, max_length: int) -> str:
         """
         安全截取字符串，处理None值
@@ -106,6 +117,8 @@ class MilvusIndexConstructionModule:
             FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=100),
             FieldSchema(name="cuisine_type", dtype=DataType.VARCHAR, max_length=200),
             FieldSchema(name="difficulty", dtype=DataType.INT64),
+            FieldSchema(name="total_minutes", dtype=DataType.INT64),  # 总耗时（分钟），-1表示未知
+            FieldSchema(name="calories", dtype=DataType.INT64),  # 热量（大卡），-1表示未知
             FieldSchema(name="doc_type", dtype=DataType.VARCHAR, max_length=50),
             FieldSchema(name="chunk_id", dtype=DataType.VARCHAR, max_length=150),
             FieldSchema(name="parent_id", dtype=DataType.VARCHAR, max_length=100)
@@ -152,6 +165,7 @@ class MilvusIndexConstructionModule:
             
             logger.info(f"成功创建集合: {self.collection_name}")
             self.collection_created = True
+            self.collection_fields = {f.name for f in schema.fields}
             
             return True
             
@@ -234,6 +248,8 @@ class MilvusIndexConstructionModule:
                     "category": self._safe_truncate(chunk.metadata.get("category", ""), 100),
                     "cuisine_type": self._safe_truncate(chunk.metadata.get("cuisine_type", ""), 200),
                     "difficulty": int(chunk.metadata.get("difficulty", 0)),
+                    "total_minutes": self._int_or_unknown(chunk.metadata.get("total_minutes")),
+                    "calories": self._int_or_unknown(chunk.metadata.get("calories")),
                     "doc_type": self._safe_truncate(chunk.metadata.get("doc_type", ""), 50),
                     "chunk_id": self._safe_truncate(chunk.metadata.get("chunk_id", f"chunk_{i}"), 150),
                     "parent_id": self._safe_truncate(chunk.metadata.get("parent_id", ""), 100)
@@ -303,6 +319,8 @@ class MilvusIndexConstructionModule:
                     "category": self._safe_truncate(chunk.metadata.get("category", ""), 100),
                     "cuisine_type": self._safe_truncate(chunk.metadata.get("cuisine_type", ""), 200),
                     "difficulty": int(chunk.metadata.get("difficulty", 0)),
+                    "total_minutes": self._int_or_unknown(chunk.metadata.get("total_minutes")),
+                    "calories": self._int_or_unknown(chunk.metadata.get("calories")),
                     "doc_type": self._safe_truncate(chunk.metadata.get("doc_type", ""), 50),
                     "chunk_id": self._safe_truncate(chunk.metadata.get("chunk_id", f"new_chunk_{i}_{int(time.time())}"), 150),
                     "parent_id": self._safe_truncate(chunk.metadata.get("parent_id", ""), 100)
@@ -322,7 +340,8 @@ class MilvusIndexConstructionModule:
             logger.error(f"添加新文档失败: {e}")
             return False
     
-    def similarity_search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def similarity_search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                          constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Any]]:
         """
         相似度搜索
         
@@ -330,6 +349,7 @@ class MilvusIndexConstructionModule:
             query: 查询文本
             k: 返回结果数量
             filters: 过滤条件
+            constraints: 查询约束，转换为标量过滤表达式在Milvus中过滤（集合缺少的字段跳过）
             
         Returns:
             搜索结果列表
@@ -362,6 +382,12 @@ class MilvusIndexConstructionModule:
                 if filter_conditions:
                     filter_expr = " and ".join(filter_conditions)
             
+            if constraints:
+                constraint_expr = constraints.milvus_expr(self.collection_fields)
+                if constraint_expr:
+                    filter_expr = f"{filter_expr} and {constraint_expr}" if filter_expr else constraint_expr
+                    logger.info(f"向量检索约束过滤: {constraint_expr}")
+            
             # 执行搜索 - 修复参数传递
             search_params = {
                 "metric_type": "COSINE",
@@ -485,6 +511,9 @@ class MilvusIndexConstructionModule:
             
             self.client.load_collection(self.collection_name)
             self.collection_created = True
+            self.collection_fields = {
+                f["name"] for f in self.client.describe_collection(self.collection_name).get("fields", [])
+            }
             logger.info(f"集合 {self.collection_name} 已加载到内存")
             return True
             
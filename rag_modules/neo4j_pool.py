@@ -0,0 +1,252 @@
+"""
+Neo4j连接池模块
+数据准备、混合检索、图RAG检索和API服务共用同一个driver（同一个连接池），
+连接池大小和连接获取超时可配置；读查询默认使用读访问模式的会话和托管读事务（execute_read），
+会话/事务计数、事务耗时和连接占用情况汇总为连接池指标。
+图中的 (:GraphVersion) 节点记录图版本号，写路径在同一事务内递增；
+确定性的读查询可以经过按 (查询, 参数, 图版本) 缓存的 cached_read，图数据写入后缓存精确失效
+"""
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from neo4j import READ_ACCESS, WRITE_ACCESS, GraphDatabase, Record, unit_of_work
+from neo4j.exceptions import ConnectionAcquisitionTimeoutError
+
+from .cache import VersionedLRUCache
+
+logger = logging.getLogger(__name__)
+
+# 版本节点用 id 而不是 name 标识，避免被按名称查找实体的查询当作实体；图快照加载时排除 GraphVersion 标签
+GRAPH_VERSION_QUERY = "MATCH (v:GraphVersion {id: 'graph'}) RETURN v.version as version"
+
+# 写路径（包括离线脚本和导入脚本）在写入同一事务内执行，使各进程的Cypher结果缓存失效
+BUMP_GRAPH_VERSION_QUERY = """
+MERGE (v:GraphVersion {id: 'graph'})
+SET v.version = coalesce(v.version, 0) + 1, v.updatedAt = datetime()
+RETURN v.version as version
+"""
+
+def bump_graph_version(tx) -> int:
+    """递增图版本号（tx 可以是事务或会话），返回新版本号"""
+    return tx.run(BUMP_GRAPH_VERSION_QUERY).single()["version"]
+
+class Neo4jPool:
+    """
+    共享的Neo4j driver
+
+    特点：
+    1. 按 (uri, 用户, 数据库) 在进程内共享，各模块通过 get_pool 获取并在关闭时 release，最后一个引用释放时关闭driver
+    2. session() 默认读访问模式，集群部署时路由到只读成员；写操作显式传 write=True
+    3. read()/write() 在托管事务中执行单条查询并读取全部记录，瞬时错误由driver自动重试
+    4. write() 在同一事务内递增图版本号；cached_read() 的缓存键包含图版本号，
+       本进程写入后立即失效，其他进程（离线脚本）写入后最迟 version_ttl 秒失效
+    5. metrics() 返回会话、事务、获取连接超时等计数、当前连接池占用和结果缓存统计
+    """
+
+    def __init__(self, uri: str, user: str, password: str, database: Optional[str] = None,
+                 max_pool_size: int = 50, acquisition_timeout: float = 10.0,
+                 max_connection_lifetime: float = 3600.0, cache_max_bytes: int = 32 * 1024 * 1024,
+                 version_ttl: float = 1.0):
+        self.uri = uri
+        self.user = user
+        self.database = database
+        self.max_pool_size = max_pool_size
+        self.acquisition_timeout = acquisition_timeout
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            max_connection_lifetime=max_connection_lifetime
+        )
+        self.references = 0
+
+        # Cypher结果缓存和图版本号（version_ttl 秒内复用上次读到的版本号）
+        self.result_cache = VersionedLRUCache(cache_max_bytes)
+        self.version_ttl = version_ttl
+        self._graph_version: Optional[int] = None
+        self._version_checked_at = 0.0
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "sessions": 0,
+            "active_sessions": 0,
+            "peak_active_sessions": 0,
+            "read_transactions": 0,
+            "write_transactions": 0,
+            "failed_transactions": 0,
+            "acquisition_timeouts": 0,
+            "transaction_ms": 0.0
+        }
+
+    def verify(self):
+        """测试连接（失败时抛出异常）"""
+        self.driver.verify_connectivity()
+
+    @contextmanager
+    def session(self, write: bool = False) -> Iterator[Any]:
+        """打开会话（默认读访问模式），统计活跃会话数"""
+        with self._lock:
+            self._stats["sessions"] += 1
+            self._stats["active_sessions"] += 1
+            self._stats["peak_active_sessions"] = max(self._stats["peak_active_sessions"],
+                                                      self._stats["active_sessions"])
+        try:
+            with self.driver.session(database=self.database,
+                                     default_access_mode=WRITE_ACCESS if write else READ_ACCESS) as session:
+                yield session
+        except ConnectionAcquisitionTimeoutError:
+            self._count("acquisition_timeouts")
+            logger.warning(f"获取Neo4j连接超时（{self.acquisition_timeout}秒），连接池大小 {self.max_pool_size}")
+            raise
+        finally:
+            with self._lock:
+                self._stats["active_sessions"] -= 1
+
+    def read(self, query: str, params: Optional[Dict[str, Any]] = None,
+             timeout: Optional[float] = None) -> List[Record]:
+        """托管读事务执行单条查询，返回全部记录"""
+        return self._execute(query, params, timeout, write=False)
+
+    def write(self, query: str, params: Optional[Dict[str, Any]] = None,
+              timeout: Optional[float] = None) -> List[Record]:
+        """托管写事务执行单条查询并递增图版本号，返回全部记录"""
+        return self._execute(query, params, timeout, write=True)
+
+    def cached_read(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Record]:
+        """
+        经过结果缓存的读查询（只用于结果完全由图数据决定的查询）
+
+        缓存键为 (查询, 参数)，条目记录读取时的图版本号，版本号变化后视为未命中
+        """
+        key = (query, json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str))
+        version = self.graph_version()
+        records = self.result_cache.get(key, version)
+        if records is None:
+            records = self.read(query, params)
+            self.result_cache.put(key, version, records)
+        return records
+
+    def graph_version(self) -> int:
+        """当前图版本号（没有版本节点时为0），version_ttl 秒内不重复查询，读取失败时沿用上次的版本号"""
+        now = time.monotonic()
+        with self._lock:
+            if self._graph_version is not None and now - self._version_checked_at < self.version_ttl:
+                return self._graph_version
+        try:
+            records = self.read(GRAPH_VERSION_QUERY)
+        except Exception as e:
+            logger.warning(f"读取图版本号失败: {e}")
+            return self._graph_version or 0
+        version = records[0]["version"] if records else 0
+        with self._lock:
+            self._graph_version = version
+            self._version_checked_at = now
+        return version
+
+    def _execute(self, query: str, params: Optional[Dict[str, Any]], timeout: Optional[float],
+                 write: bool) -> List[Record]:
+        def work(tx) -> Tuple[List[Record], Optional[int]]:
+            records = list(tx.run(query, params or {}))
+            return records, bump_graph_version(tx) if write else None
+
+        if timeout:
+            work = unit_of_work(timeout=timeout)(work)
+
+        start_time = time.perf_counter()
+        try:
+            with self.session(write) as session:
+                records, version = session.execute_write(work) if write else session.execute_read(work)
+            if version is not None:
+                # 提交之后再更新本地版本号，避免并发读在提交前读到旧数据却按新版本缓存
+                with self._lock:
+                    self._graph_version = version
+                    self._version_checked_at = time.monotonic()
+            return records
+        except Exception:
+            self._count("failed_transactions")
+            raise
+        finally:
+            with self._lock:
+                self._stats["write_transactions" if write else "read_transactions"] += 1
+                self._stats["transaction_ms"] += (time.perf_counter() - start_time) * 1000
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """连接池指标"""
+        with self._lock:
+            metrics: Dict[str, Any] = dict(self._stats)
+        transactions = metrics["read_transactions"] + metrics["write_transactions"]
+        metrics["avg_transaction_ms"] = metrics.pop("transaction_ms") / transactions if transactions else 0.0
+        metrics["max_pool_size"] = self.max_pool_size
+        metrics["references"] = self.references
+        metrics["graph_version"] = self._graph_version
+        metrics["result_cache"] = self.result_cache.get_statistics()
+        metrics.update(self._connection_usage())
+        return metrics
+
+    def _connection_usage(self) -> Dict[str, int]:
+        """当前连接数和占用数（driver没有公开连接池指标，读取其内部连接表，读不到时返回空）"""
+        pool = getattr(self.driver, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        lock = getattr(pool, "lock", None)
+        if connections is None or lock is None:
+            return {}
+        with lock:
+            opened = [connection for queue in connections.values() for connection in queue]
+        in_use = sum(1 for connection in opened if getattr(connection, "in_use", False))
+        return {"connections": len(opened), "connections_in_use": in_use, "connections_idle": len(opened) - in_use}
+
+    def release(self):
+        """释放一个引用，最后一个引用释放时关闭driver"""
+        with _POOLS_LOCK:
+            self.references -= 1
+            if self.references > 0:
+                return
+            _POOLS.pop((self.uri, self.user, self.database), None)
+        logger.info(f"Neo4j连接池已关闭: {self.metrics()}")
+        self.driver.close()
+
+_POOLS: Dict[Tuple[str, str, Optional[str]], Neo4jPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(config=None, uri: Optional[str] = None, user: Optional[str] = None,
+             password: Optional[str] = None, database: Optional[str] = None) -> Neo4jPool:
+    """
+    获取共享连接池（引用计数加一，用完后调用 release）
+
+    Args:
+        config: GraphRAGConfig，提供连接信息和连接池参数
+        uri/user/password/database: 显式给出时覆盖config中的连接信息
+
+    Returns:
+        Neo4jPool
+    """
+    uri = uri or getattr(config, 'neo4j_uri', "bolt://localhost:7687")
+    user = user or getattr(config, 'neo4j_user', "neo4j")
+    password = password or getattr(config, 'neo4j_password', None)
+    database = database or getattr(config, 'neo4j_database', None)
+
+    with _POOLS_LOCK:
+        pool = _POOLS.get((uri, user, database))
+        if pool is None:
+            pool = Neo4jPool(
+                uri, user, password, database,
+                max_pool_size=getattr(config, 'neo4j_max_pool_size', 50),
+                acquisition_timeout=getattr(config, 'neo4j_acquisition_timeout', 10.0),
+                max_connection_lifetime=getattr(config, 'neo4j_max_connection_lifetime', 3600.0),
+                cache_max_bytes=getattr(config, 'cypher_cache_max_bytes', 32 * 1024 * 1024),
+                version_ttl=getattr(config, 'graph_version_ttl', 1.0)
+            )
+            _POOLS[(uri, user, database)] = pool
+            logger.info(f"已创建Neo4j连接池: {uri}, 数据库 {database}, 连接池大小 {pool.max_pool_size}")
+        pool.references += 1
+    return pool
@@ -0,0 +1,343 @@
+"""
+查询约束模块
+把LLM解析出的 constraints（时间、热量、难度、菜系/分类、健康标签）转换为类型化谓词，
+并下推到数据源：Milvus标量过滤表达式、Cypher WHERE子句（预解析的数值属性），
+内存快照上的结果按同一谓词在进程内过滤
+
+约束只作用于菜谱：属性缺失（未知）的菜谱视为满足数值约束，避免因数据不全漏掉结果
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# 数值字段：逻辑名 -> (Neo4j属性, Milvus字段, Milvus中表示未知的值)
+NUMERIC_FIELDS = {
+    "total_minutes": ("totalTimeMinutes", "total_minutes", -1),
+    "calories": ("calories", "calories", -1),
+    "difficulty": ("difficulty", "difficulty", 0),
+}
+
+# 可以换算为热量上限的健康标签
+LOW_CALORIE_TAGS = ("低卡", "低热量", "低脂", "减脂", "减肥", "轻食")
+
+CATEGORY_SEPARATOR = re.compile(r"[,，、]")
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_RANGE = _NUMBER + r"\s*(?:[-~～到至]\s*" + _NUMBER + r")?\s*"
+_HOURS = re.compile(_RANGE + r"(?:个)?(?:半)?(?:小时|h\b)")
+_MINUTES = re.compile(_RANGE + r"(?:分钟|分|min)")
+
+# 查询文本中的时间/热量上限，如 "30分钟内"、"不超过半小时"、"500大卡以下"
+_TEXT_DURATION = r"(\d+(?:\.\d+)?|半)\s*个?\s*(小时|分钟)"
+_TEXT_MAX_MINUTES = (re.compile(_TEXT_DURATION + r"\s*(?:以内|之内|内|以下)"),
+                     re.compile(r"(?:不超过|不到|少于|小于|最多)\s*" + _TEXT_DURATION))
+_TEXT_CALORIES = r"(\d+)\s*(?:大卡|千卡|卡路里|kcal|卡)"
+_TEXT_MAX_CALORIES = (re.compile(_TEXT_CALORIES + r"\s*(?:以内|之内|以下)"),
+                      re.compile(r"(?:不超过|低于|少于|小于|最多)\s*" + _TEXT_CALORIES))
+
+def parse_minutes(value: Any) -> Optional[int]:
+    """
+    把 "约10分钟"、"15-20分钟"、"1小时30分钟"、"半小时" 等时间描述解析为分钟数（范围取上限）
+
+    Returns:
+        分钟数，无法解析时返回None
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    text = str(value).strip()
+    if not text:
+        return None
+    if re.fullmatch(_NUMBER, text):
+        return int(round(float(text)))
+
+    total, found = 0.0, False
+    if "半小时" in text and not re.search(r"\d\s*(?:个)?半小时", text):
+        total, found = 30.0, True
+    for match in _HOURS.finditer(text):
+        hours = float(match.group(2) or match.group(1))
+        if "半" in match.group(0):
+            hours += 0.5
+        total += hours * 60
+        found = True
+    for match in _MINUTES.finditer(text):
+        total += float(match.group(2) or match.group(1))
+        found = True
+    return int(round(total)) if found else None
+
+def recipe_total_minutes(properties: Dict[str, Any]) -> Optional[int]:
+    """
+    菜谱总耗时（分钟）：优先使用预解析的 totalTimeMinutes，
+    其次是营养数据脚本写入的 prepTimeMinutes/cookingTimeMinutes，最后解析 prepTime/cookTime 文本
+    """
+    total = properties.get("totalTimeMinutes")
+    if isinstance(total, (int, float)):
+        return int(total)
+
+    numeric = [properties.get("prepTimeMinutes"), properties.get("cookingTimeMinutes")]
+    if any(isinstance(value, (int, float)) for value in numeric):
+        return int(sum(value for value in numeric if isinstance(value, (int, float))))
+
+    parsed = [parse_minutes(properties.get("prepTime")), parse_minutes(properties.get("cookTime"))]
+    if all(value is None for value in parsed):
+        return None
+    return sum(value for value in parsed if value is not None)
+
+def recipe_styles(properties: Dict[str, Any]) -> List[str]:
+    """菜谱的菜系和分类取值（两个属性都可能是逗号分隔的多个值）"""
+    return [value.strip() for key in ("cuisineType", "category")
+            for value in CATEGORY_SEPARATOR.split(str(properties.get(key) or "")) if value.strip()]
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(_NUMBER, value)
+        if match:
+            return float(match.group(1))
+    return None
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in CATEGORY_SEPARATOR.split(value) if item.strip()]
+    if isinstance(value, (list, tuple, set)):
+        return [str(item).strip() for item in value if item is not None and str(item).strip()]
+    return [str(value).strip()]
+
+@dataclass(frozen=True)
+class RangePredicate:
+    """数值范围谓词（闭区间），属性缺失的菜谱视为满足"""
+    field: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+    def test(self, value: Optional[float]) -> bool:
+        if value is None:
+            return True
+        if self.minimum is not None and value < self.minimum:
+            return False
+        if self.maximum is not None and value > self.maximum:
+            return False
+        return True
+
+@dataclass(frozen=True)
+class ChoicePredicate:
+    """取值谓词：菜谱的任一菜系或分类属于给定集合"""
+    values: Tuple[str, ...]
+
+    def test(self, styles: Iterable[str]) -> bool:
+        return any(style in self.values for style in styles)
+
+@dataclass(frozen=True)
+class QueryConstraints:
+    """
+    类型化的查询约束
+
+    ranges/style 为可下推的硬约束；
+    preferences 为无法映射到属性的软约束（如"糖尿病"、"清淡"），只随查询结构传递，不参与过滤
+    """
+    ranges: Tuple[RangePredicate, ...] = ()
+    style: Optional[ChoicePredicate] = None
+    preferences: Tuple[str, ...] = field(default=())
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges or self.style)
+
+    # ==================== 解析 ====================
+
+    @classmethod
+    def from_llm(cls, raw: Any, style_vocabulary: Optional[Iterable[str]] = None,
+                 low_calorie_max: Optional[int] = 400) -> 'QueryConstraints':
+        """
+        解析LLM返回的 constraints 字典，例如
+        {"time": {"max_minutes": 30}, "calories": {"max": 500}, "difficulty": {"max": 2},
+         "style": ["川菜"], "health": ["低卡", "糖尿病"]}
+
+        Args:
+            raw: LLM返回的约束
+            style_vocabulary: 图中实际存在的菜系/分类；不在其中的风格词作为软约束
+            low_calorie_max: "低卡"等健康标签对应的热量上限，为None时不换算
+        """
+        if not isinstance(raw, dict):
+            return cls()
+
+        bounds: Dict[str, List[Optional[float]]] = {}
+
+        def bound(name: str, minimum: Optional[float], maximum: Optional[float]):
+            current = bounds.setdefault(name, [None, None])
+            if minimum is not None:
+                current[0] = minimum if current[0] is None else max(current[0], minimum)
+            if maximum is not None:
+                current[1] = maximum if current[1] is None else min(current[1], maximum)
+
+        time_value = raw.get("time")
+        if isinstance(time_value, dict):
+            bound("total_minutes",
+                  _minutes_value(time_value.get("min_minutes", time_value.get("min"))),
+                  _minutes_value(time_value.get("max_minutes", time_value.get("max"))))
+        elif time_value is not None:
+            bound("total_minutes", None, _minutes_value(time_value))
+        if raw.get("max_minutes") is not None:
+            bound("total_minutes", None, _minutes_value(raw.get("max_minutes")))
+
+        for name, key in (("calories", "calories"), ("difficulty", "difficulty")):
+            value = raw.get(key)
+            if isinstance(value, dict):
+                bound(name, _number(value.get("min")), _number(value.get("max")))
+            elif value is not None:
+                bound(name, None, _number(value))
+        if raw.get("max_calories") is not None:
+            bound("calories", None, _number(raw.get("max_calories")))
+
+        preferences = []
+        for tag in _as_list(raw.get("health")):
+            if low_calorie_max is not None and any(word in tag for word in LOW_CALORIE_TAGS):
+                bound("calories", None, float(low_calorie_max))
+            preferences.append(tag)
+
+        vocabulary = set(style_vocabulary) if style_vocabulary is not None else None
+        styles = []
+        for value in _as_list(raw.get("style")) + _as_list(raw.get("cuisine")):
+            if vocabulary is None or value in vocabulary:
+                styles.append(value)
+            else:
+                preferences.append(value)
+
+        return cls(
+            ranges=tuple(RangePredicate(name, minimum, maximum)
+                         for name, (minimum, maximum) in sorted(bounds.items())
+                         if minimum is not None or maximum is not None),
+            style=ChoicePredicate(tuple(sorted(set(styles)))) if styles else None,
+            preferences=tuple(dict.fromkeys(preferences))
+        )
+
+    @classmethod
+    def from_text(cls, query: str, low_calorie_max: Optional[int] = 400) -> 'QueryConstraints':
+        """
+        不经过LLM，直接从查询文本中识别时间和热量上限（供传统混合检索下推到Milvus）
+        只识别含义明确的表达，如 "30分钟内"、"不超过1小时"、"500大卡以下"、"低卡"
+        """
+        raw: Dict[str, Any] = {}
+        match = next((m for m in (pattern.search(query) for pattern in _TEXT_MAX_MINUTES) if m), None)
+        if match:
+            amount, unit = match.group(1), match.group(2)
+            hours_or_minutes = 0.5 if amount == "半" else float(amount)
+            raw["time"] = {"max_minutes": hours_or_minutes * (60 if unit == "小时" else 1)}
+        match = next((m for m in (pattern.search(query) for pattern in _TEXT_MAX_CALORIES) if m), None)
+        if match:
+            raw["calories"] = {"max": float(match.group(1))}
+        raw["health"] = [word for word in LOW_CALORIE_TAGS if word in query]
+        return cls.from_llm(raw, style_vocabulary=(), low_calorie_max=low_calorie_max)
+
+    # ==================== 下推 ====================
+
+    def milvus_expr(self, available_fields: Optional[Iterable[str]] = None) -> str:
+        """
+        Milvus标量过滤表达式；available_fields 为集合中存在的字段，缺少字段的谓词跳过
+
+        数值字段用哨兵值表示未知（total_minutes/calories 为 -1，difficulty 为 0），未知视为满足
+        """
+        fields = set(available_fields) if available_fields is not None else None
+        conditions = []
+        for predicate in self.ranges:
+            _, milvus_field, unknown = NUMERIC_FIELDS[predicate.field]
+            if fields is not None and milvus_field not in fields:
+                continue
+            parts = []
+            if predicate.minimum is not None:
+                parts.append(f"{milvus_field} >= {_literal(predicate.minimum)}")
+            if predicate.maximum is not None:
+                parts.append(f"{milvus_field} <= {_literal(predicate.maximum)}")
+            conditions.append(f"({milvus_field} == {unknown} or ({' and '.join(parts)}))")
+        if self.style and (fields is None or {"cuisine_type", "category"} <= fields):
+            values = ", ".join(f'"{_escape(value)}"' for value in self.style.values)
+            conditions.append(f"(cuisine_type in [{values}] or category in [{values}])")
+        return " and ".join(conditions)
+
+    def cypher_predicate(self, variable: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        菜谱节点上的Cypher谓词（不含WHERE），以及需要合并到查询参数中的参数
+
+        Returns:
+            (谓词, 参数)；没有硬约束时谓词为空字符串
+        """
+        conditions, params = [], {}
+        for predicate in self.ranges:
+            neo4j_property = NUMERIC_FIELDS[predicate.field][0]
+            parts = []
+            if predicate.minimum is not None:
+                params[f"constraint_{predicate.field}_min"] = predicate.minimum
+                parts.append(f"{variable}.{neo4j_property} >= $constraint_{predicate.field}_min")
+            if predicate.maximum is not None:
+                params[f"constraint_{predicate.field}_max"] = predicate.maximum
+                parts.append(f"{variable}.{neo4j_property} <= $constraint_{predicate.field}_max")
+            conditions.append(f"({variable}.{neo4j_property} IS NULL OR ({' AND '.join(parts)}))")
+        if self.style:
+            params["constraint_styles"] = list(self.style.values)
+            conditions.append(
+                f"(ANY(style_name IN split(coalesce({variable}.cuisineType, '') + ',' + coalesce({variable}.category, ''), ',')"
+                f" WHERE trim(style_name) IN $constraint_styles)"
+                f" OR EXISTS {{ ({variable})-[:BELONGS_TO_CATEGORY]->(style_category:Category)"
+                f" WHERE style_category.name IN $constraint_styles }})"
+            )
+        return " AND ".join(conditions), params
+
+    def node_predicate(self, variable: str) -> Tuple[str, Dict[str, Any]]:
+        """任意节点上的谓词：非菜谱节点直接满足"""
+        predicate, params = self.cypher_predicate(variable)
+        if not predicate:
+            return "", params
+        return f"(NOT {variable}:Recipe OR ({predicate}))", params
+
+    def path_predicate(self, nodes_expression: str) -> Tuple[str, Dict[str, Any]]:
+        """路径谓词：路径上的每个菜谱节点都满足约束"""
+        predicate, params = self.node_predicate("constrained")
+        if not predicate:
+            return "", params
+        return f"ALL(constrained IN {nodes_expression} WHERE {predicate})", params
+
+    # ==================== 进程内过滤 ====================
+
+    def allows(self, labels: Sequence[str], properties: Dict[str, Any]) -> bool:
+        """节点是否满足约束（非菜谱节点总是满足）"""
+        if "Recipe" not in labels:
+            return True
+        for predicate in self.ranges:
+            if predicate.field == "total_minutes":
+                value = recipe_total_minutes(properties)
+            else:
+                value = _number(properties.get(NUMERIC_FIELDS[predicate.field][0]))
+            if not predicate.test(value):
+                return False
+        if self.style and not self.style.test(recipe_styles(properties)):
+            return False
+        return True
+
+    def describe(self) -> str:
+        """约束的简短描述（日志用）"""
+        parts = []
+        for predicate in self.ranges:
+            if predicate.minimum is not None:
+                parts.append(f"{predicate.field}>={_literal(predicate.minimum)}")
+            if predicate.maximum is not None:
+                parts.append(f"{predicate.field}<={_literal(predicate.maximum)}")
+        if self.style:
+            parts.append(f"style∈{list(self.style.values)}")
+        return ", ".join(parts)
+
+def _minutes_value(value: Any) -> Optional[float]:
+    if isinstance(value, str):
+        minutes = parse_minutes(value)
+        return float(minutes) if minutes is not None else None
+    return _number(value)
+
+def _literal(value: float) -> Union[int, float]:
+    return int(value) if float(value).is_integer() else value
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
@@ -0,0 +1,194 @@
+"""
+关系索引键LLM增强模块
+把大量关系合并到少量提示词中批量生成主题关键词，多批次在限速下并发执行，
+结果按 (源实体名, 目标实体名, 关系类型) 缓存到磁盘，重复构建索引时不再调用LLM
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (源实体名, 源实体类型, 目标实体名, 目标实体类型, 关系类型)
+RelationDescriptor = Tuple[str, str, str, str, str]
+
+class RateLimiter:
+    """线程安全的限速器：保证相邻两次调用间隔不小于 1/rate 秒"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+class RelationKeyCache:
+    """关系索引键的磁盘缓存（JSON文件）"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._data: Dict[str, List[str]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(source_name: str, target_name: str, relation_type: str) -> str:
+        return f"{source_name}\t{target_name}\t{relation_type}"
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+            logger.info(f"加载关系索引键缓存: {len(self._data)} 条")
+        except (OSError, ValueError) as e:
+            logger.warning(f"关系索引键缓存读取失败，将重新生成: {e}")
+            self._data = {}
+
+    def get(self, key: str) -> Optional[List[str]]:
+        return self._data.get(key)
+
+    def set(self, key: str, keywords: List[str]):
+        with self._lock:
+            self._data[key] = keywords
+            self._dirty = True
+
+    def save(self):
+        """写入临时文件后替换，避免中断时损坏缓存"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+class RelationKeyEnricher:
+    """
+    关系索引键批量增强器
+
+    特点：
+    1. 每个提示词包含一批关系，一次调用返回整批关系的主题关键词
+    2. 多个批次在线程池中并发执行，由限速器控制请求频率
+    3. 结果写入磁盘缓存，未变化的关系在下次构建时直接命中
+    """
+
+    def __init__(self, config, llm_client):
+        self.config = config
+        self.llm_client = llm_client
+        self.batch_size = getattr(config, 'relation_key_batch_size', 20)
+        self.max_workers = getattr(config, 'relation_key_workers', 4)
+        self.max_retries = 3
+        self.rate_limiter = RateLimiter(getattr(config, 'relation_key_rate_limit', 3.0))
+        self.cache = RelationKeyCache(getattr(config, 'relation_key_cache_path', None))
+
+    def enrich(self, relations: List[RelationDescriptor]) -> Dict[Tuple[str, str, str], List[str]]:
+        """
+        为一组关系生成主题关键词
+
+        Args:
+            relations: 关系描述列表
+
+        Returns:
+            (源实体名, 目标实体名, 关系类型) -> 关键词列表
+        """
+        results = {}
+        pending: Dict[Tuple[str, str, str], RelationDescriptor] = {}
+
+        for relation in relations:
+            source_name, _, target_name, _, relation_type = relation
+            signature = (source_name, target_name, relation_type)
+            if signature in results or signature in pending:
+                continue
+            cached = self.cache.get(RelationKeyCache.make_key(*signature))
+            if cached is not None:
+                results[signature] = cached
+            else:
+                pending[signature] = relation
+
+        logger.info(f"关系索引键增强: {len(results)} 条命中缓存, {len(pending)} 条需要调用LLM")
+        if not pending:
+            return results
+
+        items = list(pending.values())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="relation-keys") as executor:
+            futures = [executor.submit(self._enrich_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                for signature, keywords in future.result().items():
+                    results[signature] = keywords
+                    self.cache.set(RelationKeyCache.make_key(*signature), keywords)
+
+        try:
+            self.cache.save()
+        except OSError as e:
+            logger.warning(f"关系索引键缓存写入失败: {e}")
+
+        logger.info(f"关系索引键增强完成: {len(batches)} 个批次, 耗时 {time.time() - start_time:.2f}秒")
+        return results
+
+    def _enrich_batch(self, batch: List[RelationDescriptor]) -> Dict[Tuple[str, str, str], List[str]]:
+        """一次LLM调用处理一批关系，失败时指数退避重试，最终失败返回空结果（不写缓存）"""
+        lines = [
+            f"{i}. 源实体: {source_name} ({source_type}) | 目标实体: {target_name} ({target_type}) | 关系类型: {relation_type}"
+            for i, (source_name, source_type, target_name, target_type, relation_type) in enumerate(batch)
+        ]
+        prompt = f"""
+        分析以下每条实体关系，分别生成相关的主题关键词：
+
+        {chr(10).join(lines)}
+
+        每条关系生成3-5个相关的主题关键词，用于索引和检索。
+        返回JSON格式：{{"results": [{{"id": 0, "keywords": ["关键词1", "关键词2", "关键词3"]}}]}}
+        """
+
+        for attempt in range(self.max_retries):
+            self.rate_limiter.acquire()
+            try:
+                response = self.llm_client.chat.completions.create(
+                    model=self.config.llm_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.1,
+                    max_tokens=min(100 * len(batch) + 100, 4000)
+                )
+                content = response.choices[0].message.content.strip()
+                content = content[content.find('{'):content.rfind('}') + 1]
+                parsed = json.loads(content)
+
+                results = {}
+                for item in parsed.get("results", []):
+                    index = item.get("id")
+                    keywords = item.get("keywords")
+                    if isinstance(index, int) and 0 <= index < len(batch) and isinstance(keywords, list):
+                        source_name, _, target_name, _, relation_type = batch[index]
+                        results[(source_name, target_name, relation_type)] = [str(k) for k in keywords if k]
+                return results
+
+            except Exception as e:
+                logger.warning(f"关系索引键批量增强失败 (第{attempt + 1}次): {e}")
+                if attempt < self.max_retries - 1:
+                    time.sleep(2 ** attempt)  # 指数退避
+
+        logger.error(f"关系索引键批量增强放弃，本批 {len(batch)} 条关系不做增强")
+        return {}
@@ -0,0 +1,266 @@
+"""
+相似菜谱索引模块
+对每个菜谱的 食材集合 + 做法集合 计算MinHash签名并建立LSH分桶，
+离线生成每个菜谱的 top-N 相似菜谱表；聚类查询（"和A相似的菜"）直接查表，
+新增/删除菜谱时只重算同桶的候选菜谱
+"""
+
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .graph_indexing import KeyNgramIndex
+
+logger = logging.getLogger(__name__)
+
+# 菜谱特征：食材名称 + 步骤中的烹饪方法（CookingStep.methods 形如 "切,拍,蘸,撒"）
+RECIPE_FEATURE_QUERY = """
+MATCH (r:Recipe)
+WHERE r.nodeId >= '200000000' AND ($recipe_ids IS NULL OR r.nodeId IN $recipe_ids)
+OPTIONAL MATCH (r)-[:REQUIRES]->(i:Ingredient)
+WITH r, collect(DISTINCT i.name) as ingredients
+OPTIONAL MATCH (r)-[:CONTAINS_STEP]->(s:CookingStep)
+RETURN r.nodeId as recipe_id, r.name as name, ingredients, collect(s.methods) as methods
+"""
+
+METHOD_SEPARATOR = re.compile(r"[,，、\s]+")
+INGREDIENT_PREFIX = "食材:"
+METHOD_PREFIX = "做法:"
+
+def recipe_tokens(ingredients: Iterable[str], methods: Iterable[str]) -> Set[str]:
+    """食材和做法合并为一个特征集合（加前缀区分同名的食材和做法）"""
+    tokens = {INGREDIENT_PREFIX + str(name).strip() for name in ingredients if name and str(name).strip()}
+    for value in methods:
+        if value:
+            tokens.update(METHOD_PREFIX + method for method in METHOD_SEPARATOR.split(str(value)) if method)
+    return tokens
+
+def load_recipe_features(session, recipe_ids: Optional[List[str]] = None) -> List[Tuple[str, str, Set[str]]]:
+    """从Neo4j读取菜谱特征：[(菜谱ID, 菜谱名, 特征集合)]"""
+    result = session.run(RECIPE_FEATURE_QUERY, {"recipe_ids": recipe_ids})
+    return [
+        (record["recipe_id"], record["name"], recipe_tokens(record["ingredients"], record["methods"]))
+        for record in result
+    ]
+
+class MinHasher:
+    """
+    MinHash签名：num_perm 个 multiply-shift 哈希函数 ((a*x + b) mod 2^64) >> 32，
+    特征先用crc32映射为32位整数（跨进程稳定）
+    """
+
+    EMPTY_VALUE = np.uint64(1 << 32)
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(0, 1 << 62, size=num_perm, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        values = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens), dtype=np.uint64)
+        if values.size == 0:
+            return np.full(self.num_perm, self.EMPTY_VALUE, dtype=np.uint64)
+        # uint64乘加按 2^64 取模回绕
+        hashed = (values[:, None] * self.a + self.b) >> np.uint64(32)
+        return hashed.min(axis=0)
+
+class SimilarRecipeIndex:
+    """
+    相似菜谱索引（线程安全）
+
+    特点：
+    1. 签名切成 bands 段，任一段完全相同的菜谱进入同一个桶，成为候选
+    2. 候选按特征集合的精确Jaccard相似度排序，每个菜谱保留 top_n 个
+    3. 相似表按菜谱ID存储，查询为字典查找；增删菜谱只影响同桶菜谱的表项
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 64, top_n: int = 10, min_similarity: float = 0.1,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必须能被 bands ({bands}) 整除")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.top_n = top_n
+        self.min_similarity = min_similarity
+        self.seed = seed
+
+        self.names: Dict[str, str] = {}
+        self.tokens: Dict[str, Set[str]] = {}
+        self.band_keys: Dict[str, List[bytes]] = {}
+        self.buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self.similar: Dict[str, List[Tuple[str, float]]] = {}  # 菜谱ID -> [(相似菜谱ID, 相似度)]
+        self.name_to_ids: Dict[str, List[str]] = defaultdict(list)
+        self.name_index = KeyNgramIndex()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    # ==================== 增删 ====================
+
+    def add(self, recipe_id: str, name: str, tokens: Set[str]):
+        """添加或更新菜谱，并把它插入同桶菜谱的相似表"""
+        with self._lock:
+            if recipe_id in self.tokens:
+                self.remove(recipe_id)
+            if not tokens:
+                return
+
+            self._register(recipe_id, name, tokens)
+            scored = self._score(recipe_id, self._candidates(recipe_id))
+            self.similar[recipe_id] = heapq.nlargest(self.top_n, scored, key=lambda item: item[1])
+            for candidate_id, similarity in scored:
+                self._offer(candidate_id, recipe_id, similarity)
+
+    def remove(self, recipe_id: str):
+        """删除菜谱；相似表中包含它的菜谱重新计算表项"""
+        with self._lock:
+            if recipe_id not in self.tokens:
+                return
+            # 表项中含有该菜谱的只可能是同桶菜谱
+            affected = [candidate_id for candidate_id in self._candidates(recipe_id)
+                        if any(similar_id == recipe_id for similar_id, _ in self.similar.get(candidate_id, []))]
+            for band, key in enumerate(self.band_keys.pop(recipe_id)):
+                bucket = self.buckets[(band, key)]
+                bucket.discard(recipe_id)
+                if not bucket:
+                    del self.buckets[(band, key)]
+
+            name = self.names.pop(recipe_id)
+            ids = self.name_to_ids[name]
+            ids.remove(recipe_id)
+            if not ids:
+                del self.name_to_ids[name]
+                self.name_index.remove(name)
+
+            del self.tokens[recipe_id]
+            self.similar.pop(recipe_id, None)
+            for candidate_id in affected:
+                self._recompute(candidate_id)
+
+    def _register(self, recipe_id: str, name: str, tokens: Iterable[str]):
+        """计算签名并放入LSH分桶（不更新相似表）"""
+        signature = self.hasher.signature(tokens)
+        band_keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        self.names[recipe_id] = name
+        self.tokens[recipe_id] = set(tokens)
+        self.band_keys[recipe_id] = band_keys
+        self.name_to_ids[name].append(recipe_id)
+        self.name_index.add(name)
+        for band, key in enumerate(band_keys):
+            self.buckets[(band, key)].add(recipe_id)
+
+    def _candidates(self, recipe_id: str) -> Set[str]:
+        candidates = set()
+        for band, key in enumerate(self.band_keys[recipe_id]):
+            candidates.update(self.buckets.get((band, key), ()))
+        candidates.discard(recipe_id)
+        return candidates
+
+    def _score(self, recipe_id: str, candidates: Set[str]) -> List[Tuple[str, float]]:
+        tokens = self.tokens[recipe_id]
+        scored = []
+        for candidate_id in candidates:
+            other = self.tokens[candidate_id]
+            similarity = len(tokens & other) / len(tokens | other)
+            if similarity >= self.min_similarity:
+                scored.append((candidate_id, round(similarity, 4)))
+        return scored
+
+    def _offer(self, recipe_id: str, candidate_id: str, similarity: float):
+        """把候选插入菜谱的top_n表（比表中最低分高时）"""
+        entries = self.similar.setdefault(recipe_id, [])
+        if len(entries) >= self.top_n and similarity <= entries[-1][1]:
+            return
+        entries.append((candidate_id, similarity))
+        entries.sort(key=lambda item: -item[1])
+        del entries[self.top_n:]
+
+    def _recompute(self, recipe_id: str):
+        scored = self._score(recipe_id, self._candidates(recipe_id))
+        self.similar[recipe_id] = heapq.nlargest(self.top_n, scored, key=lambda item: item[1])
+
+    # ==================== 查询 ====================
+
+    def resolve(self, entity: str) -> List[str]:
+        """菜谱ID/名称 -> 菜谱ID列表（名称不完全一致时按包含匹配取最接近的名称）"""
+        with self._lock:
+            if entity in self.tokens:
+                return [entity]
+            if entity in self.name_to_ids:
+                return list(self.name_to_ids[entity])
+            for name in self.name_index.search(entity, limit=1):
+                return list(self.name_to_ids[name])
+            return []
+
+    def lookup(self, entity: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        查找与菜谱相似的菜谱
+
+        Returns:
+            按相似度降序的结果，包含相似菜谱、相似度以及共同的食材和做法
+        """
+        with self._lock:
+            results = []
+            for recipe_id in self.resolve(entity):
+                tokens = self.tokens[recipe_id]
+                for similar_id, similarity in self.similar.get(recipe_id, [])[:limit or self.top_n]:
+                    shared = tokens & self.tokens[similar_id]
+                    results.append({
+                        "source_id": recipe_id,
+                        "source_name": self.names[recipe_id],
+                        "recipe_id": similar_id,
+                        "name": self.names[similar_id],
+                        "similarity": similarity,
+                        "shared_ingredients": sorted(t[len(INGREDIENT_PREFIX):] for t in shared
+                                                     if t.startswith(INGREDIENT_PREFIX)),
+                        "shared_methods": sorted(t[len(METHOD_PREFIX):] for t in shared
+                                                 if t.startswith(METHOD_PREFIX))
+                    })
+            return results
+
+    # ==================== 持久化 ====================
+
+    def save(self, path: str):
+        """写入临时文件后替换；签名和分桶由特征集合重建，不写入文件"""
+        with self._lock:
+            data = {
+                "params": {"num_perm": self.hasher.num_perm, "bands": self.bands, "top_n": self.top_n,
+                           "min_similarity": self.min_similarity, "seed": self.seed},
+                "recipes": {recipe_id: {"name": self.names[recipe_id], "tokens": sorted(tokens)}
+                            for recipe_id, tokens in self.tokens.items()},
+                "similar": self.similar
+            }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"相似菜谱表已保存: {path} ({len(self.tokens)} 个菜谱)")
+
+    @classmethod
+    def load(cls, path: str) -> 'SimilarRecipeIndex':
+        """加载相似菜谱表，并重建增量更新所需的签名分桶"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        index = cls(**data["params"])
+        for recipe_id, recipe in data["recipes"].items():
+            index._register(recipe_id, recipe["name"], recipe["tokens"])
+        index.similar = {recipe_id: [(similar_id, similarity) for similar_id, similarity in entries]
+                         for recipe_id, entries in data["similar"].items()}
+
+        logger.info(f"加载相似菜谱表: {len(index)} 个菜谱")
+        return index
@@ -0,0 +1,212 @@
+"""
+流式JSON解析模块
+对LLM的流式输出进行增量解析：顶层字段的值一旦闭合就立即回调，
+使下游检索（实体查找、图遍历）可以在模型生成剩余内容时提前开始
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FieldCallback = Callable[[str, Any], None]
+
+class IncrementalJSONObjectParser:
+    """
+    顶层JSON对象的增量解析器
+
+    特点：
+    1. 逐块喂入文本，自动跳过对象前的多余内容（如```json代码块标记）
+    2. 数组/对象在括号闭合时、字符串在引号闭合时、标量在遇到分隔符时视为完成
+    3. 只解析顶层字段，嵌套内容整体作为一个值返回
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"  # start / key / colon / value / scalar / comma / done
+        self._key_start = None
+        self._value_start = None
+        self._object_start = None
+        self._current_key: Optional[str] = None
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def finished(self) -> bool:
+        """顶层对象是否已闭合"""
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        喂入一段文本，返回本次新完成的顶层字段列表 [(key, value), ...]
+        """
+        completed = []
+        if not chunk or self._state == "done":
+            return completed
+
+        self._text += chunk
+        text = self._text
+
+        while self._pos < len(text) and self._state != "done":
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._state == "key":
+                            self._current_key = self._safe_loads(text[self._key_start:self._pos + 1])
+                            self._state = "colon"
+                        elif self._state == "value":
+                            self._complete_value(text[self._value_start:self._pos + 1], completed)
+                self._pos += 1
+                continue
+
+            if self._state == "start":
+                if ch == "{":
+                    self._depth = 1
+                    self._object_start = self._pos
+                    self._state = "key"
+
+            elif self._depth > 1:
+                # 嵌套的数组/对象内部，只跟踪括号和字符串
+                if ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._complete_value(text[self._value_start:self._pos + 1], completed)
+
+            elif self._state == "key":
+                if ch == '"':
+                    self._in_string = True
+                    self._key_start = self._pos
+                elif ch == "}":
+                    self._finish()
+
+            elif self._state == "colon":
+                if ch == ":":
+                    self._state = "value"
+                    self._value_start = None
+
+            elif self._state == "value":
+                if not ch.isspace():
+                    self._value_start = self._pos
+                    if ch == '"':
+                        self._in_string = True
+                    elif ch in "{[":
+                        self._depth += 1
+                    else:
+                        self._state = "scalar"
+
+            elif self._state == "scalar":
+                if ch in ",}" or ch.isspace():
+                    self._complete_value(text[self._value_start:self._pos], completed)
+                    # 分隔符交给comma状态处理
+                    continue
+
+            elif self._state == "comma":
+                if ch == ",":
+                    self._state = "key"
+                elif ch == "}":
+                    self._finish()
+
+            self._pos += 1
+
+        return completed
+
+    def result(self) -> Dict[str, Any]:
+        """
+        获取最终解析结果
+        对象完整时使用标准解析，否则返回已完成的字段
+        """
+        if self._state == "done":
+            parsed = self._safe_loads(self._text[self._object_start:self._pos])
+            if isinstance(parsed, dict):
+                return parsed
+        if not self.fields and self._state == "start":
+            raise ValueError(f"未找到JSON对象: {self._text[:100]}")
+        return dict(self.fields)
+
+    def _complete_value(self, raw: str, completed: List[Tuple[str, Any]]):
+        """记录一个已完成的顶层字段"""
+        self._state = "comma"
+        key = self._current_key
+        self._current_key = None
+        if not isinstance(key, str):
+            return
+
+        try:
+            value = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.debug(f"字段 {key} 的值无法解析: {raw[:50]}")
+            return
+
+        self.fields[key] = value
+        completed.append((key, value))
+
+    def _finish(self):
+        """顶层对象闭合"""
+        self._depth = 0
+        self._state = "done"
+
+    @staticmethod
+    def _safe_loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return None
+
+def stream_llm_json(llm_client, model: str, prompt: str, temperature: float = 0.1,
+                    max_tokens: int = 500, on_field: Optional[FieldCallback] = None) -> Dict[str, Any]:
+    """
+    以流式方式调用LLM并增量解析返回的JSON对象
+
+    Args:
+        llm_client: OpenAI兼容客户端
+        model: 模型名称
+        prompt: 提示词
+        temperature: 温度
+        max_tokens: 最大token数
+        on_field: 顶层字段完成时的回调 (key, value)
+
+    Returns:
+        解析后的完整JSON对象
+    """
+    response = llm_client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    )
+
+    parser = IncrementalJSONObjectParser()
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+
+        for key, value in parser.feed(delta):
+            if on_field:
+                try:
+                    on_field(key, value)
+                except Exception as e:
+                    logger.warning(f"流式字段回调失败 {key}: {e}")
+
+        if parser.finished:
+            break
+
+    return parser.result()
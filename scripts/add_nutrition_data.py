@@ -14,6 +14,8 @@ from langchain_core.prompts import ChatPromptTemplate
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from rag_modules.neo4j_pool import bump_graph_version
+
 # 加载环境变量
 load_dotenv()
 
@@ -158,7 +160,7 @@ class NutritionDataEnhancer:
     
     def update_recipe_nutrition(self, node_id: str, nutrition_data: Dict):
         """
-        更新菜谱的营养数据到 Neo4j
+        更新菜谱的营养数据到 Neo4j（同一事务内递增图版本号，使服务端的查询缓存失效）
         """
         query = """
         MATCH (r:Recipe {nodeId: $nodeId})
@@ -171,16 +173,20 @@ class NutritionDataEnhancer:
         RETURN r.name as name
         """
         
-        with self.driver.session() as session:
-            result = session.run(query, 
+        def update(tx):
+            record = tx.run(query, 
                 nodeId=node_id,
                 calories=nutrition_data.get('calories'),
                 cooking_time=nutrition_data.get('cooking_time_minutes'),
                 prep_time=nutrition_data.get('prep_time_minutes'),
                 servings=nutrition_data.get('servings'),
                 difficulty=nutrition_data.get('difficulty_level')
-            )
-            record = result.single()
+            ).single()
+            bump_graph_version(tx)
+            return record
+        
+        with self.driver.session() as session:
+            record = session.execute_write(update)
             if record:
                 logger.info(f"✅ 更新成功: {record['name']}")
     
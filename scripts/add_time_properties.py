@@ -0,0 +1,117 @@
+"""
+为菜谱补充结构化的总耗时属性 totalTimeMinutes（分钟，整数），并为查询约束用到的
+totalTimeMinutes、calories 建立索引，使“20分钟以内”“500大卡以下”一类约束可以在Cypher中直接过滤
+
+总耗时优先使用 prepTimeMinutes + cookingTimeMinutes（add_nutrition_data.py 写入），
+缺失时解析 prepTime/cookTime 文本（如“约10分钟”“15-20分钟”取上限）；都无法解析的菜谱不写入
+
+用法：
+    python scripts/add_time_properties.py
+    python scripts/add_time_properties.py --dry-run   # 只统计，不写入
+"""
+
+import os
+import sys
+import logging
+from typing import List, Optional
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.neo4j_pool import bump_graph_version
+from rag_modules.query_constraints import recipe_total_minutes
+
+# 加载环境变量
+load_dotenv()
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 查询约束下推到Cypher时用到的属性索引
+CONSTRAINT_INDEXES = [
+    "CREATE INDEX recipe_total_time_index IF NOT EXISTS FOR (r:Recipe) ON (r.totalTimeMinutes)",
+    "CREATE INDEX recipe_calories_index IF NOT EXISTS FOR (r:Recipe) ON (r.calories)",
+    "CREATE INDEX recipe_difficulty_index IF NOT EXISTS FOR (r:Recipe) ON (r.difficulty)",
+]
+
+
+class TimePropertyUpdater:
+    """菜谱总耗时属性的计算和写入"""
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self.config = DEFAULT_CONFIG
+
+        # Neo4j 连接
+        self.driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI", self.config.neo4j_uri),
+            auth=(os.getenv("NEO4J_USER", self.config.neo4j_user),
+                  os.getenv("NEO4J_PASSWORD", self.config.neo4j_password))
+        )
+
+    def compute(self) -> List[dict]:
+        """读取菜谱耗时属性并计算总耗时"""
+        with self.driver.session() as session:
+            result = session.run("""
+            MATCH (r:Recipe)
+            RETURN r {.nodeId, .prepTime, .cookTime, .prepTimeMinutes, .cookingTimeMinutes} as properties
+            """)
+            recipes = [record["properties"] for record in result]
+
+        rows = []
+        for properties in recipes:
+            total = recipe_total_minutes(properties)
+            if total is not None:
+                rows.append({"node_id": properties["nodeId"], "total_minutes": total})
+        logger.info(f"读取 {len(recipes)} 个菜谱, 其中 {len(rows)} 个可以计算总耗时")
+        return rows
+
+    def write(self, rows: List[dict]):
+        """分批写入 totalTimeMinutes 并创建约束属性索引"""
+        with self.driver.session() as session:
+            for start in range(0, len(rows), self.batch_size):
+                session.run("""
+                UNWIND $rows as row
+                MATCH (r:Recipe {nodeId: row.node_id})
+                SET r.totalTimeMinutes = row.total_minutes
+                """, {"rows": rows[start:start + self.batch_size]}).consume()
+            for statement in CONSTRAINT_INDEXES:
+                session.run(statement).consume()
+            version = bump_graph_version(session)
+        logger.info(f"已写入 {len(rows)} 个菜谱的 totalTimeMinutes, 并创建 {len(CONSTRAINT_INDEXES)} 个索引, "
+                    f"图版本更新为 {version}")
+
+    def close(self):
+        """关闭连接"""
+        if self.driver:
+            self.driver.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="为菜谱补充总耗时属性并创建约束索引")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批写入的菜谱数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+
+    args = parser.parse_args(argv)
+
+    updater = TimePropertyUpdater(args.batch_size)
+    try:
+        rows = updater.compute()
+        if not args.dry_run:
+            updater.write(rows)
+    finally:
+        updater.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Cypher属性投影基准：对每类查询分别执行 全属性（properties(n) / 整个节点、路径）和 最小投影 两个版本，
+统计结果的传输字节数（按PackStream编码规则由返回值估算）和客户端读取解码耗时
+
+用法：
+    python scripts/benchmark_cypher_projections.py
+    python scripts/benchmark_cypher_projections.py --repeat 10 --seeds 50
+"""
+
+import os
+import sys
+import time
+import logging
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+from neo4j.graph import Node, Path, Relationship
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.graph_projections import (
+    INGREDIENT_FIELDS, RECIPE_FIELDS, SNAPSHOT_FIELDS, STEP_FIELDS, SUMMARY_FIELDS, projection
+)
+from rag_modules.graph_rag_retrieval import PATH_PROJECTION
+
+# 加载环境变量
+load_dotenv()
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# (查询类型, 全属性查询, 投影查询)；$seed_ids 为抽样的菜谱elementId
+BENCHMARK_QUERIES: List[Tuple[str, str, str]] = [
+    (
+        "菜谱加载",
+        "MATCH (r:Recipe) WHERE r.nodeId >= '200000000' RETURN r.nodeId as nodeId, properties(r) as properties",
+        f"MATCH (r:Recipe) WHERE r.nodeId >= '200000000' "
+        f"RETURN r.nodeId as nodeId, {projection('r', RECIPE_FIELDS)} as properties"
+    ),
+    (
+        "食材加载",
+        "MATCH (i:Ingredient) WHERE i.nodeId >= '200000000' RETURN i.nodeId as nodeId, properties(i) as properties",
+        f"MATCH (i:Ingredient) WHERE i.nodeId >= '200000000' "
+        f"RETURN i.nodeId as nodeId, {projection('i', INGREDIENT_FIELDS)} as properties"
+    ),
+    (
+        "步骤加载",
+        "MATCH (s:CookingStep) WHERE s.nodeId >= '200000000' RETURN s.nodeId as nodeId, properties(s) as properties",
+        f"MATCH (s:CookingStep) WHERE s.nodeId >= '200000000' "
+        f"RETURN s.nodeId as nodeId, {projection('s', STEP_FIELDS)} as properties"
+    ),
+    (
+        "图快照节点",
+        "MATCH (n) RETURN elementId(n) as element_id, labels(n) as labels, properties(n) as properties",
+        f"MATCH (n) RETURN elementId(n) as element_id, labels(n) as labels, "
+        f"{projection('n', SNAPSHOT_FIELDS)} as properties"
+    ),
+    (
+        "多跳路径",
+        "MATCH (source) WHERE elementId(source) IN $seed_ids "
+        "MATCH path = (source)-[*2]-(target) WHERE NOT source = target WITH path LIMIT 500 "
+        "RETURN path, nodes(path) as path_nodes, relationships(path) as rels",
+        "MATCH (source) WHERE elementId(source) IN $seed_ids "
+        "MATCH path = (source)-[*2]-(target) WHERE NOT source = target WITH path LIMIT 500 "
+        "WITH nodes(path) as path_nodes, relationships(path) as rels "
+        f"RETURN {PATH_PROJECTION}"
+    ),
+    (
+        "子图邻居",
+        "UNWIND $seed_ids as element_id MATCH (n) WHERE elementId(n) = element_id "
+        "CALL { WITH n MATCH (n)-[r]-(m) RETURN r, m LIMIT 50 } "
+        "RETURN elementId(r) as edge_id, properties(r) as edge_properties, properties(m) as properties",
+        "UNWIND $seed_ids as element_id MATCH (n) WHERE elementId(n) = element_id "
+        "CALL { WITH n MATCH (n)-[r]-(m) RETURN r, m LIMIT 50 } "
+        f"RETURN elementId(r) as edge_id, properties(r) as edge_properties, "
+        f"{projection('m', SUMMARY_FIELDS)} as properties"
+    ),
+]
+
+
+def _length_header(size: int, tiny: bool = True) -> int:
+    """PackStream字符串/列表/字典的长度头字节数"""
+    if tiny and size < 16:
+        return 1
+    if size < 0x100:
+        return 2
+    if size < 0x10000:
+        return 3
+    return 5
+
+
+def packstream_size(value: Any) -> int:
+    """按PackStream（Bolt 5）编码规则估算一个返回值的字节数"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, int):
+        if -16 <= value < 128:
+            return 1
+        if -0x80 <= value < 0x80:
+            return 2
+        if -0x8000 <= value < 0x8000:
+            return 3
+        if -0x80000000 <= value < 0x80000000:
+            return 5
+        return 9
+    if isinstance(value, float):
+        return 9
+    if isinstance(value, str):
+        size = len(value.encode('utf-8'))
+        return _length_header(size) + size
+    if isinstance(value, (bytes, bytearray)):
+        return _length_header(len(value), tiny=False) + len(value)
+    if isinstance(value, Node):
+        # 结构头 + id + 标签列表 + 属性字典 + elementId
+        return (2 + 9 + packstream_size(list(value.labels)) + packstream_size(dict(value))
+                + packstream_size(value.element_id))
+    if isinstance(value, Relationship):
+        # 结构头 + id/起点/终点 + 类型 + 属性字典 + 3个elementId
+        return (2 + 27 + packstream_size(value.type) + packstream_size(dict(value))
+                + packstream_size(value.element_id) * 3)
+    if isinstance(value, Path):
+        # 结构头 + 节点列表 + 无端点关系列表 + 索引序列
+        return (2 + packstream_size(list(value.nodes)) + packstream_size(list(value.relationships))
+                + _length_header(2 * len(value.relationships)) + 2 * len(value.relationships))
+    if isinstance(value, dict):
+        return _length_header(len(value)) + sum(packstream_size(k) + packstream_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return _length_header(len(value)) + sum(packstream_size(item) for item in value)
+    return packstream_size(str(value))
+
+
+class ProjectionBenchmark:
+    """全属性查询与投影查询的对比"""
+
+    def __init__(self, repeat: int, seeds: int):
+        self.repeat = repeat
+        self.seeds = seeds
+        self.config = DEFAULT_CONFIG
+
+        # Neo4j 连接
+        self.driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI", self.config.neo4j_uri),
+            auth=(os.getenv("NEO4J_USER", self.config.neo4j_user),
+                  os.getenv("NEO4J_PASSWORD", self.config.neo4j_password))
+        )
+
+    def _seed_ids(self) -> List[str]:
+        """抽样菜谱作为多跳/子图查询的起点"""
+        with self.driver.session() as session:
+            result = session.run("""
+            MATCH (r:Recipe) WHERE r.nodeId >= '200000000'
+            RETURN elementId(r) as element_id ORDER BY r.nodeId LIMIT $limit
+            """, {"limit": self.seeds})
+            return [record["element_id"] for record in result]
+
+    def _measure(self, query: str, params: Dict[str, Any]) -> Dict[str, float]:
+        """执行查询并读取全部记录，返回行数、字节数和耗时中位数"""
+        durations, server_times = [], []
+        rows = size = 0
+        with self.driver.session() as session:
+            for _ in range(self.repeat):
+                start_time = time.perf_counter()
+                result = session.run(query, params)
+                records = list(result)
+                durations.append((time.perf_counter() - start_time) * 1000)
+                summary = result.consume()
+                server_times.append((summary.result_available_after or 0) + (summary.result_consumed_after or 0))
+            rows = len(records)
+            size = sum(packstream_size(value) for record in records for value in record.values())
+        return {
+            "rows": rows,
+            "bytes": size,
+            "decode_ms": statistics.median(durations),
+            "server_ms": statistics.median(server_times)
+        }
+
+    def run(self):
+        """依次测量每类查询的两个版本并输出对比"""
+        params = {"seed_ids": self._seed_ids()}
+        logger.info(f"基准参数: 重复 {self.repeat} 次, 起点菜谱 {len(params['seed_ids'])} 个")
+
+        for name, full_query, lean_query in BENCHMARK_QUERIES:
+            full = self._measure(full_query, params)
+            lean = self._measure(lean_query, params)
+            ratio = lean["bytes"] / full["bytes"] if full["bytes"] else 1.0
+            logger.info(
+                f"{name}: {full['rows']} 行 | 字节 {full['bytes']:,} -> {lean['bytes']:,} ({ratio:.0%}) | "
+                f"读取解码 {full['decode_ms']:.1f}ms -> {lean['decode_ms']:.1f}ms | "
+                f"服务端 {full['server_ms']:.0f}ms -> {lean['server_ms']:.0f}ms"
+            )
+
+    def close(self):
+        """关闭连接"""
+        if self.driver:
+            self.driver.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cypher属性投影基准（传输字节数和解码耗时）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询的重复次数（取中位数）")
+    parser.add_argument("--seeds", type=int, default=20, help="多跳/子图查询的起点菜谱数")
+
+    args = parser.parse_args(argv)
+
+    benchmark = ProjectionBenchmark(args.repeat, args.seeds)
+    try:
+        benchmark.run()
+    finally:
+        benchmark.close()
+
+
+if __name__ == "__main__":
+    main()
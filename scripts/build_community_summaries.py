@@ -0,0 +1,83 @@
+"""
+离线生成社区摘要：在 菜谱-食材-分类 图上做Louvain社区划分，
+为每个社区统计菜系、分类、主要食材等特征并生成摘要，结果写入 config.community_summary_path
+
+用法：
+    python scripts/build_community_summaries.py          # 统计摘要
+    python scripts/build_community_summaries.py --llm    # 统计摘要 + LLM概括（成员未变化的社区复用上次结果）
+"""
+
+import os
+import sys
+import logging
+from typing import List, Optional
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.community_summary import CommunitySummaryStore, CommunitySummarizer
+from rag_modules.graph_snapshot import GraphSnapshot
+
+# 加载环境变量
+load_dotenv()
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def create_llm_client():
+    """与生成模块相同的OpenAI兼容客户端"""
+    from openai import OpenAI
+
+    api_key = os.getenv("MOONSHOT_API_KEY")
+    if not api_key:
+        raise ValueError("请设置 MOONSHOT_API_KEY 环境变量")
+    return OpenAI(api_key=api_key, base_url="https://api.moonshot.cn/v1")
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成社区摘要（Louvain）")
+    parser.add_argument("--output", default=DEFAULT_CONFIG.community_summary_path, help="社区摘要路径")
+    parser.add_argument("--resolution", type=float, default=DEFAULT_CONFIG.community_resolution,
+                        help="Louvain分辨率，越大社区越小")
+    parser.add_argument("--min-recipes", type=int, default=2, help="菜谱数少于该值的社区不生成摘要")
+    parser.add_argument("--llm", action="store_true", help="使用LLM概括社区特色")
+
+    args = parser.parse_args(argv)
+    config = DEFAULT_CONFIG
+
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI", config.neo4j_uri),
+        auth=(os.getenv("NEO4J_USER", config.neo4j_user), os.getenv("NEO4J_PASSWORD", config.neo4j_password))
+    )
+    try:
+        snapshot = GraphSnapshot.load_from_neo4j(driver)
+    finally:
+        driver.close()
+
+    store = CommunitySummaryStore.build(snapshot, resolution=args.resolution, min_recipes=args.min_recipes)
+
+    if args.llm:
+        previous = None
+        if os.path.exists(args.output):
+            try:
+                previous = CommunitySummaryStore.load(args.output)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"读取已有社区摘要失败，全部重新生成: {e}")
+        CommunitySummarizer(config, create_llm_client()).summarize(store, previous)
+
+    store.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
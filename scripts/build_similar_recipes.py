@@ -0,0 +1,129 @@
+"""
+离线生成相似菜谱表：对每个菜谱的食材和做法集合计算MinHash签名，
+用LSH分桶找候选并保留 top-N 相似菜谱，结果写入 config.similar_recipe_index_path
+
+用法：
+    python scripts/build_similar_recipes.py                 # 全量重建
+    python scripts/build_similar_recipes.py --recipe-id ID  # 增量更新单个菜谱
+    python scripts/build_similar_recipes.py --remove ID     # 从表中删除菜谱
+"""
+
+import os
+import sys
+import time
+import logging
+from typing import List, Optional
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.similar_recipes import SimilarRecipeIndex, load_recipe_features
+
+# 加载环境变量
+load_dotenv()
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class SimilarRecipeBuilder:
+    """相似菜谱表的全量构建和增量更新"""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.config = DEFAULT_CONFIG
+
+        # Neo4j 连接
+        self.driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI", self.config.neo4j_uri),
+            auth=(os.getenv("NEO4J_USER", self.config.neo4j_user),
+                  os.getenv("NEO4J_PASSWORD", self.config.neo4j_password))
+        )
+
+    def _new_index(self) -> SimilarRecipeIndex:
+        return SimilarRecipeIndex(bands=self.config.similar_recipe_bands,
+                                  top_n=self.config.similar_recipe_top_n)
+
+    def _load_index(self) -> SimilarRecipeIndex:
+        """增量更新需要已有的相似菜谱表"""
+        if not os.path.exists(self.output_path):
+            raise FileNotFoundError(f"相似菜谱表不存在，请先全量构建: {self.output_path}")
+        return SimilarRecipeIndex.load(self.output_path)
+
+    def build_all(self):
+        """全量构建"""
+        start_time = time.time()
+        with self.driver.session() as session:
+            features = load_recipe_features(session)
+        logger.info(f"读取菜谱特征: {len(features)} 个菜谱, 耗时 {time.time() - start_time:.2f}秒")
+
+        index = self._new_index()
+        for recipe_id, name, tokens in features:
+            index.add(recipe_id, name, tokens)
+
+        covered = sum(1 for entries in index.similar.values() if entries)
+        logger.info(f"相似菜谱表构建完成: {len(index)} 个菜谱, {covered} 个菜谱有相似菜谱, "
+                    f"耗时 {time.time() - start_time:.2f}秒")
+        index.save(self.output_path)
+
+    def update(self, recipe_ids: List[str]):
+        """增量更新指定菜谱（新增或修改）"""
+        index = self._load_index()
+        with self.driver.session() as session:
+            features = load_recipe_features(session, recipe_ids)
+
+        found = {recipe_id for recipe_id, _, _ in features}
+        for recipe_id in recipe_ids:
+            if recipe_id not in found:
+                logger.warning(f"菜谱不存在: {recipe_id}")
+
+        for recipe_id, name, tokens in features:
+            index.add(recipe_id, name, tokens)
+            logger.info(f"已更新: {name} -> {[index.names[s] for s, _ in index.similar.get(recipe_id, [])][:5]}")
+        index.save(self.output_path)
+
+    def remove(self, recipe_ids: List[str]):
+        """从相似菜谱表中删除菜谱"""
+        index = self._load_index()
+        for recipe_id in recipe_ids:
+            index.remove(recipe_id)
+        index.save(self.output_path)
+
+    def close(self):
+        """关闭连接"""
+        if self.driver:
+            self.driver.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成相似菜谱表（MinHash LSH）")
+    parser.add_argument("--output", default=DEFAULT_CONFIG.similar_recipe_index_path, help="相似菜谱表路径")
+    parser.add_argument("--recipe-id", action="append", default=[], help="增量更新的菜谱ID（可重复）")
+    parser.add_argument("--remove", action="append", default=[], help="删除的菜谱ID（可重复）")
+
+    args = parser.parse_args(argv)
+
+    builder = SimilarRecipeBuilder(args.output)
+    try:
+        if args.remove:
+            builder.remove(args.remove)
+        if args.recipe_id:
+            builder.update(args.recipe_id)
+        if not args.remove and not args.recipe_id:
+            builder.build_all()
+    finally:
+        builder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+训练本地路由模型：读取LLM路由决策日志（config.routing_log_path 及轮转出的 .1），按查询哈希划分训练/评估集，
+评估本地模型与LLM决策的一致率、Cohen's kappa、各策略的精确率/召回率、置信度阈值下的覆盖率和单次预测耗时，
+然后用全部数据重新训练并写入 config.local_router_path
+
+用法：
+    python scripts/train_local_router.py                    # 评估 + 全量训练并保存
+    python scripts/train_local_router.py --eval-only        # 只评估
+    python scripts/train_local_router.py --threshold 0.9    # 指定评估用的置信度阈值
+"""
+
+import os
+import sys
+import time
+import zlib
+import logging
+import statistics
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_CONFIG
+from rag_modules.local_router import LocalRouter, RoutingDecisionLog
+
+# 加载环境变量
+load_dotenv()
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MIN_EXAMPLES = 20
+
+
+def split_examples(examples: Sequence[Tuple[str, str]], eval_ratio: float) -> Tuple[List, List]:
+    """按查询文本的哈希划分（同一查询总落在同一侧，日志增长后划分保持稳定）"""
+    train, evaluation = [], []
+    for query, label in examples:
+        bucket = zlib.crc32(query.encode('utf-8')) % 1000
+        (evaluation if bucket < eval_ratio * 1000 else train).append((query, label))
+    return train, evaluation
+
+
+def cohen_kappa(expected: Sequence[str], predicted: Sequence[str]) -> float:
+    """LLM决策与本地模型预测的一致性（扣除随机一致）"""
+    total = len(expected)
+    observed = sum(e == p for e, p in zip(expected, predicted)) / total
+    expected_counts, predicted_counts = Counter(expected), Counter(predicted)
+    chance = sum(expected_counts[label] * predicted_counts[label] for label in expected_counts) / (total * total)
+    return (observed - chance) / (1 - chance) if chance < 1 else 1.0
+
+
+def evaluate(router: LocalRouter, examples: Sequence[Tuple[str, str]], threshold: float) -> Dict[str, Any]:
+    """本地模型在评估集上与LLM决策的一致性指标"""
+    expected = [label for _, label in examples]
+    predictions = [router.predict(query) for query, _ in examples]
+    predicted = [label for label, _ in predictions]
+
+    per_label = {}
+    for label in sorted(set(expected) | set(predicted)):
+        true_positive = sum(e == p == label for e, p in zip(expected, predicted))
+        predicted_count = predicted.count(label)
+        expected_count = expected.count(label)
+        precision = true_positive / predicted_count if predicted_count else 0.0
+        recall = true_positive / expected_count if expected_count else 0.0
+        per_label[label] = {
+            "support": expected_count,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        }
+
+    covered = [(e, p) for e, (p, confidence) in zip(expected, predictions) if confidence >= threshold]
+
+    # 单次预测耗时（重复多轮取每条查询的平均值）
+    latencies = []
+    for query, _ in examples:
+        start_time = time.perf_counter()
+        for _ in range(20):
+            router.predict(query)
+        latencies.append((time.perf_counter() - start_time) / 20 * 1000)
+    latencies.sort()
+
+    return {
+        "examples": len(examples),
+        "agreement": sum(e == p for e, p in zip(expected, predicted)) / len(examples),
+        "kappa": cohen_kappa(expected, predicted),
+        "per_label": per_label,
+        "confusion": {f"{e}->{p}": count for (e, p), count in sorted(Counter(zip(expected, predicted)).items())},
+        "threshold": threshold,
+        "coverage": len(covered) / len(examples),
+        "covered_agreement": sum(e == p for e, p in covered) / len(covered) if covered else 0.0,
+        "latency_ms_mean": statistics.mean(latencies),
+        "latency_ms_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    }
+
+
+def report(metrics: Dict[str, Any]):
+    """输出评估指标"""
+    logger.info(f"评估集 {metrics['examples']} 条: 与LLM一致率 {metrics['agreement']:.1%}, "
+                f"Cohen's kappa {metrics['kappa']:.3f}")
+    for label, values in metrics["per_label"].items():
+        logger.info(f"  {label}: 样本 {values['support']}, 精确率 {values['precision']:.1%}, "
+                    f"召回率 {values['recall']:.1%}, F1 {values['f1']:.3f}")
+    logger.info(f"  混淆（LLM->本地）: {metrics['confusion']}")
+    logger.info(f"置信度阈值 {metrics['threshold']}: 覆盖 {metrics['coverage']:.1%} 的查询, "
+                f"其中一致率 {metrics['covered_agreement']:.1%}（其余回退到LLM）")
+    logger.info(f"单次预测耗时: 平均 {metrics['latency_ms_mean'] * 1000:.1f}µs, "
+                f"P99 {metrics['latency_ms_p99'] * 1000:.1f}µs")
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    import argparse
+
+    config = DEFAULT_CONFIG
+    parser = argparse.ArgumentParser(description="由LLM路由决策日志训练本地路由模型")
+    parser.add_argument("--log", default=config.routing_log_path, help="路由决策日志路径")
+    parser.add_argument("--output", default=config.local_router_path, help="模型输出路径")
+    parser.add_argument("--eval-ratio", type=float, default=0.2, help="评估集比例")
+    parser.add_argument("--threshold", type=float, default=config.local_router_threshold,
+                        help="评估覆盖率使用的置信度阈值")
+    parser.add_argument("--min-count", type=int, default=2, help="n-gram至少出现的查询数")
+    parser.add_argument("--C", type=float, default=4.0, help="逻辑回归的逆正则化强度")
+    parser.add_argument("--eval-only", action="store_true", help="只评估，不保存模型")
+
+    args = parser.parse_args(argv)
+
+    if not args.log:
+        raise ValueError("路由决策日志默认不记录：请设置 config.routing_log_path 积累LLM决策，或用 --log 指定日志")
+    if not RoutingDecisionLog.exists(args.log):
+        raise FileNotFoundError(f"路由决策日志不存在，请先使用LLM路由积累决策: {args.log}")
+    examples = RoutingDecisionLog.load(args.log)
+    distribution = Counter(label for _, label in examples)
+    logger.info(f"读取路由决策 {len(examples)} 条（按查询去重）: {dict(distribution)}")
+    if len(examples) < MIN_EXAMPLES or len(distribution) < 2:
+        raise ValueError(f"训练数据不足：至少需要 {MIN_EXAMPLES} 条决策且包含两种以上策略")
+
+    train, evaluation = split_examples(examples, args.eval_ratio)
+    metrics = None
+    if evaluation and len({label for _, label in train}) >= 2:
+        router = LocalRouter.train([q for q, _ in train], [l for _, l in train],
+                                   min_count=args.min_count, C=args.C)
+        metrics = evaluate(router, evaluation, args.threshold)
+        report(metrics)
+    else:
+        logger.warning("评估集为空或训练集只有一种策略，跳过评估")
+
+    if args.eval_only:
+        return
+
+    router = LocalRouter.train([q for q, _ in examples], [l for _, l in examples],
+                               min_count=args.min_count, C=args.C)
+    router.metrics = metrics or {}
+    router.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -290,6 +290,13 @@ async def get_stats(current_user: str = Depends(get_current_user)):
         total_queries=route_stats.get('total_queries', 0)
     )
 
+@app.get("/api/stats/neo4j")
+async def get_neo4j_pool_stats(current_user: str = Depends(get_current_user)):
+    """Shared Neo4j connection pool metrics"""
+    if not rag_system or not rag_system.data_module or not rag_system.data_module.pool:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    return rag_system.data_module.pool.metrics()
+
 @app.get("/api/recipes")
 async def get_recipes(category: str = "all", search: str = "", favorite: bool = False, current_user: str = Depends(get_current_user)):
     """Get recipe list with optional filtering"""
@@ -340,78 +347,77 @@ async def get_recipes(category: str = "all", search: str = "", favorite: bool =
         """
         
         # Execute query
-        with rag_system.data_module.driver.session() as session:
-            params = {}
-            if category != "all":
-                params["category"] = category
-            if search:
-                params["search"] = search
+        params = {}
+        if category != "all":
+            params["category"] = category
+        if search:
+            params["search"] = search
             
-            result = session.run(cypher, params)
-            recipes = []
+        result = rag_system.data_module.pool.cached_read(cypher, params)
+        recipes = []
             
-            for record in result:
-                # Parse time safely using regex
-                def parse_minutes(time_str):
-                    if not time_str:
-                        return 0
-                    # Try to find the first number (integer or float)
-                    match = re.search(r'(\d+(\.\d+)?)', str(time_str))
-                    if match:
-                        try:
-                            return int(float(match.group(1)))
-                        except ValueError:
-                            return 0
+        for record in result:
+            # Parse time safely using regex
+            def parse_minutes(time_str):
+                if not time_str:
                     return 0
+                # Try to find the first number (integer or float)
+                match = re.search(r'(\d+(\.\d+)?)', str(time_str))
+                if match:
+                    try:
+                        return int(float(match.group(1)))
+                    except ValueError:
+                        return 0
+                return 0
 
-                prep_minutes = parse_minutes(record["prepTime"])
-                cook_minutes = parse_minutes(record["cookTime"])
+            prep_minutes = parse_minutes(record["prepTime"])
+            cook_minutes = parse_minutes(record["cookTime"])
                 
-                total_time = prep_minutes + cook_minutes
+            total_time = prep_minutes + cook_minutes
                 
-                # Parse tags
-                tags_str = record["tags"] or ""
-                tags = [t.strip() for t in tags_str.split(",") if t.strip()] if tags_str else []
+            # Parse tags
+            tags_str = record["tags"] or ""
+            tags = [t.strip() for t in tags_str.split(",") if t.strip()] if tags_str else []
                 
-                # Map difficulty safely
-                try:
-                    diff_val = int(record["difficulty"]) if record["difficulty"] else 2
-                except (ValueError, TypeError):
-                    diff_val = 2
-                difficulty_level = max(1, min(5, diff_val))  # Clamp to 1-5
+            # Map difficulty safely
+            try:
+                diff_val = int(record["difficulty"]) if record["difficulty"] else 2
+            except (ValueError, TypeError):
+                diff_val = 2
+            difficulty_level = max(1, min(5, diff_val))  # Clamp to 1-5
                 
-                # Default emoji (can be extended with name mapping)
-                emoji_map = {
-                    "鸡": "🍗", "肉": "🥩", "蛋": "🍅", "豆腐": "🌶️",
-                    "鱼": "🐟", "虾": "🦐", "菜": "🥬", "饭": "🍚"
-                }
-                emoji = "🍽️"
-                for key, value in emoji_map.items():
-                    if key in record["name"]:
-                        emoji = value
-                        break
+            # Default emoji (can be extended with name mapping)
+            emoji_map = {
+                "鸡": "🍗", "肉": "🥩", "蛋": "🍅", "豆腐": "🌶️",
+                "鱼": "🐟", "虾": "🦐", "菜": "🥬", "饭": "🍚"
+            }
+            emoji = "🍽️"
+            for key, value in emoji_map.items():
+                if key in record["name"]:
+                    emoji = value
+                    break
                 
-                # Parse servings safely
-                try:
-                    servings = int(record["servings"]) if record["servings"] else 2
-                except (ValueError, TypeError):
-                    servings = 2
+            # Parse servings safely
+            try:
+                servings = int(record["servings"]) if record["servings"] else 2
+            except (ValueError, TypeError):
+                servings = 2
                 
-                recipe = {
-                    "id": record["id"],
-                    "name": record["name"],
-                    "category": record["category"],
-                    "difficulty": difficulty_level,
-                    "time": total_time,
-                    "servings": servings,
-                    "calories": 0,  # 暂时为 0
-                    "description": record["description"] or "",
-                    "tags": tags,
-                    "likes": 0,  # 暂时为 0
-                    "image": emoji,
-                    "favorite": record["favorite"]
-                }
-                recipes.append(recipe)
+            recipe = {
+                "id": record["id"],
+                "name": record["name"],
+                "category": record["category"],
+                "difficulty": difficulty_level,
+                "time": total_time,
+                "servings": servings,
+                "calories": 0,  # 暂时为 0
+                "description": record["description"] or "",
+                "tags": tags,
+                "likes": 0,  # 暂时为 0
+                "image": emoji,
+                "favorite": record["favorite"]
+            }
+            recipes.append(recipe)
         
         return recipes
         
@@ -444,95 +450,94 @@ async def get_recipe_detail(recipe_id: str, current_user: str = Depends(get_curr
                [(r)-[cs:CONTAINS_STEP]->(s:CookingStep) | {order: COALESCE(cs.stepOrder, s.stepNumber, 999), description: s.description}] as steps
         """
         
-        with rag_system.data_module.driver.session() as session:
-            result = session.run(cypher, {"recipe_id": recipe_id})
-            record = result.single()
+        result = rag_system.data_module.pool.cached_read(cypher, {"recipe_id": recipe_id})
+        record = result[0] if result else None
             
-            if not record:
-                raise HTTPException(status_code=404, detail="Recipe not found")
+        if not record:
+            raise HTTPException(status_code=404, detail="Recipe not found")
             
-            # Parse time safely using regex
-            def parse_minutes(time_str):
-                if not time_str:
-                    return 0
-                # Try to find the first number (integer or float)
-                match = re.search(r'(\d+(\.\d+)?)', str(time_str))
-                if match:
-                    try:
-                        return int(float(match.group(1)))
-                    except ValueError:
-                        return 0
+        # Parse time safely using regex
+        def parse_minutes(time_str):
+            if not time_str:
                 return 0
+            # Try to find the first number (integer or float)
+            match = re.search(r'(\d+(\.\d+)?)', str(time_str))
+            if match:
+                try:
+                    return int(float(match.group(1)))
+                except ValueError:
+                    return 0
+            return 0
 
-            prep_minutes = parse_minutes(record["prepTime"])
-            cook_minutes = parse_minutes(record["cookTime"])
+        prep_minutes = parse_minutes(record["prepTime"])
+        cook_minutes = parse_minutes(record["cookTime"])
             
-            total_time = prep_minutes + cook_minutes
+        total_time = prep_minutes + cook_minutes
             
-            # Parse tags
-            tags_str = record["tags"] or ""
-            tags = [t.strip() for t in tags_str.split(",") if t.strip()] if tags_str else []
+        # Parse tags
+        tags_str = record["tags"] or ""
+        tags = [t.strip() for t in tags_str.split(",") if t.strip()] if tags_str else []
             
-            # Map difficulty safely
-            difficulty_map = {0: "简单", 1: "简单", 2: "简单", 3: "中等", 4: "困难", 5: "困难"}
-            try:
-                diff_val = int(record["difficulty"]) if record["difficulty"] else 2
-                difficulty_level = diff_val
-            except (ValueError, TypeError):
-                difficulty_level = 2
+        # Map difficulty safely
+        difficulty_map = {0: "简单", 1: "简单", 2: "简单", 3: "中等", 4: "困难", 5: "困难"}
+        try:
+            diff_val = int(record["difficulty"]) if record["difficulty"] else 2
+            difficulty_level = diff_val
+        except (ValueError, TypeError):
+            difficulty_level = 2
             
-            # Default emoji
-            emoji_map = {
-                "鸡": "🍗", "肉": "🥩", "蛋": "🍅", "豆腐": "🌶️",
-                "鱼": "🐟", "虾": "🦐", "菜": "🥬", "饭": "🍚"
-            }
-            emoji = "🍽️"
-            for key, value in emoji_map.items():
-                if key in record["name"]:
-                    emoji = value
-                    break
+        # Default emoji
+        emoji_map = {
+            "鸡": "🍗", "肉": "🥩", "蛋": "🍅", "豆腐": "🌶️",
+            "鱼": "🐟", "虾": "🦐", "菜": "🥬", "饭": "🍚"
+        }
+        emoji = "🍽️"
+        for key, value in emoji_map.items():
+            if key in record["name"]:
+                emoji = value
+                break
             
-            # Parse servings safely
-            try:
-                servings = int(record["servings"]) if record["servings"] else 2
-            except (ValueError, TypeError):
-                servings = 2
+        # Parse servings safely
+        try:
+            servings = int(record["servings"]) if record["servings"] else 2
+        except (ValueError, TypeError):
+            servings = 2
             
-            # Process ingredients
-            ingredients = []
-            if record["ingredients"]:
-                for ing in record["ingredients"]:
-                    if ing["name"]:  # Filter out null entries
-                        ingredients.append({
-                            "name": ing["name"],
-                            "amount": ing["amount"]
-                        })
+        # Process ingredients
+        ingredients = []
+        if record["ingredients"]:
+            for ing in record["ingredients"]:
+                if ing["name"]:  # Filter out null entries
+                    ingredients.append({
+                        "name": ing["name"],
+                        "amount": ing["amount"]
+                    })
             
-            # Process steps
-            steps = []
-            if record["steps"]:
-                steps_raw = [s for s in record["steps"] if s["description"]]
-                steps_sorted = sorted(steps_raw, key=lambda x: x["order"])
-                steps = [s["description"] for s in steps_sorted]
+        # Process steps
+        steps = []
+        if record["steps"]:
+            steps_raw = [s for s in record["steps"] if s["description"]]
+            steps_sorted = sorted(steps_raw, key=lambda x: x["order"])
+            steps = [s["description"] for s in steps_sorted]
             
-            recipe_detail = {
-                "id": record["id"],
-                "name": record["name"],
-                "category": record["category"],
-                "difficulty": difficulty_map.get(difficulty_level, "中等"),
-                "time": total_time,
-                "servings": servings,
-                "calories": 0,  # 暂时为 0
-                "description": record["description"] or "",
-                "tags": tags,
-                "likes": 0,  # 暂时为 0
-                "image": emoji,
-                "favorite": record["favorite"],
-                "ingredients": ingredients,
-                "steps": steps
-            }
+        recipe_detail = {
+            "id": record["id"],
+            "name": record["name"],
+            "category": record["category"],
+            "difficulty": difficulty_map.get(difficulty_level, "中等"),
+            "time": total_time,
+            "servings": servings,
+            "calories": 0,  # 暂时为 0
+            "description": record["description"] or "",
+            "tags": tags,
+            "likes": 0,  # 暂时为 0
+            "image": emoji,
+            "favorite": record["favorite"],
+            "ingredients": ingredients,
+            "steps": steps
+        }
             
-            return recipe_detail
+        return recipe_detail
             
     except HTTPException:
         raise
@@ -553,14 +558,13 @@ async def toggle_favorite(recipe_id: str, request: FavoriteRequest, current_user
         RETURN r.nodeId as id, r.favorite as favorite
         """
         
-        with rag_system.data_module.driver.session() as session:
-            result = session.run(cypher, {"recipe_id": recipe_id, "favorite": request.favorite})
-            record = result.single()
+        result = rag_system.data_module.pool.write(cypher, {"recipe_id": recipe_id, "favorite": request.favorite})
+        record = result[0] if result else None
             
-            if not record:
-                raise HTTPException(status_code=404, detail="Recipe not found")
+        if not record:
+            raise HTTPException(status_code=404, detail="Recipe not found")
             
-            return {"id": record["id"], "favorite": record["favorite"]}
+        return {"id": record["id"], "favorite": record["favorite"]}
             
     except HTTPException:
         raise
@@ -568,6 +572,35 @@ async def toggle_favorite(recipe_id: str, request: FavoriteRequest, current_user
         logger.error(f"Error toggling favorite: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/recipes/{recipe_id}/index")
+async def index_recipe(recipe_id: str, current_user: str = Depends(get_current_user)):
+    """Incrementally index a recipe after it was added or changed in Neo4j"""
+    if not rag_system or not rag_system.system_ready:
+        raise HTTPException(status_code=503, detail="System not initialized")
+
+    try:
+        if not rag_system.index_recipe(recipe_id):
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        return {"id": recipe_id, "status": "indexed"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error indexing recipe: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/recipes/{recipe_id}/index")
+async def remove_recipe_index(recipe_id: str, current_user: str = Depends(get_current_user)):
+    """Remove a recipe from the retrieval indexes after it was deleted from Neo4j"""
+    if not rag_system or not rag_system.system_ready:
+        raise HTTPException(status_code=503, detail="System not initialized")
+
+    try:
+        rag_system.remove_recipe(recipe_id)
+        return {"id": recipe_id, "status": "removed"}
+    except Exception as e:
+        logger.error(f"Error removing recipe from index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/rebuild")
 async def rebuild_knowledge_base(background_tasks: BackgroundTasks):
     """Trigger a rebuild in the background"""